@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Report the memory used per action by parsers with generated options.
+
+Several parsers (think subcommands) are built with the same generated
+option names, the way code generators produce them: as fresh strings
+rather than literals. The objects reachable from the actions (the actions
+themselves, their instance dicts, option string lists and strings) are
+sized with sys.getsizeof, counting shared objects once.
+
+For comparison, the same actions are also copied into the layout Action
+had before its attributes moved to slots: a plain instance dict, and the
+option strings and dest as generated rather than interned.
+"""
+
+import gc
+import sys
+
+import cli.app
+from cli._ext import argparse
+
+ATTRIBUTES = [name for name in argparse.Action.__slots__
+    if name != "__dict__"]
+
+class DictAction(object):
+    """An action with its attributes in a plain instance dict."""
+
+    def __init__(self, action, option_strings, dest):
+        for name in ATTRIBUTES:
+            setattr(self, name, getattr(action, name))
+        self.option_strings = option_strings
+        self.dest = dest
+
+def action_bytes(actions):
+    seen = set()
+    total = 0
+    for action in actions:
+        # getting __dict__ would allocate one for a slotted action
+        objects = [action, action.option_strings, action.dest]
+        objects.extend([obj for obj in gc.get_referents(action)
+            if type(obj) is dict])
+        objects.extend(action.option_strings)
+        for obj in objects:
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+    return total
+
+@cli.app.CommandLineApp
+def action_memory(app):
+    actions = []
+    baseline = []
+    for parser_index in range(app.params.parsers):
+        parser = cli.app.ArgumentParser(prog="bench", add_help=False,
+            stdout=app.stdout, stderr=app.stderr)
+        for i in range(app.params.options):
+            name = "".join(["--option", "-", str(i)])
+            action = parser.add_argument(name, help="option")
+            actions.append(action)
+            baseline.append(DictAction(action, [name],
+                name.lstrip("-").replace("-", "_")))
+    app.stdout.write("%d parsers x %d options\n" % (app.params.parsers,
+        app.params.options))
+    results = []
+    for label, objects in (("dict", baseline), ("slots", actions)):
+        total = action_bytes(objects)
+        results.append(total)
+        app.stdout.write("%s: %d bytes, %.1f bytes/action\n" % (label,
+            total, float(total) / len(objects)))
+    app.stdout.write("saved: %.0f%%\n" % (100.0 * (results[0] - results[1]) /
+        results[0]))
+
+action_memory.add_param("-p", "--parsers", type=int, default=10,
+    help="number of parsers")
+action_memory.add_param("-o", "--options", type=int, default=1000,
+    help="options per parser")
+
+if __name__ == "__main__":
+    action_memory.run()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Time registering thousands of generated options.
+
+Each size is timed twice: once with one add_param() call per option and
+once with a single add_params() call for all of them.
+"""
+
+import cli.app
+from cli.profiler import Profiler
+
+def new_app():
+    app = cli.app.CommandLineApp(lambda app: None, argv=["bench"])
+    app.setup()
+    return app
+
+@cli.app.CommandLineApp
+def add_params(app):
+    profiler = Profiler(stdout=app.stdout, count=app.params.count,
+        repeat=app.params.repeat)
+
+    for size in app.params.sizes:
+        specs = [(("--option-%05d" % i,),
+            {"type": int, "default": 0, "help": "generated option %d" % i})
+            for i in range(size)]
+
+        def one_by_one():
+            target = new_app()
+            for args, kwargs in specs:
+                target.add_param(*args, **kwargs)
+
+        def bulk():
+            new_app().add_params(specs)
+
+        rates = []
+        for func in (one_by_one, bulk):
+            profiler.statistical(func)()
+            rates.append(size * app.params.count / profiler.result)
+        app.stdout.write("%6d options: add_param %9.0f/s  add_params %9.0f/s  "
+            "(%.1fx)\n" % (size, rates[0], rates[1], rates[1] / rates[0]))
+
+add_params.add_param("-n", "--count", type=int, default=3,
+    help="registrations per timing loop")
+add_params.add_param("-r", "--repeat", type=int, default=3,
+    help="number of timing loops")
+add_params.add_param("sizes", nargs="*", type=int, default=[5000],
+    help="option counts to measure")
+
+if __name__ == "__main__":
+    add_params.run()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Check that "import cli; cli.command" stays under an import-time budget.
+
+The import runs in a fresh interpreter with __import__ wrapped so that every
+module load is timed. The report mirrors the output of "python -X importtime"
+(self and cumulative microseconds per module, nested by import depth), which
+older interpreters don't provide. The benchmark fails if the import takes
+longer than the budget or if it pulls in any of the heavy modules that are
+supposed to load lazily.
+"""
+
+import os
+import subprocess
+import sys
+
+import cli.app
+
+HEAVY = ["cli.app", "cli._ext.argparse", "cli.profiler", "pstats",
+    "cli.ext", "subprocess"]
+
+CHILD = r'''
+import sys, time
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+real_import = builtins.__import__
+stack = [0.0]
+records = []
+
+def timed_import(name, *args, **kwargs):
+    known = len(sys.modules)
+    stack.append(0.0)
+    start = time.time()
+    try:
+        return real_import(name, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        nested = stack.pop()
+        stack[-1] += elapsed
+        if len(sys.modules) != known:
+            records.append((len(stack) - 1, elapsed - nested, elapsed, name))
+
+builtins.__import__ = timed_import
+start = time.time()
+import cli
+cli.command
+total = time.time() - start
+builtins.__import__ = real_import
+
+for depth, own, cumulative, name in records:
+    sys.stderr.write("import time: %9d | %10d | %s%s\n" % (
+        own * 1e6, cumulative * 1e6, "  " * depth, name))
+sys.stdout.write("%f\n" % total)
+sys.stdout.write(" ".join(sorted(sys.modules)) + "\n")
+'''
+
+def measure(python, env):
+    proc = subprocess.Popen([python, "-c", CHILD], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise cli.app.Error(stderr)
+    total, modules = stdout.splitlines()
+    return float(total), modules.split(), stderr
+
+@cli.app.CommandLineApp
+def import_time(app):
+    env = dict(os.environ)
+    libdir = os.path.dirname(os.path.dirname(os.path.abspath(cli.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [libdir] + [p for p in [env.get("PYTHONPATH")] if p])
+
+    results = [measure(app.params.python, env)
+        for i in range(app.params.repeat)]
+    best, modules, report = min(results)
+    if app.params.verbose:
+        app.stderr.write(report)
+
+    status = 0
+    loaded = [name for name in HEAVY if name in modules]
+    if loaded:
+        app.stdout.write("eagerly imported: %s\n" % ", ".join(loaded))
+        status = 1
+    app.stdout.write("import cli; cli.command: %.2f ms (budget %.2f ms)\n" % (
+        best * 1e3, app.params.budget))
+    if best * 1e3 > app.params.budget:
+        status = 1
+    return status
+
+import_time.add_param("-b", "--budget", type=float, default=25.0,
+    help="maximum import time in milliseconds")
+import_time.add_param("-r", "--repeat", type=int, default=5,
+    help="number of fresh interpreters to time (the best run counts)")
+import_time.add_param("-p", "--python", default=sys.executable,
+    help="interpreter to measure")
+import_time.add_param("-v", "--verbose", default=False, action="store_true",
+    help="print the per-module import report")
+
+if __name__ == "__main__":
+    import_time.run()
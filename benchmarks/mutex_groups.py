@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Time parsing with mutually exclusive groups of 10 to 500 actions.
+
+Each size is timed twice: once with the conflict map the parser maintains
+as actions are added, and once with the per-parse rebuild of a full
+action-to-conflicts map that it replaced.
+"""
+
+import cli.app
+from cli.profiler import Profiler
+
+def rebuild_conflicts(parser):
+    action_conflicts = {}
+    for mutex_group in parser._mutually_exclusive_groups:
+        group_actions = mutex_group._group_actions
+        for i, mutex_action in enumerate(mutex_group._group_actions):
+            conflicts = action_conflicts.setdefault(mutex_action, [])
+            conflicts.extend(group_actions[:i])
+            conflicts.extend(group_actions[i + 1:])
+    return action_conflicts
+
+@cli.app.CommandLineApp
+def mutex_groups(app):
+    profiler = Profiler(stdout=app.stdout, count=app.params.count,
+        repeat=app.params.repeat)
+
+    for size in app.params.sizes:
+        parser = cli.app.ArgumentParser(prog="bench", add_help=False,
+            stdout=app.stdout, stderr=app.stderr)
+        group = parser.add_mutually_exclusive_group()
+        for i in range(size):
+            group.add_argument("--format-%03d" % i, action="store_true")
+        argv = ["--format-%03d" % (size // 2)]
+
+        def incremental():
+            parser.parse_args(argv)
+
+        def rebuild():
+            rebuild_conflicts(parser)
+            parser.parse_args(argv)
+
+        rates = []
+        for func in (rebuild, incremental):
+            profiler.statistical(func)()
+            rates.append(app.params.count / profiler.result)
+        app.stdout.write("%4d actions: rebuild %9.0f/s  incremental %9.0f/s  "
+            "(%.1fx)\n" % (size, rates[0], rates[1], rates[1] / rates[0]))
+
+mutex_groups.add_param("-n", "--count", type=int, default=200,
+    help="parses per timing loop")
+mutex_groups.add_param("-r", "--repeat", type=int, default=3,
+    help="number of timing loops")
+mutex_groups.add_param("sizes", nargs="*", type=int,
+    default=[10, 50, 100, 250, 500], help="group sizes to measure")
+
+if __name__ == "__main__":
+    mutex_groups.run()
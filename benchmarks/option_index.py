@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Time abbreviated long-option lookup for parsers with 10 to 10,000 options.
+
+Each size is timed twice: once through the parser's sorted option index and
+once with the linear scan over every option string that the index replaced.
+"""
+
+import cli.app
+from cli.profiler import Profiler
+
+def linear_option_tuples(parser, option_prefix):
+    result = []
+    for option_string in parser._option_string_actions:
+        if option_string.startswith(option_prefix):
+            action = parser._option_string_actions[option_string]
+            result.append((action, option_string, None))
+    return result
+
+@cli.app.CommandLineApp
+def option_index(app):
+    profiler = Profiler(stdout=app.stdout, count=app.params.count,
+        repeat=app.params.repeat)
+
+    for size in app.params.sizes:
+        parser = cli.app.ArgumentParser(prog="bench", add_help=False,
+            stdout=app.stdout, stderr=app.stderr)
+        for i in range(size):
+            parser.add_argument("--option-%05d" % i)
+        # a full option string, so exactly one option matches
+        prefix = "--option-%05d" % (size // 2)
+
+        def indexed():
+            parser._get_option_tuples(prefix)
+
+        def linear():
+            linear_option_tuples(parser, prefix)
+
+        rates = []
+        for func in (linear, indexed):
+            profiler.statistical(func)()
+            rates.append(app.params.count / profiler.result)
+        app.stdout.write("%6d options: linear %10.0f/s  indexed %10.0f/s  "
+            "(%.1fx)\n" % (size, rates[0], rates[1], rates[1] / rates[0]))
+
+option_index.add_param("-n", "--count", type=int, default=1000,
+    help="lookups per timing loop")
+option_index.add_param("-r", "--repeat", type=int, default=3,
+    help="number of timing loops")
+option_index.add_param("sizes", nargs="*", type=int,
+    default=[10, 100, 1000, 10000], help="option counts to measure")
+
+if __name__ == "__main__":
+    option_index.run()
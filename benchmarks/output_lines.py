@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Compare lines/sec written through a file object and a BufferedOutput.
+
+Each mode writes the same short lines to os.devnull (or to the file given
+with --target): one write() per line on the file object itself, then on a
+BufferedOutput in text mode (with str and with unicode lines, which it
+encodes) and binary mode, then with writelines() in batches of --batch
+lines. The last two modes write to cli.util.StringIO, directly and
+through a BufferedOutput, as tests do.
+"""
+
+import os
+
+import cli.app
+from cli.profiler import Profiler
+from cli.streams import BufferedOutput
+from cli.util import StringIO
+
+@cli.app.CommandLineApp
+def output_lines(app):
+    lines = ["%d\tsome output\n" % i for i in range(app.params.lines)]
+    unicode_lines = [unicode(line) for line in lines]
+    batch = app.params.batch
+    batches = [lines[i:i + batch] for i in range(0, len(lines), batch)]
+    target = open(app.params.target, "w")
+
+    def per_line(stream, lines=lines):
+        for line in lines:
+            stream.write(line)
+        stream.flush()
+
+    def file_write():
+        per_line(target)
+
+    def text_write():
+        per_line(BufferedOutput(target))
+
+    def unicode_write():
+        per_line(BufferedOutput(target), unicode_lines)
+
+    def binary_write():
+        per_line(BufferedOutput(target, binary=True))
+
+    def buffered_writelines():
+        stream = BufferedOutput(target)
+        for chunk in batches:
+            stream.writelines(chunk)
+        stream.flush()
+
+    def stringio_write():
+        per_line(StringIO())
+
+    def stringio_buffered():
+        per_line(BufferedOutput(StringIO()))
+
+    profiler = Profiler(stdout=app.stdout, count=1, repeat=app.params.repeat)
+    try:
+        for func in (file_write, text_write, unicode_write, binary_write,
+                buffered_writelines, stringio_write, stringio_buffered):
+            profiler.statistical(func)()
+            app.stdout.write("%s: %.0f lines/sec\n" % (func.__name__,
+                len(lines) / profiler.result))
+    finally:
+        target.close()
+
+output_lines.add_param("-n", "--lines", type=int, default=1000000,
+    help="lines per run")
+output_lines.add_param("-b", "--batch", type=int, default=1000,
+    help="lines per writelines() call")
+output_lines.add_param("-r", "--repeat", type=int, default=3,
+    help="number of runs per mode")
+output_lines.add_param("-t", "--target", default=os.devnull,
+    help="file to write to")
+
+if __name__ == "__main__":
+    output_lines.run()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Compare parses/sec with a warm parse plan against cold ones.
+
+The replan run clears the parser's plan (its compiled nargs regexes) before
+every parse, but the re module's own cache still hands back compiled
+patterns, so it only measures the overhead of rebuilding the plan. The cold
+run also purges that cache, so every pattern is compiled again.
+"""
+
+import re
+
+import cli.app
+from cli.profiler import Profiler
+
+ARGV = "-v --output out.txt --level 3 src1 src2 src3 dest".split()
+
+def build_parser(app):
+    parser = cli.app.ArgumentParser(prog="bench", stdout=app.stdout,
+        stderr=app.stderr)
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument("-o", "--output")
+    parser.add_argument("-l", "--level", type=int, default=0)
+    parser.add_argument("sources", nargs="+")
+    parser.add_argument("dest")
+    return parser
+
+@cli.app.CommandLineApp
+def parse_plan(app):
+    parser = build_parser(app)
+    profiler = Profiler(stdout=app.stdout, count=app.params.count,
+        repeat=app.params.repeat)
+
+    def cold():
+        re.purge()
+        parser._parse_plan.clear()
+        parser.parse_args(ARGV)
+
+    def replan():
+        parser._parse_plan.clear()
+        parser.parse_args(ARGV)
+
+    def warm():
+        parser.parse_args(ARGV)
+
+    results = []
+    for func in (cold, replan, warm):
+        profiler.statistical(func)()
+        rate = app.params.count / profiler.result
+        results.append(rate)
+        app.stdout.write("%s: %.0f parses/sec\n" % (func.__name__, rate))
+    app.stdout.write("speedup over cold: %.2fx, over replan: %.2fx\n" % (
+        results[2] / results[0], results[2] / results[1]))
+
+parse_plan.add_param("-n", "--count", type=int, default=20000,
+    help="parses per timing loop")
+parse_plan.add_param("-r", "--repeat", type=int, default=3,
+    help="number of timing loops")
+
+if __name__ == "__main__":
+    parse_plan.run()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Time parsing of 10^3 to 10^6 positional arguments.
+
+Three command line shapes are timed for each size: a single greedy
+positional, a few flags followed by the positionals, and one flag for
+every ten positionals. The time per argument should stay flat as the
+command lines grow.
+"""
+
+import cli.app
+from cli.profiler import Profiler
+
+def shapes(size):
+    files = ["file%07d" % i for i in range(size)]
+    yield "positional", files
+    yield "flags+positional", ["-v", "-o", "out"] + files
+    interleaved = ["-v"] * (size // 10)
+    interleaved.extend(files)
+    yield "many flags", interleaved
+
+@cli.app.CommandLineApp
+def positional_scaling(app):
+    profiler = Profiler(stdout=app.stdout, count=app.params.count,
+        repeat=app.params.repeat)
+    parser = cli.app.ArgumentParser(prog="bench", stdout=app.stdout,
+        stderr=app.stderr)
+    parser.add_argument("-v", "--verbose", action="count")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("files", nargs="*")
+
+    for exponent in app.params.exponents:
+        size = 10 ** exponent
+        for name, argv in shapes(size):
+            def parse():
+                parser.parse_args(argv)
+            profiler.statistical(parse)()
+            per_arg = profiler.result / app.params.count / len(argv)
+            app.stdout.write("%8d args, %-18s %8.3f s  %6.0f ns/arg\n" % (
+                size, name + ":", profiler.result / app.params.count,
+                per_arg * 1e9))
+
+positional_scaling.add_param("-n", "--count", type=int, default=1,
+    help="parses per timing loop")
+positional_scaling.add_param("-r", "--repeat", type=int, default=3,
+    help="number of timing loops")
+positional_scaling.add_param("exponents", nargs="*", type=int,
+    default=[3, 4, 5, 6], help="powers of ten to measure")
+
+if __name__ == "__main__":
+    positional_scaling.run()
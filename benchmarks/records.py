@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Compare records/sec of a line filter reading stdin per line and in chunks.
+
+Each mode upper-cases every line of a generated file and writes it to
+os.devnull. "lines" iterates over the file object and writes each line;
+"records" uses Application.records() and emit() one record at a time,
+"batches" with --batch records at a time. The file is read through mmap;
+--pipe feeds it through a pipe instead, so records() uses os.read().
+"""
+
+import os
+import subprocess
+import tempfile
+
+import cli.app
+from cli.profiler import Profiler
+
+def lines(app):
+    write = app.stdout.write
+    for line in app.stdin:
+        write(line.upper())
+
+def records(app):
+    emit = app.emit
+    for record in app.records():
+        emit(record.upper())
+
+def batches(app):
+    batch = app.batch
+    for records in app.records(batch=batch):
+        app.emit([record.upper() for record in records])
+
+@cli.app.CommandLineApp
+def records_bench(app):
+    fd, path = tempfile.mkstemp()
+    try:
+        f = os.fdopen(fd, "w")
+        for i in xrange(app.params.lines):
+            f.write("%d\tsome input record\n" % i)
+        f.close()
+        null = open(os.devnull, "w")
+
+        def run(main):
+            if app.params.pipe:
+                cat = subprocess.Popen(["cat", path], stdout=subprocess.PIPE)
+                stdin = cat.stdout
+            else:
+                cat, stdin = None, open(path)
+            try:
+                filter = cli.app.Application(main, stdin=stdin, stdout=null,
+                    exit_after_main=False, reraise=(Exception,))
+                filter.batch = app.params.batch
+                filter.run()
+            finally:
+                stdin.close()
+                if cat is not None:
+                    cat.wait()
+
+        profiler = Profiler(stdout=app.stdout, count=1,
+            repeat=app.params.repeat)
+        for main in (lines, records, batches):
+            profiler.statistical(run)(main)
+            app.stdout.write("%s: %.0f records/sec\n" % (main.__name__,
+                app.params.lines / profiler.result))
+        null.close()
+    finally:
+        os.unlink(path)
+
+records_bench.add_param("-n", "--lines", type=int, default=1000000,
+    help="records in the input")
+records_bench.add_param("-b", "--batch", type=int, default=1000,
+    help="records per batch")
+records_bench.add_param("-r", "--repeat", type=int, default=3,
+    help="number of runs per mode")
+records_bench.add_param("--pipe", default=False, action="store_true",
+    help="read the input from a pipe")
+
+if __name__ == "__main__":
+    records_bench.run()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""Measure the startup cost of each bundled application class.
+
+For each kind of application and number of generated parameters, the
+benchmark measures:
+
+ * cold_ms, the time from spawning a fresh interpreter that runs this
+   script to the application's main (the best of --repeat runs);
+ * peak_rss_kb, the child's peak resident set size when main is entered;
+ * warm_ms, the time to build the application, add its parameters and run
+   it up to main in an interpreter that has already imported everything
+   (the best of --warm runs);
+ * parses_per_sec, how many times the application's parser parses its
+   command line per second (null for Application, which has no parser).
+
+Application has no parameters, so it only runs with 0. InteractiveApp
+rebuilds its parser in pre_run, so it parses only its own options.
+DaemonizingApp doesn't fork unless main calls daemonize(), which it doesn't
+here.
+
+The results are written as JSON. With --baseline, they are compared with
+an earlier run and every metric that got worse by more than --tolerance
+is reported; the benchmark then exits with status 1. Use --load to compare
+stored results instead of measuring again:
+
+    $ python benchmarks/startup.py -o baseline.json
+    $ python benchmarks/startup.py --baseline baseline.json
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from timeit import default_timer
+
+import cli.app
+from cli.util import StringIO
+
+KINDS = ["application", "command_line", "logging", "daemonizing",
+    "interactive", "completion"]
+
+# Metrics and whether a larger value is better.
+METRICS = [("cold_ms", False), ("warm_ms", False), ("peak_rss_kb", False),
+    ("parses_per_sec", True)]
+
+def build(kind, count, main):
+    """Return an application of *kind* with *count* parameters, and its argv."""
+    options = dict(exit_after_main=False, stdout=StringIO(), stderr=StringIO())
+    if kind == "application":
+        return cli.app.Application(main, name="bench", **options), ["bench"]
+    elif kind == "command_line":
+        app = cli.app.CommandLineApp(main, name="bench", **options)
+    elif kind == "logging":
+        from cli.log import LoggingApp
+        app = LoggingApp(main, name="bench", stream=None, **options)
+    elif kind == "daemonizing":
+        from cli.daemon import DaemonizingApp
+        app = DaemonizingApp(main, name="bench", stream=None, **options)
+    elif kind == "interactive":
+        from cli.interactive import InteractiveApp
+
+        class InteractiveBench(InteractiveApp):
+
+            def _main(self):
+                return main(self)
+
+        app = InteractiveBench(main, name="bench", stream=None,
+            readline_completekey=None, **options)
+    elif kind == "completion":
+        from cli.complete import CompletionMixin
+        from cli.log import LoggingApp
+
+        class CompletionBench(CompletionMixin, LoggingApp):
+
+            def setup(self):
+                LoggingApp.setup(self)
+                CompletionMixin.setup(self)
+
+        app = CompletionBench(main, name="bench", stream=None, **options)
+    else:
+        raise ValueError("unknown kind %r" % kind)
+
+    for i in range(count):
+        app.add_param("--option-%04d" % i, type=int, default=0,
+            help="generated option %d" % i)
+    argv = ["bench"]
+    if count and kind != "interactive":
+        argv.extend(["--option-%04d=1" % i
+            for i in sorted(set([0, count // 2, count - 1]))])
+    return app, argv
+
+def start(app, argv):
+    # CompletionMixin.run() doesn't take arguments.
+    app.argv = argv
+    app.run()
+
+def child(kind, count):
+    # Runs in a fresh interpreter: report when main is reached.
+    def main(app):
+        sys.stdout.write("%r %d\n" % (time.time(), peak_rss()))
+    start(*build(kind, count, main))
+
+def peak_rss():
+    # Linux keeps ru_maxrss across exec, so it would include the parent's
+    # peak; the high water mark in /proc starts over with the new image.
+    try:
+        f = open("/proc/self/status")
+    except IOError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            rss //= 1024
+        return rss
+    try:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    finally:
+        f.close()
+    return 0
+
+def cold(python, script, env, kind, count, repeat):
+    timings = []
+    rss = 0
+    for i in range(repeat):
+        started = time.time()
+        proc = subprocess.Popen([python, script, "--child", kind, str(count)],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise cli.app.Error(stderr)
+        reached, peak = stdout.split()
+        timings.append(float(reached) - started)
+        rss = max(rss, int(peak))
+    return min(timings), rss
+
+def warm(kind, count, repeat):
+    timings = []
+    for i in range(repeat):
+        reached = []
+        started = default_timer()
+        start(*build(kind, count, lambda app: reached.append(default_timer())))
+        timings.append(reached[0] - started)
+    return min(timings)
+
+def parse_rate(kind, count, parses):
+    if kind == "application":
+        return None
+    app, argv = build(kind, count, lambda app: None)
+    start(app, argv)
+    parser = app.argparser
+    args = argv[1:]
+    started = default_timer()
+    for i in range(parses):
+        parser.parse_args(args)
+    return parses / (default_timer() - started)
+
+def compare(baseline, current, tolerance):
+    """Return a line for each metric of *current* worse than in *baseline*."""
+    old = dict([((r["kind"], r["params"]), r) for r in baseline["results"]])
+    regressions = []
+    for result in current["results"]:
+        before = old.get((result["kind"], result["params"]))
+        if before is None:
+            continue
+        for metric, larger_is_better in METRICS:
+            a, b = before.get(metric), result.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / float(a)
+            if larger_is_better:
+                change = -change
+            if change > tolerance:
+                regressions.append("%s with %d params: %s %.4g -> %.4g "
+                    "(%+.1f%% worse)\n" % (result["kind"], result["params"],
+                    metric, a, b, change * 100))
+    return regressions
+
+@cli.app.CommandLineApp
+def startup(app):
+    import json
+
+    params = app.params
+    if params.load is not None:
+        f = open(params.load)
+        try:
+            report = json.load(f)
+        finally:
+            f.close()
+    else:
+        env = dict(os.environ)
+        libdir = os.path.dirname(os.path.dirname(os.path.abspath(
+            cli.__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(
+            [libdir] + [p for p in [env.get("PYTHONPATH")] if p])
+        script = os.path.abspath(__file__)
+
+        results = []
+        for kind in params.kinds or KINDS:
+            for count in params.params:
+                if kind == "application" and count:
+                    continue
+                cold_time, rss = cold(params.python, script, env, kind, count,
+                    params.repeat)
+                rate = parse_rate(kind, count, params.parses)
+                result = {
+                    "kind": kind,
+                    "params": count,
+                    "cold_ms": cold_time * 1e3,
+                    "warm_ms": warm(kind, count, params.warm) * 1e3,
+                    "peak_rss_kb": rss,
+                    "parses_per_sec": rate,
+                }
+                results.append(result)
+                app.stderr.write("%-12s %5d params: cold %8.2f ms  warm "
+                    "%8.2f ms  %7d kB  %s parses/s\n" % (kind, count,
+                    result["cold_ms"], result["warm_ms"], rss,
+                    rate is None and "-" or "%.0f" % rate))
+        report = {"python": sys.version.split()[0], "platform": sys.platform,
+            "results": results}
+
+    text = json.dumps(report, indent=1, sort_keys=True) + "\n"
+    if params.output is None:
+        app.stdout.write(text)
+    else:
+        f = open(params.output, "w")
+        try:
+            f.write(text)
+        finally:
+            f.close()
+
+    if params.baseline is not None:
+        f = open(params.baseline)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        regressions = compare(baseline, report, params.tolerance)
+        for line in regressions:
+            app.stderr.write("regression: " + line)
+        if regressions:
+            return 1
+
+startup.add_param("-k", "--kind", dest="kinds", action="append",
+    choices=KINDS, help="application kind to measure (default: all)")
+startup.add_param("-n", "--params", type=int, nargs="+",
+    default=[0, 10, 100, 1000], help="parameter counts to measure")
+startup.add_param("-r", "--repeat", type=int, default=5,
+    help="fresh interpreters per cold measurement")
+startup.add_param("-w", "--warm", type=int, default=5,
+    help="runs per warm measurement")
+startup.add_param("--parses", type=int, default=2000,
+    help="parses per throughput measurement")
+startup.add_param("-p", "--python", default=sys.executable,
+    help="interpreter for the cold runs")
+startup.add_param("-o", "--output", default=None,
+    help="write the results to this file instead of stdout")
+startup.add_param("-b", "--baseline", default=None,
+    help="report regressions against the results in this file")
+startup.add_param("-t", "--tolerance", type=float, default=0.2,
+    help="relative change that counts as a regression (default: "
+    "%(default)s)")
+startup.add_param("-l", "--load", default=None,
+    help="compare the results in this file instead of measuring")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        startup.run()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Compare the latency of a cold start with a call to a zygote server.
+
+The target is a CommandLineApp with a hundred parameters. Each round runs
+it as a fresh interpreter ("cold"), through the "python -S -m cli.zygote"
+client ("client"), which still pays for starting a small interpreter, and
+with cli.zygote.call() from this process ("call"), which is the cost of
+the server round trip and fork alone.
+"""
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import cli.app
+from cli.zygote import ZygoteServer, call
+
+def greet(app):
+    app.stdout.write("hello %s\n" % app.params.name)
+
+target = cli.app.CommandLineApp(greet, name="greet")
+for i in range(100):
+    target.add_param("--option-%03d" % i, type=int, default=0,
+        help="generated option %d" % i)
+target.add_param("name")
+
+def best(func, count):
+    # the fastest and mean of count runs, in milliseconds
+    timings = []
+    for i in range(count):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings) * 1e3, sum(timings) / count * 1e3
+
+@cli.app.CommandLineApp
+def zygote_latency(app):
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, "socket")
+    env = dict(os.environ)
+    libdir = os.path.dirname(os.path.dirname(os.path.abspath(cli.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [libdir] + [p for p in [env.get("PYTHONPATH")] if p])
+    null = open(os.devnull, "w")
+
+    server = ZygoteServer(target, path)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            sys.stdout = null
+            server.serve_forever()
+        finally:
+            os._exit(0)
+    server.socket.close()
+
+    python = app.params.python
+    script = os.path.abspath(__file__)
+    runs = [
+        ("cold", lambda: subprocess.call([python, script, "--target", "you"],
+            env=env, stdout=null)),
+        ("client", lambda: subprocess.call([python, "-S", "-m", "cli.zygote",
+            path, "you"], env=env, stdout=null)),
+        ("call", lambda: call(path, ["you"], stdout=null.fileno())),
+    ]
+    try:
+        for name, func in runs:
+            fastest, mean = best(func, app.params.count)
+            app.stdout.write("%-6s  best %8.2f ms  mean %8.2f ms\n" % (
+                name, fastest, mean))
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        shutil.rmtree(tmpdir)
+
+zygote_latency.add_param("-n", "--count", type=int, default=20,
+    help="invocations per mode")
+zygote_latency.add_param("-p", "--python", default=sys.executable,
+    help="interpreter for the cold start and the client")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--target"]:
+        del sys.argv[1]
+        target.run()
+    else:
+        zygote_latency.run()
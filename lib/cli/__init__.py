@@ -62,11 +62,10 @@ __todo__ = """\
     * add Windows registry/OS X plist support (sekhmet)
 """
 
-import cli.app
-default_app_class = cli.app.CommandLineApp
+from cli.util import lazy
 
 
-def command(main=None, name=None, app_class=cli.default_app_class, **kwargs):
+def command(main=None, name=None, app_class=None, **kwargs):
     """Decorator for easily creating applications.
 
     Usage:
@@ -79,7 +78,13 @@ def command(main=None, name=None, app_class=cli.default_app_class, **kwargs):
     def some_function(app):
         app.stdout.write('running {0}, {1} with: {2}\n'.format(app, app.name, app.params))
 
+    .. versionchanged:: 1.2
+        *app_class* defaults to the value of :data:`default_app_class` at
+        call time (:class:`cli.app.CommandLineApp` unless changed).
     """
+    import cli
+    if app_class is None:
+        app_class = cli.default_app_class
     app = app_class(main=main, name=name, **kwargs)
     return app
 
@@ -100,9 +105,19 @@ def param(*args, **kwargs):
     def command_logging_with_params(app):
         app.stdout.write('running {0}, {1} with: {2}\n'.format(app, app.name, app.params))
     """
+    import cli.app
     def wrapper(app):
         if not isinstance(app, cli.app.Application):
             app = cli.app.CommandLineApp(app)
         app.add_param(*args, **kwargs)
         return app
     return wrapper
+
+# Submodules (and with them the vendored argparse) are only imported when
+# first used, which keeps "import cli" cheap for short-lived programs.
+# default_app_class resolves to cli.app.CommandLineApp unless it is set
+# before first use.
+lazy(__name__, dict([(name, "cli.%s" % name) for name in (
+    "aio", "app", "batch", "complete", "daemon", "ext", "interactive",
+    "log", "profiler", "streams", "test", "util", "zygote")],
+    default_app_class="cli.app:CommandLineApp"))
@@ -72,6 +72,7 @@ __all__ = [
     'RawDescriptionHelpFormatter',
     'RawTextHelpFormatter',
     'Namespace',
+    'ParseState',
     'Action',
     'ONE_OR_MORE',
     'OPTIONAL',
@@ -82,6 +83,7 @@ __all__ = [
 ]
 
 
+import bisect as _bisect
 import copy as _copy
 import os as _os
 import re as _re
@@ -90,11 +92,39 @@ import textwrap as _textwrap
 
 from gettext import gettext as _
 
+try:
+    import mmap as _mmap
+except ImportError:
+    _mmap = None
+
 
 def _callable(obj):
     return hasattr(obj, '__call__') or hasattr(obj, '__bases__')
 
 
+def _import_object(name):
+    # resolve a 'module:attribute' string, importing the module
+    module_name, _, attribute = name.partition(':')
+    obj = __import__(module_name)
+    for part in module_name.split('.')[1:] + attribute.split('.'):
+        if part:
+            obj = getattr(obj, part)
+    return obj
+
+
+def _intern(string):
+    # only byte strings can be interned
+    if type(string) is str:
+        return intern(string)
+    return string
+
+
+def _identity(string):
+    # module level (rather than local to ArgumentParser.__init__) so that
+    # parsers can be pickled
+    return string
+
+
 SUPPRESS = '==SUPPRESS=='
 
 OPTIONAL = '?'
@@ -117,6 +147,9 @@ class _AttributeHolder(object):
     '_kwarg_names', or by inspecting the instance __dict__.
     """
 
+    # subclasses decide whether their instances get a __dict__
+    __slots__ = ()
+
     def __repr__(self):
         type_name = type(self).__name__
         arg_strings = []
@@ -139,6 +172,47 @@ def _ensure_value(namespace, name, value):
     return getattr(namespace, name)
 
 
+class _ArgFile(str):
+    """An unexpanded argument file reference, e.g. '@paths.txt'."""
+    pass
+
+
+def _iter_file_lines(args_file):
+    # the lines of args_file as str.splitlines() sees them ('\n', '\r\n'
+    # or a bare '\r' ends a line); regular files are mapped into memory
+    # and scanned in place, so that huge argument files are never read
+    # into one string; pipes, empty files and the like are iterated over
+    try:
+        data = _mmap.mmap(args_file.fileno(), 0, access=_mmap.ACCESS_READ)
+    except (AttributeError, EnvironmentError, ValueError):
+        for line in args_file:
+            for arg_line in line.splitlines():
+                yield arg_line
+        return
+
+    try:
+        find = data.find
+        start, end = 0, len(data)
+        # the next '\n' and '\r' at or after start (end if there is none)
+        lf = cr = -1
+        while start < end:
+            if lf < start:
+                lf = find('\n', start)
+                if lf < 0:
+                    lf = end
+            if cr < start:
+                cr = find('\r', start)
+                if cr < 0:
+                    cr = end
+            stop = min(lf, cr)
+            yield data[start:stop]
+            if stop == cr and lf == cr + 1:
+                stop = lf
+            start = stop + 1
+    finally:
+        data.close()
+
+
 # ===============
 # Formatting Help
 # ===============
@@ -204,8 +278,6 @@ class HelpFormatter(object):
             if self.parent is not None:
                 self.formatter._indent()
             join = self.formatter._join_parts
-            for func, args in self.items:
-                func(*args)
             item_help = join([func(*args) for func, args in self.items])
             if self.parent is not None:
                 self.formatter._dedent()
@@ -312,22 +384,23 @@ class HelpFormatter(object):
                     positionals.append(action)
 
             # build full usage string
-            format = self._format_actions_usage
-            action_usage = format(optionals + positionals, groups)
+            get_parts = self._get_actions_usage_parts
+            action_usage = ' '.join(get_parts(optionals + positionals, groups))
             usage = ' '.join([s for s in [prog, action_usage] if s])
 
             # wrap the usage parts if it's too long
             text_width = self._width - self._current_indent
             if len(prefix) + len(usage) > text_width:
 
-                # break usage into wrappable parts
+                # break usage into wrappable parts: each action, or each
+                # mutually exclusive group as a whole, split again at the
+                # spaces outside of brackets
                 part_regexp = r'\(.*?\)+|\[.*?\]+|\S+'
-                opt_usage = format(optionals, groups)
-                pos_usage = format(positionals, groups)
-                opt_parts = _re.findall(part_regexp, opt_usage)
-                pos_parts = _re.findall(part_regexp, pos_usage)
-                assert ' '.join(opt_parts) == opt_usage
-                assert ' '.join(pos_parts) == pos_usage
+                def split_parts(actions):
+                    return [piece for part in get_parts(actions, groups)
+                            for piece in _re.findall(part_regexp, part)]
+                opt_parts = split_parts(optionals)
+                pos_parts = split_parts(positionals)
 
                 # helper for wrapping lines
                 def get_lines(parts, indent, prefix=None):
@@ -338,7 +411,7 @@ class HelpFormatter(object):
                     else:
                         line_len = len(indent) - 1
                     for part in parts:
-                        if line_len + 1 + len(part) > text_width:
+                        if line_len + 1 + len(part) > text_width and line:
                             lines.append(indent + ' '.join(line))
                             line = []
                             line_len = len(indent) - 1
@@ -379,9 +452,12 @@ class HelpFormatter(object):
         return '%s%s\n\n' % (prefix, usage)
 
     def _format_actions_usage(self, actions, groups):
-        # find group indices and identify actions in groups
+        return ' '.join(self._get_actions_usage_parts(actions, groups))
+
+    def _get_actions_usage_parts(self, actions, groups):
+        # find the groups whose actions appear together in actions
         group_actions = set()
-        inserts = {}
+        group_starts = {}
         for group in groups:
             try:
                 start = actions.index(group._group_actions[0])
@@ -390,89 +466,70 @@ class HelpFormatter(object):
             else:
                 end = start + len(group._group_actions)
                 if actions[start:end] == group._group_actions:
-                    for action in group._group_actions:
-                        group_actions.add(action)
-                    if not group.required:
-                        if start in inserts:
-                            inserts[start] += ' ['
-                        else:
-                            inserts[start] = '['
-                        inserts[end] = ']'
-                    else:
-                        if start in inserts:
-                            inserts[start] += ' ('
-                        else:
-                            inserts[start] = '('
-                        inserts[end] = ')'
-                    for i in range(start + 1, end):
-                        inserts[i] = '|'
+                    group_actions.update(group._group_actions)
+                    group_starts[start] = group, end
 
-        # collect all actions format strings
+        # collect the format strings of all actions, joining the actions
+        # of each group into a single part
         parts = []
-        for i, action in enumerate(actions):
-
-            # suppressed arguments are marked with None
-            # remove | separators for suppressed arguments
-            if action.help is SUPPRESS:
-                parts.append(None)
-                if inserts.get(i) == '|':
-                    inserts.pop(i)
-                elif inserts.get(i + 1) == '|':
-                    inserts.pop(i + 1)
-
-            # produce all arg strings
-            elif not action.option_strings:
-                part = self._format_args(action, action.dest)
-
-                # if it's in a group, strip the outer []
-                if action in group_actions:
-                    if part[0] == '[' and part[-1] == ']':
-                        part = part[1:-1]
-
-                # add the action string to the list
-                parts.append(part)
-
-            # produce the first way to invoke the option in brackets
+        i = 0
+        while i < len(actions):
+            if i in group_starts:
+                group, end = group_starts[i]
+                members = [self._format_action_usage(action, group_actions)
+                           for action in actions[i:end]]
+                members = [part for part in members if part is not None]
+                if len(members) == 1 and group.required:
+                    parts.append(members[0])
+                elif members:
+                    if group.required:
+                        open, close = '(', ')'
+                    else:
+                        open, close = '[', ']'
+                    parts.append(open + ' | '.join(members) + close)
+                i = end
             else:
-                option_string = action.option_strings[0]
-
-                # if the Optional doesn't take a value, format is:
-                #    -s or --long
-                if action.nargs == 0:
-                    part = '%s' % option_string
+                part = self._format_action_usage(actions[i], group_actions)
+                if part is not None:
+                    parts.append(part)
+                i += 1
+        return parts
+
+    def _format_action_usage(self, action, group_actions):
+        # suppressed arguments are marked with None
+        if action.help is SUPPRESS:
+            return None
 
-                # if the Optional takes a value, format is:
-                #    -s ARGS or --long ARGS
-                else:
-                    default = action.dest.upper()
-                    args_string = self._format_args(action, default)
-                    part = '%s %s' % (option_string, args_string)
+        # produce all arg strings
+        elif not action.option_strings:
+            part = self._format_args(action, action.dest)
 
-                # make it look optional if it's not required or in a group
-                if not action.required and action not in group_actions:
-                    part = '[%s]' % part
+            # if it's in a group, strip the outer []
+            if action in group_actions:
+                if part[0] == '[' and part[-1] == ']':
+                    part = part[1:-1]
 
-                # add the action string to the list
-                parts.append(part)
+        # produce the first way to invoke the option in brackets
+        else:
+            option_string = action.option_strings[0]
 
-        # insert things at the necessary indices
-        for i in sorted(inserts, reverse=True):
-            parts[i:i] = [inserts[i]]
+            # if the Optional doesn't take a value, format is:
+            #    -s or --long
+            if action.nargs == 0:
+                part = '%s' % option_string
 
-        # join all the action items with spaces
-        text = ' '.join([item for item in parts if item is not None])
+            # if the Optional takes a value, format is:
+            #    -s ARGS or --long ARGS
+            else:
+                default = action.dest.upper()
+                args_string = self._format_args(action, default)
+                part = '%s %s' % (option_string, args_string)
 
-        # clean up separators for mutually exclusive groups
-        open = r'[\[(]'
-        close = r'[\])]'
-        text = _re.sub(r'(%s) ' % open, r'\1', text)
-        text = _re.sub(r' (%s)' % close, r'\1', text)
-        text = _re.sub(r'%s *%s' % (open, close), r'', text)
-        text = _re.sub(r'\(([^|]*)\)', r'\1', text)
-        text = text.strip()
+            # make it look optional if it's not required or in a group
+            if not action.required and action not in group_actions:
+                part = '[%s]' % part
 
-        # return the text
-        return text
+        return part
 
     def _format_text(self, text):
         if '%(prog)' in text:
@@ -587,7 +644,14 @@ class HelpFormatter(object):
         return result
 
     def _expand_help(self, action):
-        params = dict(vars(action), prog=self._prog)
+        # the standard attributes live in slots, which vars() doesn't see
+        params = {}
+        for cls in reversed(type(action).__mro__):
+            for name in getattr(cls, '__slots__', ()):
+                if name != '__dict__' and hasattr(action, name):
+                    params[name] = getattr(action, name)
+        params.update(getattr(action, '__dict__', {}))
+        params['prog'] = self._prog
         for name in list(params):
             if params[name] is SUPPRESS:
                 del params[name]
@@ -704,6 +768,107 @@ class ArgumentTypeError(Exception):
     pass
 
 
+class _LRUCache(object):
+    """Bounded LRU cache with hit and miss counters.
+
+    Actions added with a *type_cache* size get one for their converted
+    values, keyed by the raw string and consulted by
+    ArgumentParser._get_value(); only successful conversions are stored.
+    The hits and misses counters can be used to tune the size.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._map = {}
+        # circular doubly linked list of [prev, next, key, value] links,
+        # most recently used just before the root
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self._map)
+
+    def __repr__(self):
+        return '%s(maxsize=%r, currsize=%r, hits=%r, misses=%r)' % (
+            type(self).__name__, self.maxsize, len(self._map),
+            self.hits, self.misses)
+
+    def lookup(self, key):
+        """Return the cached value for *key*, raising KeyError if absent."""
+        try:
+            link = self._map[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        # move the link to the most recently used position
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+        root = self._root
+        last = root[0]
+        last[1] = root[0] = link
+        link[0] = last
+        link[1] = root
+        return link[3]
+
+    def store(self, key, value):
+        if key in self._map or self.maxsize <= 0:
+            return
+        root = self._root
+        if len(self._map) >= self.maxsize:
+            # evict the least recently used entry
+            oldest = root[1]
+            root[1] = oldest[1]
+            oldest[1][0] = root
+            del self._map[oldest[2]]
+        last = root[0]
+        link = [last, root, key, value]
+        last[1] = root[0] = self._map[key] = link
+
+    def clear(self):
+        """Drop all cached values, keeping the counters."""
+        self._map.clear()
+        root = self._root
+        root[:] = [root, root, None, None]
+
+    def __getstate__(self):
+        # the cached values needn't be picklable, so a pickled cache is
+        # an empty one of the same size
+        state = self.__dict__.copy()
+        state['_map'] = {}
+        del state['_root']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+
+class _ParsePlan(dict):
+    """The parse plan shared by a container and its groups.
+
+    Everything in it is derived from the actions (and the generated
+    namespace class can't be pickled), so a pickled plan is an empty
+    one, filled again by the next parse. Pickling keeps it shared.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return _ParsePlan, ()
+
+
+def _intern_suppress(value):
+    # SUPPRESS is compared by identity, but unpickling makes a new string
+    if type(value) is str and value == SUPPRESS:
+        return SUPPRESS
+    return value
+
+
 # ==============
 # Action classes
 # ==============
@@ -757,8 +922,32 @@ class Action(_AttributeHolder):
 
         - metavar -- The name to be used for the option's argument with the
             help string. If None, the 'dest' value will be used as the name.
+
+    Actions added with add_argument(..., type_cache=N) also carry a
+    type_cache attribute holding the LRU cache of converted values (see
+    ArgumentParser._get_value); it is None otherwise.
     """
 
+    # parsers can hold thousands of actions, so the standard attributes
+    # live in slots; the instance dict (only allocated when used) keeps
+    # room for type caches and attributes set by other code
+    __slots__ = (
+        'option_strings',
+        'dest',
+        'nargs',
+        'const',
+        'default',
+        'type',
+        'choices',
+        'required',
+        'help',
+        'metavar',
+        'container',
+        '__dict__',
+    )
+
+    type_cache = None
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -795,12 +984,24 @@ class Action(_AttributeHolder):
         ]
         return [(name, getattr(self, name)) for name in names]
 
+    def __setstate__(self, state):
+        # pickle protocol 2 passes the instance dict and the slot values
+        if isinstance(state, tuple):
+            states = state
+        else:
+            states = state,
+        for values in states:
+            for name, value in (values or {}).items():
+                setattr(self, name, _intern_suppress(value))
+
     def __call__(self, parser, namespace, values, option_string=None):
         raise NotImplementedError(_('.__call__() not defined'))
 
 
 class _StoreAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -836,6 +1037,8 @@ class _StoreAction(Action):
 
 class _StoreConstAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -859,6 +1062,8 @@ class _StoreConstAction(Action):
 
 class _StoreTrueAction(_StoreConstAction):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -876,6 +1081,8 @@ class _StoreTrueAction(_StoreConstAction):
 
 class _StoreFalseAction(_StoreConstAction):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -893,6 +1100,8 @@ class _StoreFalseAction(_StoreConstAction):
 
 class _AppendAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -930,6 +1139,8 @@ class _AppendAction(Action):
 
 class _AppendConstAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -956,6 +1167,8 @@ class _AppendConstAction(Action):
 
 class _CountAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest,
@@ -977,6 +1190,8 @@ class _CountAction(Action):
 
 class _HelpAction(Action):
 
+    __slots__ = ()
+
     def __init__(self,
                  option_strings,
                  dest=SUPPRESS,
@@ -996,6 +1211,8 @@ class _HelpAction(Action):
 
 class _VersionAction(Action):
 
+    __slots__ = ('version',)
+
     def __init__(self,
                  option_strings,
                  version=None,
@@ -1021,12 +1238,38 @@ class _VersionAction(Action):
 
 class _SubParsersAction(Action):
 
+    __slots__ = (
+        '_prog_prefix',
+        '_parser_class',
+        '_name_parser_map',
+        '_choices_actions',
+    )
+
     class _ChoicesPseudoAction(Action):
 
+        __slots__ = ()
+
         def __init__(self, name, help):
             sup = super(_SubParsersAction._ChoicesPseudoAction, self)
             sup.__init__(option_strings=[], dest=name, help=help)
 
+    class _LazyParser(object):
+        """A subparser whose factory has not been called yet."""
+
+        def __init__(self, factory, kwargs):
+            self.factory = factory
+            self.kwargs = kwargs
+
+        def build(self, parser_class):
+            factory = self.factory
+            if isinstance(factory, basestring):
+                factory = _import_object(factory)
+            parser = parser_class(**self.kwargs)
+            result = factory(parser)
+            if result is not None:
+                parser = result
+            return parser
+
     def __init__(self,
                  option_strings,
                  prog,
@@ -1049,6 +1292,18 @@ class _SubParsersAction(Action):
             metavar=metavar)
 
     def add_parser(self, name, **kwargs):
+        """
+        add_parser(name, ..., name=value, ...)
+        add_parser(name, factory=callable_or_string, ..., name=value, ...)
+
+        With a factory, the subparser is only created when it is needed
+        (e.g. when the subcommand is selected): the factory, a callable
+        or a 'module:attribute' string naming one, is then called with a
+        new parser to add its arguments to, and may return a different
+        parser to use instead. add_parser() returns None in that case.
+        """
+        factory = kwargs.pop('factory', None)
+
         # set prog from the existing prefix
         if kwargs.get('prog') is None:
             kwargs['prog'] = '%s %s' % (self._prog_prefix, name)
@@ -1059,14 +1314,37 @@ class _SubParsersAction(Action):
             choice_action = self._ChoicesPseudoAction(name, help)
             self._choices_actions.append(choice_action)
 
-        # create the parser and add it to the map
-        parser = self._parser_class(**kwargs)
-        self._name_parser_map[name] = parser
+        # create the parser (or the means to do so) and add it to the map
+        if factory is None:
+            parser = self._parser_class(**kwargs)
+            self._name_parser_map[name] = parser
+        else:
+            parser = None
+            self._name_parser_map[name] = self._LazyParser(factory, kwargs)
+
+        # the new choice shows up in the help of the parent parser
+        container = getattr(self, 'container', None)
+        if container is not None:
+            container._parse_plan.clear()
         return parser
 
     def _get_subactions(self):
         return self._choices_actions
 
+    def _get_parser(self, name):
+        # return the subparser for name, calling its factory if needed;
+        # errors from the factory are not mistaken for an unknown name
+        try:
+            parser = self._name_parser_map[name]
+        except KeyError:
+            tup = name, ', '.join(self._name_parser_map)
+            msg = _('unknown parser %r (choices: %s)' % tup)
+            raise ArgumentError(self, msg)
+        if isinstance(parser, self._LazyParser):
+            parser = parser.build(self._parser_class)
+            self._name_parser_map[name] = parser
+        return parser
+
     def __call__(self, parser, namespace, values, option_string=None):
         parser_name = values[0]
         arg_strings = values[1:]
@@ -1075,20 +1353,26 @@ class _SubParsersAction(Action):
         if self.dest is not SUPPRESS:
             setattr(namespace, self.dest, parser_name)
 
-        # select the parser
-        try:
-            parser = self._name_parser_map[parser_name]
-        except KeyError:
-            tup = parser_name, ', '.join(self._name_parser_map)
-            msg = _('unknown parser %r (choices: %s)' % tup)
-            raise ArgumentError(self, msg)
+        # select the parser; if the parent raises its errors instead of
+        # exiting (see cli.app.ArgumentParser), so does the subparser
+        raise_errors = getattr(parser, '_raise_errors', False)
+        parser = self._get_parser(parser_name)
+        saved_raise_errors = getattr(parser, '_raise_errors', False)
+        if raise_errors:
+            parser._raise_errors = True
 
         # parse all the remaining options into the namespace
         # store any unrecognized options on the object, so that the top
         # level parser can decide what to do with them
-        namespace, arg_strings = parser.parse_known_args(arg_strings, namespace)
+        try:
+            namespace, arg_strings = parser.parse_known_args(arg_strings,
+                                                             namespace)
+        finally:
+            if raise_errors:
+                parser._raise_errors = saved_raise_errors
         if arg_strings:
-            vars(namespace).setdefault(_UNRECOGNIZED_ARGS_ATTR, [])
+            if not hasattr(namespace, _UNRECOGNIZED_ARGS_ATTR):
+                setattr(namespace, _UNRECOGNIZED_ARGS_ATTR, [])
             getattr(namespace, _UNRECOGNIZED_ARGS_ATTR).extend(arg_strings)
 
 
@@ -1100,7 +1384,9 @@ class FileType(object):
     """Factory for creating file object types
 
     Instances of FileType are typically passed as type= arguments to the
-    ArgumentParser add_argument() method.
+    ArgumentParser add_argument() method. Since every call opens a new file,
+    FileType is never memoized (see the type_cache argument of
+    add_argument()).
 
     Keyword Arguments:
         - mode -- A string indicating how the file is to be opened. Accepts the
@@ -1109,6 +1395,8 @@ class FileType(object):
             the builtin open() function.
     """
 
+    cacheable = False
+
     def __init__(self, mode='r', bufsize=None):
         self._mode = mode
         self._bufsize = bufsize
@@ -1162,6 +1450,134 @@ class Namespace(_AttributeHolder):
         return key in self.__dict__
 
 
+# the real per-instance dict, which _SlotsNamespace hides behind a property
+_instance_dict = Namespace.__dict__['__dict__'].__get__
+
+_identifier_matcher = _re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_namespace_classes = {}
+
+
+class _SlotsNamespace(Namespace):
+    """Base class for the compact Namespaces generated by ArgumentParser.
+
+    The destinations known to the parser are stored in __slots__; anything
+    else (e.g. attributes set by subparsers or custom actions) goes to the
+    usual instance dict. vars() and __dict__ return a merged copy, so
+    equality, __contains__ and repr behave as for a plain Namespace; the
+    copy passes writes (vars(ns)[name] = value, setdefault(), ...) on to
+    the namespace, but doesn't see attributes set after it was made.
+    Methods are kept off the class, so no destination can hide them.
+    """
+
+    __slots__ = ()
+
+    def _get_dict(self):
+        result = _NamespaceDict(self)
+        for name in type(self).__slots__:
+            try:
+                dict.__setitem__(result, name, getattr(self, name))
+            except AttributeError:
+                pass
+        dict.update(result, _instance_dict(self))
+        return result
+
+    __dict__ = property(_get_dict)
+    del _get_dict
+
+    def __reduce__(self):
+        return _new_namespace, (type(self).__slots__, dict(self.__dict__))
+
+
+class _NamespaceDict(dict):
+    """The vars() of a _SlotsNamespace, passing writes on to it."""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def __setitem__(self, name, value):
+        setattr(self.namespace, name, value)
+        dict.__setitem__(self, name, value)
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        delattr(self.namespace, name)
+
+    def setdefault(self, name, value=None):
+        if name not in self:
+            self[name] = value
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def pop(self, name, *default):
+        if name not in self:
+            return dict.pop(self, name, *default)
+        value = self[name]
+        del self[name]
+        return value
+
+    def popitem(self):
+        name, value = dict.popitem(self)
+        delattr(self.namespace, name)
+        return name, value
+
+    def clear(self):
+        for name in list(self):
+            del self[name]
+
+
+def _update_namespace(namespace, other):
+    # copy the values of a _SlotsNamespace slot by slot, then any extra
+    # attributes
+    for name in type(other).__slots__:
+        try:
+            setattr(namespace, name, getattr(other, name))
+        except AttributeError:
+            pass
+    for name, value in _instance_dict(other).items():
+        setattr(namespace, name, value)
+
+
+def _namespace_class(names):
+    # one class per set of slot names, named Namespace for repr()
+    try:
+        return _namespace_classes[names]
+    except KeyError:
+        cls = type('Namespace', (_SlotsNamespace,), dict(__slots__=names))
+        _namespace_classes[names] = cls
+        return cls
+
+
+def _new_namespace(names, attrs):
+    # unpickle a _SlotsNamespace
+    return _namespace_class(names)(**attrs)
+
+
+class ParseState(_AttributeHolder):
+    """The state of an incomplete command line, from parse_partial().
+
+    parser is the parser the last words went to; it is a subparser if
+    commands were chosen, and their names are in path. action is the action
+    that would consume another word, if any, and option_string the option
+    that started it. consumed maps each action seen to the number of words
+    it consumed, positionals lists the positionals of parser that did not
+    consume any yet, extras the words no action took, and error is the
+    message of the error that stopped the parse, or None.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.path = []
+        self.action = None
+        self.option_string = None
+        self.consumed = {}
+        self.positionals = []
+        self.extras = []
+        self.error = None
+
+
 class _ActionsContainer(object):
 
     def __init__(self,
@@ -1199,10 +1615,19 @@ class _ActionsContainer(object):
         self._actions = []
         self._option_string_actions = {}
 
+        # sorted list of the keys of _option_string_actions, used to look
+        # up abbreviated options by prefix
+        self._option_string_index = []
+
         # groups
         self._action_groups = []
         self._mutually_exclusive_groups = []
 
+        # maps each action to the mutually exclusive groups it belongs to,
+        # kept up to date by _MutuallyExclusiveGroup and reused by every
+        # parse to check for conflicts
+        self._mutex_conflicts = {}
+
         # defaults storage
         self._defaults = {}
 
@@ -1213,6 +1638,20 @@ class _ActionsContainer(object):
         # numbers -- uses a list so it can be shared and edited
         self._has_negative_number_optionals = []
 
+        # state derived from the actions for parsing (compiled nargs
+        # regexes for single actions and runs of positionals, the namespace
+        # class) -- a dict so it can be shared with groups and cleared
+        # whenever the set of actions changes
+        self._parse_plan = _ParsePlan()
+
+    def __setstate__(self, state):
+        # restore the SUPPRESS sentinel (see Action.__setstate__)
+        for name, value in state.items():
+            self.__dict__[name] = _intern_suppress(value)
+        defaults = self._defaults
+        for dest, value in defaults.items():
+            defaults[dest] = _intern_suppress(value)
+
     # ====================
     # Registration methods
     # ====================
@@ -1228,6 +1667,7 @@ class _ActionsContainer(object):
     # ==================================
     def set_defaults(self, **kwargs):
         self._defaults.update(kwargs)
+        self._parse_plan.clear()
 
         # if these defaults match any existing arguments, replace
         # the previous default on the object with the new one
@@ -1250,6 +1690,22 @@ class _ActionsContainer(object):
         add_argument(dest, ..., name=value, ...)
         add_argument(option_string, option_string, ..., name=value, ...)
         """
+        return self._add_action(self._create_action(*args, **kwargs))
+
+    def add_arguments(self, specs):
+        """
+        add_arguments([(args, kwargs), ...])
+
+        Create the actions for several add_argument() calls and add them
+        all at once. Nothing is added if any of them is invalid or (with
+        the 'error' conflict handler) conflicts with another option.
+        Returns the list of created actions.
+        """
+        actions = [self._create_action(*args, **kwargs)
+                   for args, kwargs in specs]
+        return self._add_actions(actions)
+
+    def _create_action(self, *args, **kwargs):
 
         # if no positional args are supplied or only one is supplied and
         # it doesn't look like an option string, parse a positional
@@ -1273,6 +1729,7 @@ class _ActionsContainer(object):
                 kwargs['default'] = self.argument_default
 
         # create the action object, and add it to the parser
+        type_cache = kwargs.pop('type_cache', None)
         action_class = self._pop_action_class(kwargs)
         if not _callable(action_class):
             raise ValueError('unknown action "%s"' % action_class)
@@ -1283,7 +1740,12 @@ class _ActionsContainer(object):
         if not _callable(type_func):
             raise ValueError('%r is not callable' % type_func)
 
-        return self._add_action(action)
+        # memoize conversions, unless the type has side effects (FileType
+        # and other types that set cacheable = False)
+        if type_cache and getattr(type_func, 'cacheable', True):
+            action.type_cache = _LRUCache(type_cache)
+
+        return action
 
     def add_argument_group(self, *args, **kwargs):
         group = _ArgumentGroup(self, *args, **kwargs)
@@ -1302,9 +1764,12 @@ class _ActionsContainer(object):
         # add to actions list
         self._actions.append(action)
         action.container = self
+        self._parse_plan.clear()
 
         # index the action by any option strings it has
         for option_string in action.option_strings:
+            if option_string not in self._option_string_actions:
+                _bisect.insort(self._option_string_index, option_string)
             self._option_string_actions[option_string] = action
 
         # set the flag if any option strings look like negative numbers
@@ -1316,8 +1781,61 @@ class _ActionsContainer(object):
         # return the created action
         return action
 
+    def _add_actions(self, actions):
+        # find conflicts with existing options and within the batch with
+        # a single pass over a dict of the new option strings
+        new_option_strings = {}
+        for action in actions:
+            confl_optionals = []
+            for option_string in action.option_strings:
+                confl_optional = new_option_strings.get(option_string)
+                if confl_optional is None:
+                    confl_optional = self._option_string_actions.get(
+                        option_string)
+                if confl_optional not in (None, action):
+                    confl_optionals.append((option_string, confl_optional))
+                new_option_strings[option_string] = action
+
+            # the 'error' handler raises before anything was added; other
+            # handlers modify the actions, so add them one at a time
+            if confl_optionals:
+                if self.conflict_handler == 'error':
+                    self._get_handler()(action, confl_optionals)
+                for action in actions:
+                    self._add_action(action)
+                return actions
+
+        # add all the actions and their option strings in one step
+        self._actions.extend(actions)
+        for action in actions:
+            action.container = self
+        self._parse_plan.clear()
+        self._option_string_actions.update(new_option_strings)
+        self._option_string_index.extend(new_option_strings)
+        self._option_string_index.sort()
+
+        # set the flag if any option strings look like negative numbers
+        if not self._has_negative_number_optionals:
+            for option_string in new_option_strings:
+                if self._negative_number_matcher.match(option_string):
+                    self._has_negative_number_optionals.append(True)
+                    break
+
+        return actions
+
     def _remove_action(self, action):
         self._actions.remove(action)
+        self._parse_plan.clear()
+
+        # drop any option strings that still point at the action
+        for option_string in action.option_strings:
+            if self._option_string_actions.get(option_string) is action:
+                self._pop_option_string(option_string)
+
+    def _pop_option_string(self, option_string):
+        if self._option_string_actions.pop(option_string, None) is not None:
+            index = self._option_string_index
+            del index[_bisect.bisect_left(index, option_string)]
 
     def _add_container_actions(self, container):
         # collect groups by titles
@@ -1387,7 +1905,10 @@ class _ActionsContainer(object):
                 tup = option_string, self.prefix_chars
                 raise ValueError(msg % tup)
 
-            # strings starting with two prefix characters are long options
+            # strings starting with two prefix characters are long options;
+            # interning shares them between parsers built from the same
+            # generated option names
+            option_string = _intern(option_string)
             option_strings.append(option_string)
             if option_string[0] in self.prefix_chars:
                 if len(option_string) > 1:
@@ -1405,7 +1926,7 @@ class _ActionsContainer(object):
             if not dest:
                 msg = _('dest= is required for options like %r')
                 raise ValueError(msg % option_string)
-            dest = dest.replace('-', '_')
+            dest = _intern(dest.replace('-', '_'))
 
         # return the updated keyword arguments
         return dict(kwargs, dest=dest, option_strings=option_strings)
@@ -1451,7 +1972,7 @@ class _ActionsContainer(object):
 
             # remove the conflicting option
             action.option_strings.remove(option_string)
-            self._option_string_actions.pop(option_string, None)
+            self._pop_option_string(option_string)
 
             # if the option now has no option string, remove it from the
             # container holding it
@@ -1478,15 +1999,27 @@ class _ArgumentGroup(_ActionsContainer):
         self._registries = container._registries
         self._actions = container._actions
         self._option_string_actions = container._option_string_actions
+        self._option_string_index = container._option_string_index
+        self._mutex_conflicts = container._mutex_conflicts
         self._defaults = container._defaults
         self._has_negative_number_optionals = \
             container._has_negative_number_optionals
+        self._parse_plan = container._parse_plan
 
     def _add_action(self, action):
         action = super(_ArgumentGroup, self)._add_action(action)
         self._group_actions.append(action)
         return action
 
+    def _add_actions(self, actions):
+        # actions added one by one (after a resolved conflict) already
+        # went through _add_action
+        count = len(self._group_actions)
+        actions = super(_ArgumentGroup, self)._add_actions(actions)
+        if len(self._group_actions) == count:
+            self._group_actions.extend(actions)
+        return actions
+
     def _remove_action(self, action):
         super(_ArgumentGroup, self)._remove_action(action)
         self._group_actions.remove(action)
@@ -1505,11 +2038,27 @@ class _MutuallyExclusiveGroup(_ArgumentGroup):
             raise ValueError(msg)
         action = self._container._add_action(action)
         self._group_actions.append(action)
+        self._mutex_conflicts.setdefault(action, []).append(self)
         return action
 
+    def _add_actions(self, actions):
+        for action in actions:
+            if action.required:
+                msg = _('mutually exclusive arguments must be optional')
+                raise ValueError(msg)
+        actions = self._container._add_actions(actions)
+        self._group_actions.extend(actions)
+        for action in actions:
+            self._mutex_conflicts.setdefault(action, []).append(self)
+        return actions
+
     def _remove_action(self, action):
         self._container._remove_action(action)
         self._group_actions.remove(action)
+        groups = self._mutex_conflicts[action]
+        groups.remove(self)
+        if not groups:
+            del self._mutex_conflicts[action]
 
 
 class ArgumentParser(_AttributeHolder, _ActionsContainer):
@@ -1525,6 +2074,13 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         - prefix_chars -- Characters that prefix optional arguments
         - fromfile_prefix_chars -- Characters that prefix files containing
             additional arguments
+        - fromfile_streaming -- Expand argument files while parsing instead of
+            up front; their contents are taken as values, never as options,
+            and '*' or '+' arguments receive an iterator over them
+        - fromfile_max_depth -- How deeply argument files may include other
+            argument files (default: unlimited)
+        - fromfile_max_args -- How many arguments argument files may supply
+            in total (default: unlimited)
         - argument_default -- The default value for all arguments
         - conflict_handler -- String indicating how to handle conflicts
         - add_help -- Add a -h/-help option
@@ -1542,7 +2098,10 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
                  fromfile_prefix_chars=None,
                  argument_default=None,
                  conflict_handler='error',
-                 add_help=True):
+                 add_help=True,
+                 fromfile_streaming=False,
+                 fromfile_max_depth=None,
+                 fromfile_max_args=None):
 
         if version is not None:
             import warnings
@@ -1568,6 +2127,9 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         self.version = version
         self.formatter_class = formatter_class
         self.fromfile_prefix_chars = fromfile_prefix_chars
+        self.fromfile_streaming = fromfile_streaming
+        self.fromfile_max_depth = fromfile_max_depth
+        self.fromfile_max_args = fromfile_max_args
         self.add_help = add_help
 
         add_group = self.add_argument_group
@@ -1576,9 +2138,7 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         self._subparsers = None
 
         # register types
-        def identity(string):
-            return string
-        self.register('type', None, identity)
+        self.register('type', None, _identity)
 
         # add help and version arguments if necessary
         # (using explicit default to override global argument_default)
@@ -1664,6 +2224,20 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             self._positionals._add_action(action)
         return action
 
+    def _add_actions(self, actions):
+        optionals = [action for action in actions if action.option_strings]
+        positionals = [action for action in actions
+                       if not action.option_strings]
+        if len(optionals) == len(actions):
+            self._optionals._add_actions(actions)
+        elif len(positionals) == len(actions):
+            self._positionals._add_actions(actions)
+        else:
+            # keep the relative order of optionals and positionals
+            for action in actions:
+                self._add_action(action)
+        return actions
+
     def _get_optional_actions(self):
         return [action
                 for action in self._actions
@@ -1691,7 +2265,7 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
 
         # default Namespace built from parser defaults
         if namespace is None:
-            namespace = Namespace()
+            namespace = self._get_namespace_class()()
 
         # add any action defaults that aren't present
         for action in self._actions:
@@ -1719,34 +2293,67 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             err = _sys.exc_info()[1]
             self.error(str(err))
 
+    def _get_namespace_class(self):
+        # a Namespace class with slots for every destination that can be
+        # a slot name; it is rebuilt when the actions or defaults change
+        try:
+            return self._parse_plan['namespace']
+        except KeyError:
+            names = set(self._defaults)
+            for action in self._actions:
+                if action.dest is not SUPPRESS:
+                    names.add(action.dest)
+            names = [name for name in names
+                     if isinstance(name, str) and
+                     not name.startswith('__') and
+                     _identifier_matcher.match(name) and
+                     not hasattr(_SlotsNamespace, name)]
+            cls = _namespace_class(tuple(sorted(names)))
+            self._parse_plan['namespace'] = cls
+            return cls
+
     def _parse_known_args(self, arg_strings, namespace):
-        # replace arg strings that are file references
+        # parsers that only have optionals don't need the generic
+        # pattern matching below
+        optionals_only, remainder = self._get_optionals_only()
+        if optionals_only:
+            return self._parse_known_optionals(arg_strings, namespace,
+                                               remainder)
+
+        # replace arg strings that are file references, or just mark them
+        # if they will be expanded by the actions consuming them
         if self.fromfile_prefix_chars is not None:
-            arg_strings = self._read_args_from_files(arg_strings)
-
-        # map all mutually exclusive arguments to the other arguments
-        # they can't occur with
-        action_conflicts = {}
-        for mutex_group in self._mutually_exclusive_groups:
-            group_actions = mutex_group._group_actions
-            for i, mutex_action in enumerate(mutex_group._group_actions):
-                conflicts = action_conflicts.setdefault(mutex_action, [])
-                conflicts.extend(group_actions[:i])
-                conflicts.extend(group_actions[i + 1:])
+            if self.fromfile_streaming:
+                chars = self.fromfile_prefix_chars
+                arg_strings = [
+                    arg_string and arg_string[0] in chars and
+                    _ArgFile(arg_string) or arg_string
+                    for arg_string in arg_strings]
+            else:
+                arg_strings = self._read_args_from_files(arg_strings)
 
         # find all option indices, and determine the arg_string_pattern
         # which has an 'O' if there is an option at an index,
         # an 'A' if there is an argument, or a '-' if there is a '--'
         option_string_indices = {}
+        option_string_index_list = []
+        double_dash_index = None
         arg_string_pattern_parts = []
-        arg_strings_iter = iter(arg_strings)
-        for i, arg_string in enumerate(arg_strings_iter):
+        prefix_chars = self.prefix_chars
+        for i, arg_string in enumerate(arg_strings):
 
-            # all args after -- are non-options
+            # all args after -- are non-options (whatever the prefix chars)
             if arg_string == '--':
+                double_dash_index = i
                 arg_string_pattern_parts.append('-')
-                for arg_string in arg_strings_iter:
-                    arg_string_pattern_parts.append('A')
+                remaining = len(arg_strings) - i - 1
+                arg_string_pattern_parts.append('A' * remaining)
+                break
+
+            # plain arguments can't be options; this is checked before
+            # looking them up as they make up the bulk of long command lines
+            elif not arg_string or arg_string[0] not in prefix_chars:
+                arg_string_pattern_parts.append('A')
 
             # otherwise, add the arg to the arg strings
             # and note the index if it was an option
@@ -1756,6 +2363,7 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
                     pattern = 'A'
                 else:
                     option_string_indices[i] = option_tuple
+                    option_string_index_list.append(i)
                     pattern = 'O'
                 arg_string_pattern_parts.append(pattern)
 
@@ -1763,28 +2371,12 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         arg_strings_pattern = ''.join(arg_string_pattern_parts)
 
         # converts arg strings to the appropriate and then takes the action
-        seen_actions = set()
-        seen_non_default_actions = set()
+        seen = set(), set(), {}
+        seen_actions, seen_non_default_actions, seen_mutex_actions = seen
 
         def take_action(action, argument_strings, option_string=None):
-            seen_actions.add(action)
-            argument_values = self._get_values(action, argument_strings)
-
-            # error if this argument is not allowed with other previously
-            # seen arguments, assuming that actions that use the default
-            # value don't really count as "present"
-            if argument_values is not action.default:
-                seen_non_default_actions.add(action)
-                for conflict_action in action_conflicts.get(action, []):
-                    if conflict_action in seen_non_default_actions:
-                        msg = _('not allowed with argument %s')
-                        action_name = _get_action_name(conflict_action)
-                        raise ArgumentError(action, msg % action_name)
-
-            # take the action if we didn't receive a SUPPRESS value
-            # (e.g. from a default)
-            if argument_values is not SUPPRESS:
-                action(self, namespace, argument_values, option_string)
+            self._take_action(namespace, seen, action, argument_strings,
+                              option_string)
 
         # function to convert arg_strings into an optional action
         def consume_optional(start_index):
@@ -1845,8 +2437,8 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
                 # if successful, exit the loop
                 else:
                     start = start_index + 1
-                    selected_patterns = arg_strings_pattern[start:]
-                    arg_count = match_argument(action, selected_patterns)
+                    arg_count = match_argument(action, arg_strings_pattern,
+                                               start)
                     stop = start + arg_count
                     args = arg_strings[start:stop]
                     action_tuples.append((action, args, option_string))
@@ -1865,10 +2457,26 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
 
         # function to convert arg_strings into positional actions
         def consume_positionals(start_index):
+            # a single greedy Positional after the last option takes all
+            # the remaining arg strings; no need to match the pattern
+            if (len(positionals) == 1 and
+                    start_index > max_option_string_index and
+                    positionals[0].nargs in (ZERO_OR_MORE, ONE_OR_MORE) and
+                    (double_dash_index is None or
+                     double_dash_index < start_index) and
+                    (start_index < len(arg_strings) or
+                     positionals[0].nargs == ZERO_OR_MORE)):
+                if start_index:
+                    args = arg_strings[start_index:]
+                else:
+                    args = arg_strings
+                take_action(positionals.pop(), args)
+                return len(arg_strings)
+
             # match as many Positionals as possible
             match_partial = self._match_arguments_partial
-            selected_pattern = arg_strings_pattern[start_index:]
-            arg_counts = match_partial(positionals, selected_pattern)
+            arg_counts = match_partial(positionals, arg_strings_pattern,
+                                       start_index)
 
             # slice off the appropriate arg strings for each Positional
             # and add the Positional and its args to the list
@@ -1886,17 +2494,15 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         # passed the last option string
         extras = []
         start_index = 0
-        if option_string_indices:
-            max_option_string_index = max(option_string_indices)
+        if option_string_index_list:
+            max_option_string_index = option_string_index_list[-1]
         else:
             max_option_string_index = -1
         while start_index <= max_option_string_index:
 
             # consume any Positionals preceding the next option
-            next_option_string_index = min([
-                index
-                for index in option_string_indices
-                if index >= start_index])
+            next_option_string_index = option_string_index_list[
+                _bisect.bisect_left(option_string_index_list, start_index)]
             if start_index != next_option_string_index:
                 positionals_end_index = consume_positionals(start_index)
 
@@ -1929,6 +2535,39 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         if positionals:
             self.error(_('too few arguments'))
 
+        # return the updated namespace and the extra arguments
+        self._check_required_actions(seen_actions, seen_non_default_actions)
+        return namespace, extras
+
+    def _take_action(self, namespace, seen, action, argument_strings,
+                     option_string=None):
+        # seen holds the actions seen so far, those that didn't get their
+        # default value and the action present in each mutually exclusive
+        # group; as a second one is an error, there is never more than one
+        # per group
+        seen_actions, seen_non_default_actions, seen_mutex_actions = seen
+        seen_actions.add(action)
+        argument_values = self._get_values(action, argument_strings)
+
+        # error if this argument is not allowed with other previously
+        # seen arguments, assuming that actions that use the default
+        # value don't really count as "present"
+        if argument_values is not action.default:
+            seen_non_default_actions.add(action)
+            for mutex_group in self._mutex_conflicts.get(action, ()):
+                conflict_action = seen_mutex_actions.setdefault(
+                    mutex_group, action)
+                if conflict_action is not action:
+                    msg = _('not allowed with argument %s')
+                    action_name = _get_action_name(conflict_action)
+                    raise ArgumentError(action, msg % action_name)
+
+        # take the action if we didn't receive a SUPPRESS value
+        # (e.g. from a default)
+        if argument_values is not SUPPRESS:
+            action(self, namespace, argument_values, option_string)
+
+    def _check_required_actions(self, seen_actions, seen_non_default_actions):
         # make sure all required actions were present
         for action in self._actions:
             if action.required:
@@ -1951,45 +2590,358 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
                     msg = _('one of the arguments %s is required')
                     self.error(msg % ' '.join(names))
 
-        # return the updated namespace and the extra arguments
+    def _get_optionals_only(self):
+        # the generic parsing can be skipped if there are no positionals
+        # other than a final REMAINDER, no optionals with REMAINDER or
+        # PARSER nargs, and no argument files; returns whether that is the
+        # case and the REMAINDER action, if any
+        try:
+            return self._parse_plan['optionals_only']
+        except KeyError:
+            pass
+        result = False, None
+        if self.fromfile_prefix_chars is None:
+            positionals = self._get_positional_actions()
+            optionals = self._get_optional_actions()
+            if not [action for action in optionals
+                    if action.nargs in (REMAINDER, PARSER)]:
+                if not positionals:
+                    result = True, None
+                elif (len(positionals) == 1 and
+                      positionals[0].nargs == REMAINDER):
+                    result = True, positionals[0]
+        self._parse_plan['optionals_only'] = result
+        return result
+
+    def _parse_known_optionals(self, arg_strings, namespace, remainder):
+        # find all option indices first (as in _parse_known_args) so that
+        # errors like ambiguous options are reported in the same order;
+        # None marks positional-looking strings, '--' and anything after
+        option_tuples = []
+        prefix_chars = self.prefix_chars
+        for arg_string in arg_strings:
+            if arg_string == '--':
+                break
+            elif not arg_string or arg_string[0] not in prefix_chars:
+                option_tuples.append(None)
+            else:
+                option_tuples.append(self._parse_optional(arg_string))
+        options_end = len(option_tuples)
+        option_tuples.extend([None] * (len(arg_strings) - options_end))
+
+        seen = set(), set(), {}
+        seen_actions, seen_non_default_actions, seen_mutex_actions = seen
+        take_action = self._take_action
+        extras = []
+        start_index = 0
+        stop_index = len(arg_strings)
+        while start_index < stop_index:
+            option_tuple = option_tuples[start_index]
+
+            # the first positional-looking string starts the REMAINDER;
+            # without one, it is an extra argument
+            if option_tuple is None:
+                if remainder is not None:
+                    break
+                extras.append(arg_strings[start_index])
+                start_index += 1
+                continue
+
+            # unknown options are extra arguments too
+            action, option_string, explicit_arg = option_tuple
+            if action is None:
+                extras.append(arg_strings[start_index])
+                start_index += 1
+                continue
+
+            # single-dash options may be followed by more of them, or by
+            # their argument, in the same arg string (-xyz, -fVALUE)
+            action_tuples = []
+            while explicit_arg is not None:
+                arg_count = self._match_argument(action, 'A')
+                if arg_count == 0 and option_string[1] not in prefix_chars:
+                    action_tuples.append((action, [], option_string))
+                    char = option_string[0]
+                    option_string = char + explicit_arg[0]
+                    new_explicit_arg = explicit_arg[1:] or None
+                    optionals_map = self._option_string_actions
+                    if option_string in optionals_map:
+                        action = optionals_map[option_string]
+                        explicit_arg = new_explicit_arg
+                    else:
+                        msg = _('ignored explicit argument %r')
+                        raise ArgumentError(action, msg % explicit_arg)
+                elif arg_count == 1:
+                    action_tuples.append((action, [explicit_arg],
+                                          option_string))
+                    start_index += 1
+                    break
+                else:
+                    msg = _('ignored explicit argument %r')
+                    raise ArgumentError(action, msg % explicit_arg)
+
+            # otherwise the option takes the following positional-looking
+            # strings its nargs asks for
+            else:
+                start = start_index + 1
+                arg_count = self._count_arguments(action, option_tuples,
+                                                  start, options_end)
+                start_index = start + arg_count
+                args = arg_strings[start:start_index]
+                action_tuples.append((action, args, option_string))
+
+            for action, args, option_string in action_tuples:
+                take_action(namespace, seen, action, args, option_string)
+
+        # the REMAINDER gets everything from the first positional-looking
+        # string, or nothing
+        if remainder is not None:
+            take_action(namespace, seen, remainder, arg_strings[start_index:])
+
+        self._check_required_actions(seen_actions, seen_non_default_actions)
         return namespace, extras
 
+    def parse_partial(self, words):
+        # run the parsing state machine over the words of an incomplete
+        # command line, e.g. those before the cursor when completing; no
+        # values are converted and no actions are taken, and errors are
+        # recorded in the returned ParseState instead of being reported
+        state = ParseState(self)
+        try:
+            self._parse_partial(list(words), state)
+        except ArgumentError:
+            state.error = str(_sys.exc_info()[1])
+        return state
+
+    def _parse_partial(self, words, state):
+        # an argument is appended for the word that comes next; the action
+        # that would consume it is the pending one
+        arg_strings = words + ['']
+        end = len(words)
+        state.parser = self
+
+        # find the option indices and the pattern as _parse_known_args does
+        option_string_indices = {}
+        arg_string_pattern_parts = []
+        prefix_chars = self.prefix_chars
+        for i, arg_string in enumerate(arg_strings):
+            if arg_string == '--':
+                arg_string_pattern_parts.append('-')
+                remaining = len(arg_strings) - i - 1
+                arg_string_pattern_parts.append('A' * remaining)
+                break
+            elif not arg_string or arg_string[0] not in prefix_chars:
+                arg_string_pattern_parts.append('A')
+            else:
+                option_tuple = self._parse_optional(arg_string)
+                if option_tuple is None:
+                    pattern = 'A'
+                else:
+                    option_string_indices[i] = option_tuple
+                    pattern = 'O'
+                arg_string_pattern_parts.append(pattern)
+        arg_strings_pattern = ''.join(arg_string_pattern_parts)
+        option_string_index_list = sorted(option_string_indices)
+
+        consumed = state.consumed
+
+        def take_action(action, start, stop, option_string=None):
+            # a subparsers action hands the words after the command name
+            # to that command's parser
+            if action.nargs == PARSER and start < end:
+                parser_name = arg_strings[start]
+                parser = action._get_parser(parser_name)
+                consumed[action] = consumed.get(action, 0) + 1
+                state.path.append(parser_name)
+                parser._parse_partial(arg_strings[start + 1:end], state)
+                return
+            if stop > end:
+                if start <= end:
+                    state.action = action
+                    state.option_string = option_string
+                stop = max(start, end)
+            consumed[action] = consumed.get(action, 0) + stop - start
+
+        def consume_optional(start_index):
+            action, option_string, explicit_arg = \
+                option_string_indices[start_index]
+            while True:
+                if action is None:
+                    extras.append(arg_strings[start_index])
+                    return start_index + 1
+
+                # combined single-dash options and explicit arguments are
+                # matched as in _parse_known_args
+                if explicit_arg is not None:
+                    arg_count = self._match_argument(action, 'A')
+                    chars = self.prefix_chars
+                    if arg_count == 0 and option_string[1] not in chars:
+                        take_action(action, start_index, start_index,
+                                    option_string)
+                        char = option_string[0]
+                        option_string = char + explicit_arg[0]
+                        new_explicit_arg = explicit_arg[1:] or None
+                        optionals_map = self._option_string_actions
+                        if option_string in optionals_map:
+                            action = optionals_map[option_string]
+                            explicit_arg = new_explicit_arg
+                        else:
+                            msg = _('ignored explicit argument %r')
+                            raise ArgumentError(action, msg % explicit_arg)
+                    elif arg_count == 1:
+                        take_action(action, start_index, start_index + 1,
+                                    option_string)
+                        return start_index + 1
+                    else:
+                        msg = _('ignored explicit argument %r')
+                        raise ArgumentError(action, msg % explicit_arg)
+
+                # an option that is short of arguments is still waiting
+                # for them if only arguments follow it
+                else:
+                    start = start_index + 1
+                    try:
+                        arg_count = self._match_argument(
+                            action, arg_strings_pattern, start)
+                    except ArgumentError:
+                        arg_count = len(arg_strings) - start
+                        if arg_strings_pattern.count('A', start) != arg_count:
+                            raise
+                    take_action(action, start, start + arg_count,
+                                option_string)
+                    return start + arg_count
+
+        positionals = self._get_positional_actions()
+
+        def consume_positionals(start_index):
+            match_partial = self._match_arguments_partial
+            arg_counts = match_partial(positionals, arg_strings_pattern,
+                                       start_index)
+            for action, arg_count in zip(positionals, arg_counts):
+                take_action(action, start_index, start_index + arg_count)
+                start_index += arg_count
+            positionals[:] = positionals[len(arg_counts):]
+            return start_index
+
+        # consume Positionals and Optionals alternately
+        extras = state.extras
+        start_index = 0
+        if option_string_index_list:
+            max_option_string_index = option_string_index_list[-1]
+        else:
+            max_option_string_index = -1
+        while start_index <= max_option_string_index:
+            next_option_string_index = option_string_index_list[
+                _bisect.bisect_left(option_string_index_list, start_index)]
+            if start_index != next_option_string_index:
+                positionals_end_index = consume_positionals(start_index)
+                if positionals_end_index > start_index:
+                    start_index = positionals_end_index
+                    continue
+                else:
+                    start_index = positionals_end_index
+            if start_index not in option_string_indices:
+                strings = arg_strings[start_index:next_option_string_index]
+                extras.extend(strings)
+                start_index = next_option_string_index
+            start_index = consume_optional(start_index)
+
+        # the Positional that is short of arguments at the end gets the
+        # remaining ones and waits for more
+        stop_index = consume_positionals(start_index)
+        if positionals and stop_index < len(arg_strings):
+            take_action(positionals[0], stop_index, len(arg_strings))
+            stop_index = len(arg_strings)
+        extras.extend(arg_strings[stop_index:end])
+
+        # a subparser may have taken over the state
+        if state.parser is self:
+            state.positionals = [action
+                                 for action in self._get_positional_actions()
+                                 if not consumed.get(action)]
+
+    def _count_arguments(self, action, option_tuples, start, stop):
+        # count the arguments for an optional among the positional-looking
+        # strings from start (but not past stop), as _match_argument does
+        nargs = action.nargs
+        if nargs is None:
+            required = wanted = 1
+        elif nargs == OPTIONAL:
+            required, wanted = 0, 1
+        elif nargs == ZERO_OR_MORE:
+            required, wanted = 0, stop - start
+        elif nargs == ONE_OR_MORE:
+            required, wanted = 1, stop - start
+        else:
+            required = wanted = nargs
+        available = 0
+        index = start
+        while (available < wanted and index < stop and
+               option_tuples[index] is None):
+            available += 1
+            index += 1
+
+        # let the regex report the usual error
+        if available < required:
+            self._match_argument(action, 'A' * available)
+        return available
+
     def _read_args_from_files(self, arg_strings):
         # expand arguments referencing files
-        new_arg_strings = []
+        return list(self._iter_args_from_files(arg_strings))
+
+    def _iter_args_from_files(self, arg_strings, _files=(), _count=None):
+        # _files holds the real paths of the argument files being expanded,
+        # outermost first; _count the number of arguments they supplied
+        if _count is None:
+            _count = [0]
+        max_args = self.fromfile_max_args
         for arg_string in arg_strings:
 
-            # for regular arguments, just add them back into the list
-            if arg_string[0] not in self.fromfile_prefix_chars:
-                new_arg_strings.append(arg_string)
+            # for regular arguments, just pass them on
+            if not arg_string or arg_string[0] not in self.fromfile_prefix_chars:
+                if _files:
+                    _count[0] += 1
+                    if max_args is not None and _count[0] > max_args:
+                        msg = _('argument files supply more than %d arguments')
+                        self.error(msg % max_args)
+                yield arg_string
+                continue
+
+            # refuse to follow include cycles or nest too deeply
+            path = arg_string[1:]
+            real_path = _os.path.realpath(path)
+            if real_path in _files:
+                self.error(_('argument file %r includes itself') % path)
+            max_depth = self.fromfile_max_depth
+            if max_depth is not None and len(_files) >= max_depth:
+                msg = _('argument file %r nested more than %d deep')
+                self.error(msg % (path, max_depth))
 
             # replace arguments referencing files with the file content
-            else:
-                try:
-                    args_file = open(arg_string[1:])
-                    try:
-                        arg_strings = []
-                        for arg_line in args_file.read().splitlines():
-                            for arg in self.convert_arg_line_to_args(arg_line):
-                                arg_strings.append(arg)
-                        arg_strings = self._read_args_from_files(arg_strings)
-                        new_arg_strings.extend(arg_strings)
-                    finally:
-                        args_file.close()
-                except IOError:
-                    err = _sys.exc_info()[1]
-                    self.error(str(err))
-
-        # return the modified argument list
-        return new_arg_strings
+            try:
+                args_file = open(path)
+            except IOError:
+                err = _sys.exc_info()[1]
+                self.error(str(err))
+            try:
+                args = (arg
+                        for arg_line in _iter_file_lines(args_file)
+                        for arg in self.convert_arg_line_to_args(arg_line))
+                files = _files + (real_path,)
+                for arg in self._iter_args_from_files(args, files, _count):
+                    yield arg
+            finally:
+                args_file.close()
 
     def convert_arg_line_to_args(self, arg_line):
         return [arg_line]
 
-    def _match_argument(self, action, arg_strings_pattern):
-        # match the pattern for this action to the arg strings
-        nargs_pattern = self._get_nargs_pattern(action)
-        match = _re.match(nargs_pattern, arg_strings_pattern)
+    def _match_argument(self, action, arg_strings_pattern, pos=0):
+        # match the pattern for this action to the arg strings, starting at
+        # pos rather than slicing the (possibly very long) pattern
+        regex = self._get_nargs_regex(action)
+        match = regex.match(arg_strings_pattern, pos)
 
         # raise an exception if we weren't able to find a match
         if match is None:
@@ -2005,15 +2957,13 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         # return the number of arguments matched
         return len(match.group(1))
 
-    def _match_arguments_partial(self, actions, arg_strings_pattern):
+    def _match_arguments_partial(self, actions, arg_strings_pattern, pos=0):
         # progressively shorten the actions list by slicing off the
         # final actions until we find a match
         result = []
         for i in range(len(actions), 0, -1):
-            actions_slice = actions[:i]
-            pattern = ''.join([self._get_nargs_pattern(action)
-                               for action in actions_slice])
-            match = _re.match(pattern, arg_strings_pattern)
+            regex = self._get_nargs_regex(tuple(actions[:i]))
+            match = regex.match(arg_strings_pattern, pos)
             if match is not None:
                 result.extend([len(string) for string in match.groups()])
                 break
@@ -2055,7 +3005,8 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             options = ', '.join([option_string
                 for action, option_string, explicit_arg in option_tuples])
             tup = arg_string, options
-            self.error(_('ambiguous option: %s could match %s') % tup)
+            msg = _('ambiguous option: %s could match %s')
+            raise ArgumentError(None, msg % tup)
 
         # if exactly one action matched, this segmentation is good,
         # so return the parsed action
@@ -2090,11 +3041,10 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             else:
                 option_prefix = option_string
                 explicit_arg = None
-            for option_string in self._option_string_actions:
-                if option_string.startswith(option_prefix):
-                    action = self._option_string_actions[option_string]
-                    tup = action, option_string, explicit_arg
-                    result.append(tup)
+            for option_string in self._iter_option_prefix(option_prefix):
+                action = self._option_string_actions[option_string]
+                tup = action, option_string, explicit_arg
+                result.append(tup)
 
         # single character options can be concatenated with their arguments
         # but multiple character options always have to have their argument
@@ -2105,23 +3055,47 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             short_option_prefix = option_string[:2]
             short_explicit_arg = option_string[2:]
 
-            for option_string in self._option_string_actions:
-                if option_string == short_option_prefix:
-                    action = self._option_string_actions[option_string]
-                    tup = action, option_string, short_explicit_arg
-                    result.append(tup)
-                elif option_string.startswith(option_prefix):
-                    action = self._option_string_actions[option_string]
-                    tup = action, option_string, explicit_arg
-                    result.append(tup)
+            if short_option_prefix in self._option_string_actions:
+                action = self._option_string_actions[short_option_prefix]
+                tup = action, short_option_prefix, short_explicit_arg
+                result.append(tup)
+            for option_string in self._iter_option_prefix(option_prefix):
+                action = self._option_string_actions[option_string]
+                tup = action, option_string, explicit_arg
+                result.append(tup)
 
         # shouldn't ever get here
         else:
-            self.error(_('unexpected option string: %s') % option_string)
+            msg = _('unexpected option string: %s')
+            raise ArgumentError(None, msg % option_string)
 
         # return the collected option tuples
         return result
 
+    def _iter_option_prefix(self, option_prefix):
+        # walk the sorted option strings from the first one that could
+        # start with the prefix until they stop matching
+        index = self._option_string_index
+        i = _bisect.bisect_left(index, option_prefix)
+        while i < len(index) and index[i].startswith(option_prefix):
+            yield index[i]
+            i += 1
+
+    def _get_nargs_regex(self, key):
+        # key is either a single action or a tuple of positional actions
+        # whose patterns are matched one after the other; the compiled
+        # regex is kept in the parse plan until the parser's actions change
+        try:
+            return self._parse_plan[key]
+        except KeyError:
+            if isinstance(key, tuple):
+                pattern = ''.join([self._get_nargs_pattern(action)
+                                   for action in key])
+            else:
+                pattern = self._get_nargs_pattern(key)
+            regex = self._parse_plan[key] = _re.compile(pattern)
+            return regex
+
     def _get_nargs_pattern(self, action):
         # in all examples below, we have to allow for '--' args
         # which are represented as '-' in the pattern
@@ -2171,6 +3145,22 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         if action.nargs not in [PARSER, REMAINDER]:
             arg_strings = [s for s in arg_strings if s != '--']
 
+        # streamed argument files become a lazy iterator of values for
+        # '*' and '+' arguments; everyone else gets them expanded here and
+        # must still receive the right number of values
+        if self.fromfile_streaming:
+            arg_files = [s for s in arg_strings if isinstance(s, _ArgFile)]
+            if arg_files and action.nargs in [ZERO_OR_MORE, ONE_OR_MORE]:
+                return self._iter_values_from_files(action, arg_strings)
+            elif arg_files:
+                arg_strings = self._read_args_from_files(arg_strings)
+                if action.nargs not in [PARSER, REMAINDER]:
+                    arg_count = len(arg_strings)
+                    pattern = 'A' * arg_count
+                    if self._match_argument(action, pattern) != arg_count:
+                        msg = _('argument files supply %d values')
+                        raise ArgumentError(action, msg % arg_count)
+
         # optional argument produces a default when not present
         if not arg_strings and action.nargs == OPTIONAL:
             if action.option_strings:
@@ -2206,7 +3196,12 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             value = [self._get_value(action, v) for v in arg_strings]
             self._check_value(action, value[0])
 
-        # all other types of nargs produce a list
+        # all other types of nargs produce a list; untyped values without
+        # choices are the (already copied) arg strings themselves
+        elif (action.choices is None and
+              self._registry_get('type', action.type) is _identity):
+            value = arg_strings
+
         else:
             value = [self._get_value(action, v) for v in arg_strings]
             for v in value:
@@ -2215,12 +3210,32 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
         # return the converted value
         return value
 
+    def _iter_values_from_files(self, action, arg_strings):
+        # values are converted and checked as they are consumed, after
+        # parse_args() has returned, so errors are reported directly
+        for arg_string in self._iter_args_from_files(arg_strings):
+            try:
+                value = self._get_value(action, arg_string)
+                self._check_value(action, value)
+            except ArgumentError:
+                err = _sys.exc_info()[1]
+                self.error(str(err))
+            yield value
+
     def _get_value(self, action, arg_string):
         type_func = self._registry_get('type', action.type, action.type)
         if not _callable(type_func):
             msg = _('%r is not callable')
             raise ArgumentError(action, msg % type_func)
 
+        # reuse a previous conversion of the same string
+        cache = action.type_cache
+        if cache is not None:
+            try:
+                return cache.lookup(arg_string)
+            except KeyError:
+                pass
+
         # convert the value to the appropriate type
         try:
             result = type_func(arg_string)
@@ -2237,6 +3252,9 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
             msg = _('invalid %s value: %r')
             raise ArgumentError(action, msg % (name, arg_string))
 
+        if cache is not None:
+            cache.store(arg_string, result)
+
         # return the converted value
         return result
 
@@ -2251,14 +3269,36 @@ class ArgumentParser(_AttributeHolder, _ActionsContainer):
     # Help-formatting methods
     # =======================
     def format_usage(self):
+        return self._get_help_text('usage', self._format_usage_text)
+
+    def format_help(self):
+        return self._get_help_text('help', self._format_help_text)
+
+    def _get_help_text(self, kind, format):
+        # rendered help is kept in the parse plan, which is cleared when
+        # the actions change; the key covers everything else it depends on
         formatter = self._get_formatter()
+        key = self._help_key(kind, formatter)
+        try:
+            return self._parse_plan[key]
+        except KeyError:
+            text = self._parse_plan[key] = format(formatter)
+            return text
+
+    def _help_key(self, kind, formatter):
+        formatter_class = type(formatter)
+        groups = [(group.title, group.description)
+                  for group in self._action_groups]
+        return (kind, formatter_class.__module__, formatter_class.__name__,
+                getattr(formatter, '_width', None), self.prog, self.usage,
+                self.description, self.epilog, tuple(groups))
+
+    def _format_usage_text(self, formatter):
         formatter.add_usage(self.usage, self._actions,
                             self._mutually_exclusive_groups)
         return formatter.format_help()
 
-    def format_help(self):
-        formatter = self._get_formatter()
-
+    def _format_help_text(self, formatter):
         # usage
         formatter.add_usage(self.usage, self._actions,
                             self._mutually_exclusive_groups)
@@ -0,0 +1,468 @@
+"""\
+:mod:`cli.aio` -- asynchronous applications
+-------------------------------------------
+
+Asynchronous applications multiplex many I/O bound tasks in a single
+process. Their :attr:`main` (and their :meth:`pre_run` and :meth:`post_run`
+hooks) may be coroutines: generator functions that yield whenever they
+would block, and are resumed by an :class:`EventLoop` that
+:meth:`AsyncMixin.run` owns::
+
+    @AsyncApplication
+    def upper(app):
+        while True:
+            line = yield app.async_stdin.readline()
+            if not line:
+                break
+            app.async_stdout.write(line.upper())
+            yield app.async_stdout.drain()
+
+A coroutine can yield:
+
+* :meth:`EventLoop.readable`, :meth:`EventLoop.writable` or
+  :meth:`EventLoop.sleep`, to wait for a file descriptor or some time;
+* another coroutine or a :class:`Task`, to wait for its result (which is
+  sent back as the value of the ``yield``, or raised);
+* a list of those, to wait for all of them at once;
+* ``None``, to let other tasks run.
+
+Generators can't return values before Python 3.3, so a coroutine returns
+one by raising :class:`Return`.
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import errno
+import heapq
+import os
+import select
+import sys
+import time
+
+from collections import deque
+from inspect import isgenerator
+
+from cli.app import Application, CommandLineMixin
+
+__all__ = ["AsyncApplication", "AsyncCommandLineApp", "AsyncMixin",
+    "AsyncReader", "AsyncWriter", "EventLoop", "Return", "Task"]
+
+PIPE_BUF = getattr(select, "PIPE_BUF", 512)
+
+class Return(Exception):
+    """Raised by a coroutine to return *value*."""
+
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+class _Wait(object):
+    # What a coroutine yields to wait for a file descriptor or a deadline.
+    __slots__ = ("fd", "event", "deadline")
+
+    def __init__(self, fd=None, event=None, deadline=None):
+        self.fd = fd
+        self.event = event
+        self.deadline = deadline
+
+class Task(object):
+    """A coroutine scheduled on an :class:`EventLoop`.
+
+    Tasks are created by :meth:`EventLoop.spawn`. Yielding a task from a
+    coroutine waits for it to finish.
+    """
+
+    def __init__(self, loop, coro):
+        self.loop = loop
+        self.coro = coro
+        self.done = False
+        self.value = None
+        self.exc_info = None
+        self.waiters = []
+
+    def result(self):
+        """Return the value of the finished coroutine, or raise its error."""
+        if not self.done:
+            raise RuntimeError("task is not done")
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+class EventLoop(object):
+    """Run coroutines, resuming them when what they wait for is ready.
+
+    File descriptors are watched with :func:`select.poll` where available,
+    which scales to thousands of them, and :func:`select.select`
+    otherwise.
+    """
+    READ, WRITE = 1, 2
+
+    def __init__(self):
+        self.ready = deque()
+        self.timers = []
+        self.readers = {}
+        self.writers = {}
+        self._sequence = 0
+
+    def spawn(self, coro):
+        """Schedule the generator *coro* and return its :class:`Task`."""
+        task = Task(self, coro)
+        self.ready.append((task, None, None))
+        return task
+
+    def readable(self, fd):
+        """Wait until *fd* can be read without blocking."""
+        return _Wait(fd, self.READ)
+
+    def writable(self, fd):
+        """Wait until *fd* can be written without blocking."""
+        return _Wait(fd, self.WRITE)
+
+    def sleep(self, seconds):
+        """Wait for *seconds*."""
+        return _Wait(deadline=time.time() + seconds)
+
+    def gather(self, coros):
+        """A coroutine waiting for all of *coros*, returning their results.
+
+        The coroutines run concurrently; the first error is raised once
+        they have all finished.
+        """
+        tasks = [self._task(coro) for coro in coros]
+        results = []
+        exc_info = None
+        for task in tasks:
+            if not task.done:
+                yield task
+            if task.exc_info is not None and exc_info is None:
+                exc_info = task.exc_info
+            results.append(task.value)
+        if exc_info is not None:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        raise Return(results)
+
+    def run_until_complete(self, coro):
+        """Run the loop until *coro* finishes and return its result.
+
+        *coro* can also be a :class:`Task` or a list of coroutines and tasks.
+        """
+        task = self._task(coro)
+        while not task.done:
+            if not (self.ready or self.timers or self.readers or
+                    self.writers):
+                raise RuntimeError("no task is ready or waiting for anything")
+            self.run_once()
+        return task.result()
+
+    def run_once(self):
+        """Resume the tasks that are ready, then wait for more."""
+        ready = self.ready
+        for i in range(len(ready)):
+            task, value, exc_info = ready.popleft()
+            self._step(task, value, exc_info)
+
+        now = time.time()
+        timers = self.timers
+        while timers and timers[0][0] <= now:
+            task = heapq.heappop(timers)[2]
+            ready.append((task, None, None))
+        if ready:
+            timeout = 0
+        elif timers:
+            timeout = timers[0][0] - now
+        elif self.readers or self.writers:
+            timeout = None
+        else:
+            return
+        self._poll(timeout)
+
+    def _task(self, value):
+        # the task for a task, coroutine or list of them
+        if isinstance(value, Task):
+            return value
+        elif isinstance(value, (list, tuple)):
+            value = self.gather(value)
+        return self.spawn(value)
+
+    def _step(self, task, value, exc_info):
+        try:
+            if exc_info is not None:
+                yielded = task.coro.throw(*exc_info)
+            else:
+                yielded = task.coro.send(value)
+        except StopIteration:
+            self._finish(task, None, None)
+        except Return, e:
+            self._finish(task, e.value, None)
+        except Exception:
+            self._finish(task, None, sys.exc_info())
+        else:
+            self._wait(task, yielded)
+
+    def _wait(self, task, yielded):
+        if yielded is None:
+            self.ready.append((task, None, None))
+        elif isinstance(yielded, _Wait):
+            if yielded.deadline is not None:
+                self._sequence += 1
+                heapq.heappush(self.timers,
+                    (yielded.deadline, self._sequence, task))
+            elif yielded.event == self.READ:
+                self.readers.setdefault(yielded.fd, []).append(task)
+            else:
+                self.writers.setdefault(yielded.fd, []).append(task)
+        elif isinstance(yielded, Task):
+            if yielded.done:
+                self._resume(task, yielded)
+            else:
+                yielded.waiters.append(task)
+        elif isgenerator(yielded) or isinstance(yielded, (list, tuple)):
+            self._task(yielded).waiters.append(task)
+        else:
+            try:
+                raise TypeError("coroutine yielded %r" % (yielded,))
+            except TypeError:
+                self.ready.append((task, None, sys.exc_info()))
+
+    def _finish(self, task, value, exc_info):
+        task.done = True
+        task.value = value
+        task.exc_info = exc_info
+        for waiter in task.waiters:
+            self._resume(waiter, task)
+        del task.waiters[:]
+
+    def _resume(self, task, finished):
+        self.ready.append((task, finished.value, finished.exc_info))
+
+    def _poll(self, timeout):
+        readers, writers = self.readers, self.writers
+        if hasattr(select, "poll"):
+            poller = select.poll()
+            for fd in readers:
+                poller.register(fd, select.POLLIN)
+            for fd in writers:
+                if fd in readers:
+                    poller.modify(fd, select.POLLIN | select.POLLOUT)
+                else:
+                    poller.register(fd, select.POLLOUT)
+            if timeout is not None:
+                timeout *= 1000
+            try:
+                events = poller.poll(timeout)
+            except select.error, e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                return
+            readable = set()
+            writable = set()
+            for fd, event in events:
+                # errors and hangups wake both sides; the reads and writes
+                # that follow report them
+                if event & ~select.POLLOUT:
+                    readable.add(fd)
+                if event & ~select.POLLIN:
+                    writable.add(fd)
+        else:
+            try:
+                readable, writable, _ = select.select(readers, writers, [],
+                    timeout)
+            except select.error, e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                return
+        for fds, waiting in ((readable, readers), (writable, writers)):
+            for fd in fds:
+                if fd in waiting:
+                    for task in waiting.pop(fd):
+                        self.ready.append((task, None, None))
+
+def _fileno(stream):
+    # The stream's file descriptor, or None if it doesn't have one.
+    try:
+        return stream.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+
+class AsyncReader(object):
+    """Read from *stream* without blocking the :class:`EventLoop` *loop*.
+
+    The methods are coroutines. Reads go directly to the stream's file
+    descriptor once :meth:`EventLoop.readable` says they won't block, so
+    the stream itself shouldn't be read from as well. Streams without a
+    file descriptor (like :class:`StringIO.StringIO`) are read directly.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, loop, stream, size=65536):
+        self.loop = loop
+        self.stream = stream
+        self.fd = _fileno(stream)
+        self.size = size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.fd is None:
+            data = self.stream.read(self.size)
+        else:
+            yield self.loop.readable(self.fd)
+            data = os.read(self.fd, self.size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+
+    def _take(self, end):
+        data = self.buffer[self.pos:end]
+        self.pos = end
+        return data
+
+    def read(self, size=-1):
+        """Return up to *size* bytes, or everything up to the end."""
+        if size < 0:
+            while not self.eof:
+                yield self._fill()
+            raise Return(self._take(len(self.buffer)))
+        if self.pos == len(self.buffer) and not self.eof:
+            yield self._fill()
+        raise Return(self._take(min(self.pos + size, len(self.buffer))))
+
+    def readline(self):
+        """Return the next line, or an empty string at the end."""
+        start = self.pos
+        while True:
+            end = self.buffer.find("\n", start)
+            if end >= 0:
+                raise Return(self._take(end + 1))
+            if self.eof:
+                raise Return(self._take(len(self.buffer)))
+            start = len(self.buffer) - self.pos
+            yield self._fill()
+            start += self.pos
+
+class AsyncWriter(object):
+    """Write to *stream* without blocking the :class:`EventLoop` *loop*.
+
+    :meth:`write` only buffers; the :meth:`drain` coroutine writes the
+    buffered data to the stream's file descriptor as it becomes
+    writable, after flushing the stream's own buffer. Streams without a
+    file descriptor are written directly.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, loop, stream):
+        self.loop = loop
+        self.stream = stream
+        self.fd = _fileno(stream)
+        self.pending = []
+
+    def write(self, data):
+        """Buffer *data*."""
+        self.pending.append(data)
+
+    def drain(self):
+        """Write everything buffered so far."""
+        pending, self.pending = self.pending, []
+        if self.fd is None:
+            for data in pending:
+                self.stream.write(data)
+            return
+        encoding = getattr(self.stream, "encoding", None) or "utf-8"
+        data = "".join([isinstance(s, unicode) and s.encode(encoding) or s
+            for s in pending])
+        self.stream.flush()
+        pos = 0
+        while pos < len(data):
+            yield self.loop.writable(self.fd)
+            pos += os.write(self.fd, data[pos:pos + PIPE_BUF])
+
+class AsyncMixin(object):
+    """An application whose :attr:`main` may be a coroutine.
+
+    :meth:`run` creates an :class:`EventLoop` (:attr:`loop`), and
+    :attr:`async_stdin` and :attr:`async_stdout`, an :class:`AsyncReader`
+    and an :class:`AsyncWriter` on :attr:`stdin` and :attr:`stdout`. If
+    :meth:`pre_run`, :attr:`main` or :meth:`post_run` return a coroutine,
+    the loop runs until it finishes. :attr:`async_stdout` is drained
+    after :attr:`main`, even if it raises, and before :meth:`post_run`,
+    which handles errors, :class:`Abort` and
+    :attr:`reraise` as usual.
+
+    .. versionadded:: 1.2
+    """
+    loop = None
+    async_stdin = None
+    async_stdout = None
+
+    def run(self, argv=None, exit_after=None):
+        """Run the application on a new :attr:`loop`, as :meth:`Application.run`."""
+        self.loop = EventLoop()
+        self.async_stdin = AsyncReader(self.loop, self.stdin)
+        self.async_stdout = AsyncWriter(self.loop, self.stdout)
+        return super(AsyncMixin, self).run(argv, exit_after)
+
+    def _call_main(self):
+        try:
+            return super(AsyncMixin, self)._call_main()
+        finally:
+            self.complete(self.async_stdout.drain())
+
+    def _complete(self, value):
+        return self.complete(value)
+
+    def complete(self, value):
+        """Run :attr:`loop` until *value* finishes if it is a coroutine.
+
+        Returns the coroutine's result, or *value* itself.
+        """
+        if isgenerator(value):
+            return self.loop.run_until_complete(value)
+        return value
+
+class AsyncApplication(AsyncMixin, Application):
+    """An asynchronous application.
+
+    This class simply glues together the base :class:`cli.app.Application`
+    and :class:`AsyncMixin`.
+
+    .. versionadded:: 1.2
+    """
+
+class AsyncCommandLineApp(AsyncMixin, CommandLineMixin, Application):
+    """An asynchronous command line application.
+
+    This class simply glues together the base :class:`cli.app.Application`,
+    :class:`cli.app.CommandLineMixin` and :class:`AsyncMixin`.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, main=None, **kwargs):
+        CommandLineMixin.__init__(self, **kwargs)
+        Application.__init__(self, main, **kwargs)
+
+    def setup(self):
+        Application.setup(self)
+        CommandLineMixin.setup(self)
+
+    def pre_run(self):
+        Application.pre_run(self)
+        CommandLineMixin.pre_run(self)
@@ -27,12 +27,29 @@ __todo__ = """\
 """.split(" * ")
 
 import os
+import stat
 import sys
+import time
 
+from timeit import default_timer
+
+# Record how long importing this module (and argparse) takes.
+_import_start = default_timer()
+
+from collections import Iterator, namedtuple
+from types import GeneratorType
+
+try:
+    import cPickle as pickle
+except ImportError: # pragma: no cover
+    import pickle
+
+import cli
 from cli._ext import argparse
-from cli.util import ifelse, ismethodof
+from cli.util import exit_status, ifelse, ismethodof
 
-__all__ = ["Application", "CommandLineApp", "CommandLineMixin"]
+__all__ = ["Application", "CommandLineApp", "CommandLineMixin", "ParserCache",
+    "HelpCache", "ParseCache", "RunResult", "Timings", "timed"]
 
 class Error(Exception):
     pass
@@ -51,6 +68,99 @@ class Abort(Error):
         message = "Application terminated (%s)" % self.status
         super(Abort, self).__init__(message, self.status)
 
+class Timings(object):
+    """Durations of the phases of an application's life.
+
+    Phases are recorded in :attr:`entries` in the order they start, as
+    ``[name, depth, seconds]`` lists, *depth* being the number of phases
+    they ran in. Durations are measured with :func:`timeit.default_timer`.
+
+    .. versionadded:: 1.2
+    """
+    timer = staticmethod(default_timer)
+
+    def __init__(self):
+        self.entries = []
+        self._running = []
+
+    def start(self, name):
+        """Start timing the phase *name* and return its entry."""
+        entry = [name, len(self._running), None]
+        self.entries.append(entry)
+        self._running.append((entry, self.timer()))
+        return entry
+
+    def stop(self):
+        """Stop timing the last phase started and return its duration."""
+        entry, started = self._running.pop()
+        entry[2] = self.timer() - started
+        return entry[2]
+
+    def add(self, name, seconds):
+        """Record the phase *name*, timed elsewhere."""
+        self.entries.append([name, len(self._running), seconds])
+
+    def truncate(self, count):
+        """Forget all but the first *count* phases."""
+        del self.entries[count:]
+
+    def format(self):
+        """Return a text report, one phase per line."""
+        lines = []
+        for name, depth, seconds in self.entries:
+            if seconds is None:
+                lines.append("%10s     %s%s\n" % ("-", "  " * depth, name))
+            else:
+                lines.append("%10.3f ms  %s%s\n" % (seconds * 1e3,
+                    "  " * depth, name))
+        return "".join(lines)
+
+    def as_json(self):
+        """Return the phases as a JSON document."""
+        import json
+        return json.dumps({"phases": [
+            {"name": name, "depth": depth, "seconds": seconds}
+            for name, depth, seconds in self.entries]}, indent=1)
+
+def timed(name):
+    """Decorate a method to record its duration as the phase *name*.
+
+    The phase is added to the instance's :attr:`Application.timings`;
+    instances without one are not timed. If the method returns a
+    coroutine (see :mod:`cli.aio`), the time the event loop takes to run
+    it is added to the phase too.
+
+    .. versionadded:: 1.2
+    """
+    def decorator(func):
+        def wrapper(self, *args, **kwargs):
+            timings = getattr(self, "timings", None)
+            if timings is None:
+                return func(self, *args, **kwargs)
+            entry = timings.start(name)
+            try:
+                result = func(self, *args, **kwargs)
+            finally:
+                timings.stop()
+            if isinstance(result, GeneratorType):
+                result = _timed_coroutine(entry, timings.timer, result)
+            return result
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__dict__.update(func.__dict__)
+        return wrapper
+    return decorator
+
+def _timed_coroutine(entry, timer, coro):
+    # Add the time coro takes on the event loop to the timings entry.
+    from cli.aio import Return
+    started = timer()
+    try:
+        value = yield coro
+    finally:
+        entry[2] += timer() - started
+    raise Return(value)
+
 class Application(object):
     """An application.
     
@@ -98,21 +208,53 @@ class Application(object):
     propagated upwards by :attr:`post_run`; otherwise it will just
     cause :attr:`post_run` to exit with return code 1.
 
+    *buffered* opts in to fast output: if it is true, :attr:`stdout` is
+    wrapped in a :class:`cli.streams.BufferedOutput` (of *buffered* bytes,
+    if it is a number) that :meth:`post_run` flushes. With *binary*, the
+    buffer writes the strings it is given without encoding them. If the
+    reader of the output goes away, the application ends with
+    :data:`cli.streams.EPIPE_STATUS`.
+
     In all but a very few cases, subclasses that override the constructor
     should call :meth:`Application.__init__` at the end of the
     overridden method to ensure that the :meth:`setup` method is
     called.
+
+    .. versionchanged:: 1.2
+        The phases of the application's life are recorded in
+        :attr:`timings`. Added *buffered* and *binary*.
     """
     main = None
 
+    timings = None
+    """A :class:`Timings` instance with the duration of importing
+    :mod:`cli.app`, of the construction and :meth:`setup` of the
+    application and of each phase of the last :meth:`run`.
+    """
+
+    buffered_output = None
+    """The :class:`cli.streams.BufferedOutput` wrapping :attr:`stdout`, if
+    the application was created with *buffered*.
+    """
+
     def __init__(self, main=None, name=None, exit_after_main=True, stdin=None, stdout=None,
             stderr=None, version=None, description=None, argv=None,
-            profiler=None, reraise=(Exception,), **kwargs):
+            profiler=None, reraise=(Exception,), buffered=False, binary=False,
+            **kwargs):
+        self.timings = Timings()
+        self.timings.add("import cli.app", _import_time)
+        self.timings.start("construct")
+
         self._name = name
         self.exit_after_main = exit_after_main
         self.stdin = stdin and stdin or sys.stdin
         self.stdout = stdout and stdout or sys.stdout
         self.stderr = stderr and stderr or sys.stderr
+        if buffered:
+            from cli.streams import BufferedOutput, DEFAULT_BUFFER_SIZE
+            size = buffered is True and DEFAULT_BUFFER_SIZE or buffered
+            self.stdout = self.buffered_output = BufferedOutput(self.stdout,
+                size=size, binary=binary)
         self.version = version
         self.argv = argv
         if argv is None:
@@ -128,6 +270,10 @@ class Application(object):
         if getattr(self, "main", None) is not None:
             self.setup()
 
+        # The construction is over; run() forgets the phases after these.
+        self.timings.stop()
+        self._setup_timings = len(self.timings.entries)
+
     def __call__(self, main):
         """Wrap the *main* callable and return an :class:`Application` instance.
     
@@ -145,9 +291,11 @@ class Application(object):
         self.main = main
 
         self.setup()
+        self._setup_timings = len(self.timings.entries)
 
         return self
 
+    @timed("Application.setup")
     def setup(self):
         """Configure the :class:`Application`.
 
@@ -185,6 +333,7 @@ class Application(object):
         else:
             return getattr(self.main, "__doc__", "")
 
+    @timed("Application.pre_run")
     def pre_run(self):
         """Perform any last-minute configuration.
 
@@ -195,6 +344,7 @@ class Application(object):
         """
         pass
 
+    @timed("Application.post_run")
     def post_run(self, returned):
         """Clean up after the application.
 
@@ -203,7 +353,15 @@ class Application(object):
         :meth:`post_run` decides whether to call :func:`sys.exit` (based on the
         value of the :attr:`exit_after_main` attribute) or pass the value back
         to :meth:`run`. Subclasses should probably preserve this behavior.
+
+        .. versionchanged:: 1.2
+            Flushes :attr:`buffered_output` first; if the reader went
+            away, the :class:`cli.streams.BrokenPipe` replaces *returned*.
         """
+        broken = self._flush_output(returned)
+        if broken is not None:
+            returned = broken
+
         # Interpret the returned value in the same way sys.exit() does.
         if returned is None:
             returned = 0
@@ -231,23 +389,203 @@ class Application(object):
         argument. The return value (or :class:`Exception` instance raised) is
         then passed to :meth:`post_run` which may modify it (or terminate the
         application entirely).
+
+        .. versionchanged:: 1.2
+            Each phase is recorded in :attr:`timings`, replacing those of
+            the previous run, and :meth:`report_timings` is called at the
+            end (even if :meth:`post_run` exits).
         """
         if argv:
             self.argv = argv
         if exit_after is not None:
             self.exit_after_main = exit_after
 
-        self.pre_run()
+        timings = self.timings
+        timings.truncate(self._setup_timings)
+        try:
+            self._complete(self.pre_run())
 
+            timings.start("main")
+            try:
+                try:
+                    returned = self._call_main()
+                except Exception, e:
+                    # post_run() may re-raise it
+                    returned = e
+            finally:
+                timings.stop()
+
+            return self._complete(self.post_run(returned))
+        finally:
+            # Output buffered before an early exit (like --help).
+            self._flush_output()
+            self.report_timings()
+
+    def _call_main(self):
+        # Call main with the application, unless it is a bound method.
         args = (self,)
         if ismethodof(self.main, self):
             args = ()
+        return self._complete(self.main(*args))
+
+    def _complete(self, value):
+        # The result of a call to pre_run(), main or post_run(); the
+        # asynchronous applications in cli.aio run coroutines here.
+        return value
+
+    def _flush_output(self, returned=None):
+        # Flush the buffered output; return the BrokenPipe if it broke,
+        # either now or while main was writing (then returned is the error).
+        output = self.buffered_output
+        if output is None:
+            return None
         try:
-            returned = self.main(*args)
-        except Exception, e:
-            returned = e
+            if isinstance(returned, EnvironmentError):
+                output.handle_error(returned)
+            if not output.broken:
+                output.flush()
+        except Abort, e:
+            return e
+        except EnvironmentError:
+            if returned is None:
+                raise
+        return None
+
+    def report_timings(self):
+        """Report :attr:`timings` at the end of :meth:`run`.
+
+        The base implementation does nothing.
+
+        .. versionadded:: 1.2
+        """
+        pass
+
+    def records(self, sep="\n", chunk_size=None, batch=None):
+        """Return a generator over the records in :attr:`stdin`.
+
+        Records are separated by *sep*, which they don't include. With
+        *batch*, lists of that many records are yielded instead. See
+        :func:`cli.streams.read_records`, which reads :attr:`stdin` in
+        chunks of *chunk_size* bytes, through :mod:`mmap` if it is a
+        regular file.
+
+        .. versionadded:: 1.2
+        """
+        from cli.streams import read_records
+        return read_records(self.stdin, sep, chunk_size, batch)
 
-        return self.post_run(returned)
+    def emit(self, records, sep="\n"):
+        """Write *records* to :attr:`stdout`, each followed by *sep*.
+
+        *records* is a single record or a list of them (like the batches
+        of :meth:`records`), which is written in one go. Unless the
+        application was created with *buffered*, the first call wraps
+        :attr:`stdout` in a :class:`cli.streams.BufferedOutput`, which
+        :meth:`post_run` flushes.
+
+        .. versionadded:: 1.2
+        """
+        output = self.stdout
+        if output is not self.buffered_output:
+            from cli.streams import BufferedOutput
+            output = self.stdout = self.buffered_output = \
+                BufferedOutput(output)
+        if records.__class__ is str or isinstance(records, unicode):
+            output.write(records + sep)
+        elif records:
+            output.write(sep.join(records) + sep)
+
+    def run_many(self, argvs, processes=None, chunksize=16, capture=True):
+        """Run the application once for each list of arguments in *argvs*.
+
+        The lists hold the arguments that follow the program name; the
+        application keeps its own :attr:`argv` ``[0]``. Results are
+        produced lazily and in order, as :class:`RunResult` tuples. Each
+        :meth:`run` happens with *exit_after* false, and :class:`Abort`,
+        :exc:`SystemExit` or an exception propagated by :meth:`post_run`
+        only end that run; the traceback of an exception is written to
+        its error output.
+
+        If *capture* is true, :attr:`stdout` and :attr:`stderr` are
+        replaced by buffers during each run and the results hold their
+        contents; otherwise the application writes to its streams as usual
+        and the results hold ``None``.
+
+        If *processes* is not ``None``, the runs are spread over a
+        :class:`multiprocessing.Pool` of that many forked workers, which
+        take *chunksize* runs at a time. As with :meth:`map`, *argvs* is
+        read lazily, with at most two chunks per worker in flight. Each
+        worker has its own copy of the application, so only the results
+        (which must be picklable) come back.
+
+        .. versionadded:: 1.2
+        """
+        if processes is None:
+            for args in argvs:
+                yield self._run_one(args, capture)
+            return
+
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, _init_run_worker,
+            (self, capture))
+        try:
+            for results in _dispatch(pool, _run_chunk, argvs, True,
+                    chunksize, 2 * processes):
+                for result in results:
+                    yield result
+            pool.close()
+        finally:
+            pool.terminate()
+
+    def _run_one(self, args, capture):
+        # Run once with args, returning a RunResult.
+        saved = self.argv, self.stdout, self.stderr, self.buffered_output
+        if capture:
+            from StringIO import StringIO
+            self.stdout, self.stderr = StringIO(), StringIO()
+            self.buffered_output = None
+        start = time.time()
+        try:
+            try:
+                status = self.run([saved[0][0]] + list(args),
+                    exit_after=False)
+            except Abort, e:
+                status = e.status
+            except SystemExit, e:
+                status = e.code
+            except Exception:
+                import traceback
+                traceback.print_exc(file=self.stderr)
+                status = 1
+            status = exit_status(status, self.stderr)
+            elapsed = time.time() - start
+            output = error = None
+            if capture:
+                output, error = self.stdout.getvalue(), self.stderr.getvalue()
+            return RunResult(list(args), status, output, error, elapsed)
+        finally:
+            self.argv, self.stdout, self.stderr, self.buffered_output = saved
+
+class RunResult(namedtuple("RunResult", "args status stdout stderr elapsed")):
+    """The outcome of one run of :meth:`Application.run_many`.
+
+    *args* are the arguments, *status* the exit status, *stdout* and
+    *stderr* the captured output (or ``None``) and *elapsed* the time the
+    run took, in seconds.
+
+    .. versionadded:: 1.2
+    """
+    __slots__ = ()
+
+_worker_app = None
+
+def _init_run_worker(app, capture):
+    global _worker_app
+    _worker_app = app, capture
+
+def _run_chunk(chunk):
+    app, capture = _worker_app
+    return [app._run_one(args, capture) for args in chunk]
 
 class ArgumentParser(argparse.ArgumentParser):
     """This subclass makes it easier to test ArgumentParser.
@@ -257,16 +595,39 @@ class ArgumentParser(argparse.ArgumentParser):
     these checks into instantiation (except for :attr:`prog`, which is a
     property).
 
+    If *parse_cache* is a positive integer, :meth:`parse_known_args` (and
+    so :meth:`parse_args`) keeps the results of up to that many argument
+    lists in :attr:`parse_cache`, a least recently used cache keyed by
+    ``tuple(args)``. Cached results are stored as frozen copies; each
+    call returns a new namespace with its own copies of list values. The
+    cache is emptied whenever the parser's actions or defaults change.
+    Parses that take actions with side effects (:class:`argparse.FileType`
+    values, help, version, subcommands or any custom
+    :class:`argparse.Action`), that read argument files (see
+    *fromfile_prefix_chars*), that produce iterators (like streamed
+    argument files) or that start from a given *namespace* are never
+    cached. The :attr:`hits`, :attr:`misses` and :attr:`bypassed`
+    counters of :attr:`parse_cache` report how well it works.
+
     .. versionchanged:: 1.1.1
         The *stdout* and *stderr* options replace *file* (which was present until 1.1.1);
         *argv* is added.
+
+    .. versionchanged:: 1.2
+        Added *parse_cache*.
     """
+    _raise_errors = False
 
-    def __init__(self, stdout=None, stderr=None, argv=None, **kwargs):
+    def __init__(self, stdout=None, stderr=None, argv=None, parse_cache=None,
+            **kwargs):
         self.stdout = ifelse(stdout, stdout is not None, sys.stdout)
         self.stderr = ifelse(stderr, stderr is not None, sys.stderr)
         self.argv = ifelse(argv, argv is not None, sys.argv)
         self._prog = kwargs.get("prog", None)
+        self.parse_cache = None
+        if parse_cache:
+            self.parse_cache = ParseCache(parse_cache)
+        self._parse_taken_effects = False
         super(ArgumentParser, self).__init__(**kwargs)
 
     def get_prog(self):
@@ -288,10 +649,106 @@ class ArgumentParser(argparse.ArgumentParser):
     del(get_prog, set_prog)
 
     def parse_known_args(self, args=None, namespace=None):
-        """If *args* is None, use :attr:`argv`, not :data:`sys.argv`."""
+        """If *args* is None, use :attr:`argv`, not :data:`sys.argv`.
+
+        .. versionchanged:: 1.2
+            Results are looked up in and added to :attr:`parse_cache`.
+        """
         if args is None:
             args = self.argv[1:]
-        return super(ArgumentParser, self).parse_known_args(args, namespace)
+        cache = self.parse_cache
+        if cache is None or namespace is not None:
+            return super(ArgumentParser, self).parse_known_args(args, namespace)
+
+        # The parse plan is cleared when the parser changes.
+        plan = self._parse_plan
+        if "parse_cache" not in plan:
+            cache.clear()
+            plan["parse_cache"] = True
+
+        # Argument files can change between parses.
+        chars = self.fromfile_prefix_chars
+        if chars is not None:
+            for arg in args:
+                if arg and arg[0] in chars:
+                    cache.bypassed += 1
+                    return super(ArgumentParser, self).parse_known_args(args)
+
+        key = tuple(args)
+        try:
+            values, extras = cache.lookup(key)
+        except KeyError:
+            pass
+        else:
+            namespace = self._get_namespace_class()()
+            for name, value in values:
+                setattr(namespace, name, _copy_value(value))
+            return namespace, list(extras)
+
+        self._parse_taken_effects = self._defaults_have_effects()
+        namespace, extras = super(ArgumentParser, self).parse_known_args(args)
+        values = vars(namespace).items()
+        if self._parse_taken_effects or _has_iterator(values):
+            cache.bypassed += 1
+        else:
+            values = [(name, _copy_value(value)) for name, value in values]
+            cache.store(key, (tuple(values), tuple(extras)))
+        return namespace, extras
+
+    def _take_action(self, namespace, seen, action, argument_strings,
+            option_string=None):
+        if self.parse_cache is not None and self._has_effects(action):
+            self._parse_taken_effects = True
+        super(ArgumentParser, self)._take_action(namespace, seen, action,
+            argument_strings, option_string)
+
+    # Only the standard storing actions are known to do nothing but set
+    # an attribute on the namespace.
+    _pure_action_classes = (
+        argparse._StoreAction,
+        argparse._StoreConstAction,
+        argparse._StoreTrueAction,
+        argparse._StoreFalseAction,
+        argparse._AppendAction,
+        argparse._AppendConstAction,
+        argparse._CountAction,
+        )
+
+    def _has_effects(self, action):
+        return (type(action) not in self._pure_action_classes or
+            self._type_has_effects(action))
+
+    def _type_has_effects(self, action):
+        type_func = self._registry_get("type", action.type, action.type)
+        return not getattr(type_func, "cacheable", True)
+
+    def _defaults_have_effects(self):
+        # String defaults are converted by the action's type on every parse.
+        for action in self._actions:
+            if isinstance(action.default, basestring):
+                if self._type_has_effects(action):
+                    return True
+        return False
+
+    def _get_help_text(self, kind, format):
+        """Look up help and usage text in the parser's :class:`HelpCache`.
+
+        A :class:`HelpCache` attached to the parse plan (see
+        :meth:`CommandLineMixin.pre_run`) is consulted before the text is
+        rendered, and updated after. Changing the parser's actions clears
+        the parse plan, which detaches the cache again.
+
+        .. versionadded:: 1.2
+        """
+        cache = self._parse_plan.get("help_cache")
+        if cache is None:
+            return super(ArgumentParser, self)._get_help_text(kind, format)
+        key = self._help_key(kind, self._get_formatter())
+        text = cache.get(key)
+        if text is None:
+            text = super(ArgumentParser, self)._get_help_text(kind, format)
+            cache.set(key, text)
+        return text
 
     def _print_message(self, message, file=None):
         """If *file* is None, use :attr:`stdout` instead of :data:`sys.stdout`.
@@ -311,11 +768,239 @@ class ArgumentParser(argparse.ArgumentParser):
             self.stderr.write(unicode(message))
         super(ArgumentParser, self).exit(status, message=None)
 
+    def parse_many(self, argvs, processes=None, chunksize=64):
+        """Parse each list of arguments in *argvs*, yielding the results.
+
+        Results are produced lazily and in order. Each one is the
+        :class:`argparse.Namespace` :meth:`parse_args` would have returned,
+        or the exception that stopped it: an :class:`argparse.ArgumentError`
+        for invalid arguments (nothing is written to :attr:`stderr`) or a
+        :class:`SystemExit` after options like :option:`--help` that exit.
+
+        If *processes* is not ``None``, the parser is sent once to a
+        :class:`multiprocessing.Pool` of that many workers, which parse
+        *chunksize* lists at a time. The parser and the parsed values must
+        be picklable.
+
+        .. versionadded:: 1.2
+        """
+        if processes is None:
+            for argv in argvs:
+                yield self._parse_one(argv)
+            return
+
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, _init_parse_worker, (self,))
+        try:
+            for result in pool.imap(_parse_in_worker, argvs, chunksize):
+                if isinstance(result, basestring):
+                    result = argparse.ArgumentError(None, result)
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+
+    def _parse_one(self, argv):
+        # Parse argv, returning errors instead of reporting them.
+        self._raise_errors = True
+        try:
+            try:
+                return self.parse_args(argv)
+            except (argparse.ArgumentError, SystemExit), e:
+                return e
+        finally:
+            self._raise_errors = False
+
     def error(self, message):
         """Write *message* to :attr:`stderr` instead of :data:`sys.stderr`."""
+        if self._raise_errors:
+            raise argparse.ArgumentError(None, message)
         self.print_usage(self.stderr)
         self.exit(2, u"%s: error: %s\n" % (self.prog, message))
 
+    def __getstate__(self):
+        """Leave out :attr:`stdout`, :attr:`stderr` and :attr:`argv` when pickling."""
+        state = self.__dict__.copy()
+        for name in ("stdout", "stderr", "argv"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled parser, pointing it at the :mod:`sys` streams."""
+        super(ArgumentParser, self).__setstate__(state)
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
+        self.argv = sys.argv
+
+_worker_parser = None
+
+def _init_parse_worker(parser):
+    global _worker_parser
+    _worker_parser = parser
+
+def _parse_in_worker(argv):
+    # ArgumentError can't be unpickled, so send back its message.
+    result = _worker_parser._parse_one(argv)
+    if isinstance(result, argparse.ArgumentError):
+        result = str(result)
+    return result
+
+class ParseCache(argparse._LRUCache):
+    """The least recently used cache behind :attr:`ArgumentParser.parse_cache`.
+
+    Besides the :attr:`hits` and :attr:`misses` counters, :attr:`bypassed`
+    counts the parses that could not be cached because of side effects.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, maxsize):
+        super(ParseCache, self).__init__(maxsize)
+        self.bypassed = 0
+
+def _copy_value(value):
+    # Parsed values are shared between cached results only if immutable.
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    elif isinstance(value, (dict, set)):
+        return type(value)(value)
+    return value
+
+def _has_iterator(values):
+    # Iterators can be consumed only once, so they can't be cached.
+    for name, value in values:
+        if isinstance(value, Iterator):
+            return True
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, Iterator):
+                    return True
+    return False
+
+class ParserCache(object):
+    """An on-disk snapshot of an application's argument parser.
+
+    *path* is the name of the file holding the snapshot. *key* identifies
+    the code that built the parser; a snapshot written under a different
+    key is ignored.
+
+    The snapshot records the parser itself, the signature of each
+    :meth:`CommandLineMixin.add_param` call that built it and the action
+    each call returned. Failing to read or write the snapshot is never an
+    error: the application simply builds its parser from scratch. Since
+    loading a snapshot unpickles it, a file that isn't owned by the
+    current user or that others may write to is ignored.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.parser = None
+        self.signatures = []
+        self.actions = []
+
+    def load(self):
+        """Read the snapshot, returning True if it is usable."""
+        try:
+            key, signatures, parser, actions = _load_trusted(self.path)
+        except Exception:
+            return False
+        if key != self.key:
+            return False
+        self.parser, self.signatures, self.actions = parser, signatures, actions
+        return True
+
+    def save(self, parser, signatures, actions):
+        """Write a new snapshot, returning True on success.
+
+        The snapshot is written to a temporary file that is then renamed
+        over :attr:`path`, so concurrent readers never see a partial file.
+        """
+        if not _dump_atomically(self.path, (self.key, signatures, parser, actions)):
+            return False
+        self.parser, self.signatures, self.actions = parser, signatures, actions
+        return True
+
+class HelpCache(object):
+    """Rendered help and usage text, kept on disk.
+
+    *path* is the name of the file holding the text. *key* identifies the
+    parser the text was rendered for; text stored under a different key
+    is ignored. Within a file, texts are looked up by the key returned by
+    :meth:`argparse.ArgumentParser._help_key`, which covers the kind of
+    text, the formatter class and width and the parser's descriptive
+    texts. As with :class:`ParserCache`, I/O errors are never fatal and
+    untrusted files are ignored.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.texts = None
+
+    def load(self):
+        """Read the stored texts, returning the (possibly empty) dictionary."""
+        self.texts = {}
+        try:
+            key, texts = _load_trusted(self.path)
+        except Exception:
+            return self.texts
+        if key == self.key:
+            self.texts = texts
+        return self.texts
+
+    def get(self, key):
+        """Return the text stored under *key*, or None."""
+        if self.texts is None:
+            self.load()
+        return self.texts.get(key)
+
+    def set(self, key, text):
+        """Store *text* under *key*, returning True if it was written."""
+        if self.texts is None:
+            self.load()
+        self.texts[key] = text
+        return _dump_atomically(self.path, (self.key, self.texts))
+
+def _load_trusted(path):
+    # Unpickling runs arbitrary code, so only load files that nobody but
+    # the current user (or root) could have written.
+    f = open(path, "rb")
+    try:
+        st = os.fstat(f.fileno())
+        if st.st_uid not in (0, os.getuid()):
+            raise ValueError("%s is not owned by the current user" % path)
+        if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise ValueError("%s is writable by group or others" % path)
+        return pickle.load(f)
+    finally:
+        f.close()
+
+def _dump_atomically(path, data):
+    # Pickle to a temporary file that is then renamed over path, so
+    # concurrent readers never see a partial file. Whatever the umask,
+    # the file must stay loadable by _load_trusted.
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        f = os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            0644), "wb")
+        try:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
 class CommandLineMixin(object):
     """A command line application.
 
@@ -331,8 +1016,37 @@ class CommandLineMixin(object):
 
     *epilog* is text appended to the argument descriptions.
 
+    *parser_cache* is the name of a file in which to keep a
+    :class:`ParserCache` snapshot of the application's parser. If it is
+    not ``None``, :meth:`setup` loads the parser from the snapshot instead
+    of building it, as long as the application's source files and the
+    :mod:`cli` version haven't changed (see :meth:`parser_cache_key`).
+    Each :meth:`add_param` call is checked against the snapshot; the first
+    call that differs discards it and the parser is rebuilt by replaying
+    the :meth:`add_param` calls made so far. An updated snapshot is written
+    during :meth:`pre_run`. Changes made directly to :attr:`argparser`
+    (other than through :meth:`add_param`) are not tracked, so
+    applications using *parser_cache* should stick to :meth:`add_param`.
+    Rendered help and usage text is kept next to the snapshot, in a
+    :class:`HelpCache` named after *parser_cache* with a ``.help`` suffix.
+    Both files are unpickled, so they must be somewhere only trusted
+    users can write: files not owned by the current user (or root), or
+    writable by group or others, are ignored.
+
+    *jobs* is the default number of workers for :meth:`map`. If it is not
+    ``None``, :meth:`setup` adds a :option:`-j`/:option:`--jobs` parameter
+    to change it.
+
+    If *timings* is true, :meth:`setup` adds the :option:`--timings` and
+    :option:`--timings-json` parameters, which report
+    :attr:`Application.timings` at the end of the run (see
+    :meth:`report_timings`).
+
     The rest of the arguments are passed to the :class:`Application`
     constructor.
+
+    .. versionchanged:: 1.2
+        Added *parser_cache*, *jobs* and *timings*.
     """
     prefix = '-'
     argparser_factory = ArgumentParser
@@ -346,21 +1060,70 @@ class CommandLineMixin(object):
     relied upon.
     """
 
-    def __init__(self, usage=None, epilog=None, **kwargs):
+    def __init__(self, usage=None, epilog=None, parser_cache=None, jobs=None,
+            timings=False, **kwargs):
         self.usage = usage
         self.epilog = epilog
+        self.parser_cache = parser_cache
+        self.jobs = jobs
+        self.timings_params = timings
         self.actions = {}
         self.params = argparse.Namespace()
+        self._param_calls = []
+        self._parser_snapshot = None
 
+    @timed("CommandLineMixin.setup")
     def setup(self):
         """Configure the :class:`CommandLineMixin`.
 
         During setup, the application instantiates the
-        :class:`argparse.ArgumentParser` and adds a version parameter
+        :class:`argparse.ArgumentParser` (or loads it from
+        :attr:`parser_cache`) and adds a version parameter
         (:option:`-V`, to avoid clashing with :option:`-v`
-        verbose).
+        verbose) and, if :attr:`jobs` is set, :option:`-j` and if
+        *timings* was passed, :option:`--timings` and
+        :option:`--timings-json`.
         """
-        self.argparser = self.argparser_factory(
+        self._param_calls = []
+        self._parser_snapshot = None
+        if self.parser_cache is not None:
+            snapshot = ParserCache(self.parser_cache, self.parser_cache_key())
+            if snapshot.load():
+                self._parser_snapshot = snapshot
+
+        if self._parser_snapshot is not None:
+            self.argparser = self._parser_snapshot.parser
+            self.argparser.argv = self.argv
+            self.argparser.stdout = self.stdout
+            self.argparser.stderr = self.stderr
+        else:
+            self.argparser = self.build_argparser()
+
+        # We add this ourselves to avoid clashing with -v/verbose.
+        if self.version is not None:
+            self.add_param(
+                "-V", "--version", action="version", 
+                version=("%%(prog)s %s" % self.version),
+                help=("show program's version number and exit"))
+
+        if self.jobs is not None:
+            self.add_param("-j", "--jobs", type=int, default=self.jobs,
+                help="number of parallel workers (default: %(default)s)")
+
+        if self.timings_params:
+            self.add_param("--timings", default=False, action="store_true",
+                help="print how long each phase of the run took to stderr")
+            self.add_param("--timings-json", default=None, metavar="FILE",
+                help="write how long each phase of the run took to FILE, "
+                "as JSON")
+
+    @timed("CommandLineMixin.build_argparser")
+    def build_argparser(self):
+        """Return a new, empty :class:`argparse.ArgumentParser`.
+
+        .. versionadded:: 1.2
+        """
+        return self.argparser_factory(
             prog=self.name,
             usage=self.usage,
             description=self.description,
@@ -371,12 +1134,32 @@ class CommandLineMixin(object):
             stderr=self.stderr,
             )
 
-        # We add this ourselves to avoid clashing with -v/verbose.
-        if self.version is not None:
-            self.add_param(
-                "-V", "--version", action="version", 
-                version=("%%(prog)s %s" % self.version),
-                help=("show program's version number and exit"))
+    def parser_cache_key(self):
+        """Return the key under which :attr:`parser_cache` snapshots are stored.
+
+        The key combines the :mod:`cli` version with the modification
+        times of the modules defining the application's class hierarchy,
+        its :attr:`main` callable and the parser itself.
+
+        .. versionadded:: 1.2
+        """
+        names = [cls.__module__ for cls in type(self).__mro__]
+        names.append(getattr(self.main, "__module__", None))
+        names.extend([__name__, argparse.__name__])
+
+        mtimes = {}
+        for name in names:
+            path = getattr(sys.modules.get(name), "__file__", None)
+            if path is None:
+                continue
+            if path[-4:] in (".pyc", ".pyo") and os.path.exists(path[:-1]):
+                path = path[:-1]
+            try:
+                mtimes[os.path.abspath(path)] = os.stat(path).st_mtime
+            except OSError:
+                continue
+
+        return (cli.__version__, sorted(mtimes.items()))
 
     def add_param(self, *args, **kwargs):
         """Add a parameter.
@@ -386,11 +1169,127 @@ class CommandLineMixin(object):
         parameter options in a dictionary. This information can be used
         later by other subclasses when deciding whether to override
         parameters.
+
+        Passing *type_cache* (an integer) memoizes the parameter's type
+        conversion in a bounded LRU cache keyed by the raw argument
+        string, which pays off when the same expensive conversion is
+        repeated (for example across :meth:`ArgumentParser.parse_many`).
+        Types with side effects, like :class:`argparse.FileType`, are
+        never cached. The cache is available as the action's
+        :attr:`type_cache` attribute, whose :attr:`hits` and
+        :attr:`misses` counters can be used to tune its size.
+
+        .. versionchanged:: 1.2
+            When the parser was loaded from :attr:`parser_cache`, the
+            matching action from the snapshot is returned instead.
+
+        .. versionchanged:: 1.2
+            Added the *type_cache* argument.
         """
+        snapshot = self._parser_snapshot
+        if snapshot is not None:
+            i = len(self._param_calls)
+            if (i < len(snapshot.signatures) and
+                    snapshot.signatures[i] == self._param_signature(args, kwargs)):
+                action = snapshot.actions[i]
+                self._param_calls.append((args, kwargs, action))
+                self.actions[action.dest] = action
+                return action
+            self._rebuild_argparser()
+
         action = self.argparser.add_argument(*args, **kwargs)
+        self._param_calls.append((args, kwargs, action))
         self.actions[action.dest] = action
         return action
 
+    def add_params(self, specs):
+        """Add several parameters at once.
+
+        *specs* is a sequence of ``(args, kwargs)`` pairs, each holding
+        the arguments of one :meth:`add_param` call. All parameters are
+        validated before any is added, conflicting option strings are
+        found with a single dictionary pass, and the parser and
+        :attr:`actions` are updated in one step, which is much cheaper
+        than calling :meth:`add_param` for thousands of generated
+        parameters. Returns the list of actions.
+
+        .. versionadded:: 1.2
+        """
+        specs = [(tuple(args), dict(kwargs)) for args, kwargs in specs]
+        snapshot = self._parser_snapshot
+        if snapshot is not None:
+            i = len(self._param_calls)
+            signatures = [self._param_signature(args, kwargs)
+                for args, kwargs in specs]
+            if snapshot.signatures[i:i + len(specs)] == signatures:
+                actions = snapshot.actions[i:i + len(specs)]
+            else:
+                self._rebuild_argparser()
+                snapshot = None
+        if snapshot is None:
+            actions = self.argparser.add_arguments(specs)
+
+        self._param_calls.extend([(args, kwargs, action)
+            for (args, kwargs), action in zip(specs, actions)])
+        self.actions.update([(action.dest, action) for action in actions])
+        return actions
+
+    def _param_signature(self, args, kwargs):
+        try:
+            return pickle.dumps((args, sorted(kwargs.items())),
+                pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Unpicklable parameters (lambdas, open files...) can't be
+            # compared or cached.
+            return None
+
+    def _rebuild_argparser(self):
+        # Drop the snapshot and replay the add_param() calls made so far
+        # against a fresh parser. Group headings are carried over because
+        # subclasses sometimes retitle them directly.
+        old, calls = self.argparser, self._param_calls
+        self._parser_snapshot = None
+        self._param_calls = []
+        self.actions = {}
+        self.argparser = self.build_argparser()
+        for old_group, group in zip(old._action_groups,
+                self.argparser._action_groups):
+            group.title = old_group.title
+            group.description = old_group.description
+        for args, kwargs, action in calls:
+            self.add_param(*args, **kwargs)
+
+    def _update_parser_cache(self):
+        # Write a new snapshot unless the loaded one matched every
+        # add_param() call, then attach the help cache for the parser.
+        if self.parser_cache is None:
+            return
+        snapshot = self._parser_snapshot
+        if snapshot is not None:
+            if len(snapshot.signatures) == len(self._param_calls):
+                self._attach_help_cache()
+                return
+            self._rebuild_argparser()
+
+        signatures, actions = [], []
+        for args, kwargs, action in self._param_calls:
+            signature = self._param_signature(args, kwargs)
+            if signature is None:
+                return
+            signatures.append(signature)
+            actions.append(action)
+        snapshot = ParserCache(self.parser_cache, self.parser_cache_key())
+        if snapshot.save(self.argparser, signatures, actions):
+            self._parser_snapshot = snapshot
+            self._attach_help_cache()
+
+    def _attach_help_cache(self):
+        snapshot = self._parser_snapshot
+        plan = self.argparser._parse_plan
+        if "help_cache" not in plan:
+            plan["help_cache"] = HelpCache(self.parser_cache + ".help",
+                (snapshot.key, snapshot.signatures))
+
     def update_params(self, params, newparams):
         """Update a parameter namespace.
 
@@ -402,12 +1301,24 @@ class CommandLineMixin(object):
             :class:`argparse.Namespace` instances; previously, it took
             keyword arguments and updated :attr:`params` itself. This is
             now left to the caller.
+
+        .. versionchanged:: 1.2
+            If *newparams* is one of the compact namespaces generated by
+            the parser, *params* is first converted to the same class (so a
+            new instance may be returned) and then updated slot by slot.
         """
+        if isinstance(newparams, argparse._SlotsNamespace):
+            if type(params) is not type(newparams):
+                params = type(newparams)(**vars(params))
+            argparse._update_namespace(params, newparams)
+            return params
+
         for k, v in vars(newparams).items():
             setattr(params, k, v)
 
         return params
 
+    @timed("CommandLineMixin.pre_run")
     def pre_run(self):
         """Parse command line.
 
@@ -419,9 +1330,17 @@ class CommandLineMixin(object):
 
         If :meth:`argparse.ArgumentParser.parse_args` raises SystemExit but
         :attr:`exit_after_main` is not True, raise Abort instead.
+
+        .. versionchanged:: 1.2
+            Writes the :attr:`parser_cache` snapshot if it is out of date,
+            and points the parser at the current :attr:`stdout` and
+            :attr:`stderr`.
         """
+        self._update_parser_cache()
+        self.argparser.stdout = self.stdout
+        self.argparser.stderr = self.stderr
         try:
-            ns = self.argparser.parse_args(self.argv[1:])
+            ns = self._parse_args()
         except SystemExit, e:
             if self.exit_after_main:
                 raise
@@ -429,6 +1348,198 @@ class CommandLineMixin(object):
                 raise Abort(e.code)
         self.params = self.update_params(self.params, ns)
 
+    @timed("parse arguments")
+    def _parse_args(self):
+        return self.argparser.parse_args(self.argv[1:])
+
+    def report_timings(self):
+        """Report :attr:`Application.timings` as asked on the command line.
+
+        With :option:`--timings`, a breakdown is written to :attr:`stderr`;
+        with :option:`--timings-json`, the :meth:`Timings.as_json` document
+        is written to the named file.
+
+        .. versionadded:: 1.2
+        """
+        if getattr(self.params, "timings", False):
+            self.stderr.write(self.timings.format())
+        path = getattr(self.params, "timings_json", None)
+        if path is not None:
+            f = open(path, "w")
+            try:
+                f.write(self.timings.as_json())
+            finally:
+                f.close()
+
+    def map(self, func, items, ordered=True, threads=False, chunksize=1):
+        """Call *func* on each of *items* in parallel, yielding the results.
+
+        The calls are spread over :attr:`params.jobs <jobs>` workers (or
+        :attr:`jobs`), forked processes or, if *threads* is true, threads;
+        with a single worker they simply happen in turn. *items* are read
+        lazily and dispatched *chunksize* at a time, with at most two
+        chunks per worker in flight, so memory use doesn't grow with the
+        input. Results are yielded in the order of *items*, or as they are
+        ready if *ordered* is false.
+
+        What the calls write to :attr:`stdout` is collected per chunk and
+        written when its results are yielded, so the output of different
+        items isn't interleaved. The first exception raised by *func* is
+        raised here, once the results before it were yielded, and the
+        remaining work is abandoned; raised in :attr:`main`, it is handled
+        by :meth:`post_run` as usual. Process workers ignore
+        :data:`signal.SIGINT`, which is left to the application.
+
+        The processes are forked, so *func* need not be picklable, but its
+        results and exceptions must be.
+
+        .. versionadded:: 1.2
+        """
+        jobs = getattr(self.params, "jobs", None) or self.jobs or 1
+        if jobs <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        stdout = self.stdout
+        router = self.stdout = _OutputRouter(stdout)
+        if threads:
+            # Threads share this process, so each map() hands its own
+            # worker to the tasks.
+            from functools import partial
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(jobs)
+            task = partial(_map_chunk, (func, router))
+        else:
+            import multiprocessing
+            pool = multiprocessing.Pool(jobs, _init_map_process,
+                ((func, router),))
+            task = _map_process_chunk
+        try:
+            for results, output, error in _dispatch(pool, task, items,
+                    ordered, chunksize, 2 * jobs):
+                stdout.write(output)
+                for result in results:
+                    yield result
+                if error is not None:
+                    raise error
+            pool.close()
+        finally:
+            self.stdout = stdout
+            pool.terminate()
+
+class _OutputRouter(object):
+    # Send writes from threads (or processes) running map() chunks to their
+    # own buffers, and any others to stream.
+
+    def __init__(self, stream):
+        import threading
+        self.stream = stream
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def _target(self):
+        return getattr(self.local, "buffer", None) or self.stream
+
+    def write(self, s):
+        self._target().write(s)
+
+    def writelines(self, lines):
+        self._target().writelines(lines)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+_process_worker = None
+
+def _init_map_process(worker):
+    # A forked process serves a single pool, so it can keep the pool's
+    # worker (func and router) to itself; func needn't be picklable.
+    global _process_worker
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_worker = worker
+
+def _map_process_chunk(chunk):
+    return _map_chunk(_process_worker, chunk)
+
+def _map_chunk(worker, chunk):
+    # Return the results of the calls on chunk, the output they wrote and
+    # the exception that stopped them, if any.
+    from StringIO import StringIO
+    func, router = worker
+    router.local.buffer = buffer = StringIO()
+    results = []
+    error = None
+    try:
+        try:
+            for item in chunk:
+                results.append(func(item))
+        except Exception, e:
+            error = e
+    finally:
+        router.local.buffer = None
+    return results, buffer.getvalue(), error
+
+# How long _next_result blocks at a time. An untimed wait on a lock can't
+# be interrupted, so it never waits without one.
+_WAIT_TIMEOUT = 1.0
+
+def _dispatch(pool, task, items, ordered, chunksize, limit):
+    # Yield the task() results of the chunks of items, keeping at most
+    # limit chunks in flight. Unordered, the pool's callbacks put the
+    # number of each finished chunk on a queue.
+    from collections import OrderedDict
+    from itertools import count, islice
+    from Queue import Queue
+    pending = OrderedDict()
+    finished = callback = None
+    if not ordered:
+        finished = Queue()
+    items = iter(items)
+    for number in count():
+        chunk = list(islice(items, chunksize))
+        if not chunk:
+            break
+        if finished is not None:
+            callback = lambda value, number=number: finished.put(number)
+        pending[number] = pool.apply_async(task, (chunk,), callback=callback)
+        if len(pending) >= limit:
+            yield _next_result(pending, finished)
+    while pending:
+        yield _next_result(pending, finished)
+
+def _next_result(pending, finished):
+    # Block until the first pending chunk is done or, with finished, any
+    # chunk. A chunk whose task raised gets no callback, so when the wait
+    # times out, pending is checked for those.
+    from Queue import Empty
+    while True:
+        if finished is None:
+            number = next(iter(pending))
+            pending[number].wait(_WAIT_TIMEOUT)
+        else:
+            try:
+                number = finished.get(True, _WAIT_TIMEOUT)
+            except Empty:
+                ready = [n for n, result in pending.items() if result.ready()]
+                if not ready:
+                    continue
+                number = ready[0]
+            if number not in pending:
+                # already found ready when a wait timed out
+                continue
+        result = pending[number]
+        if finished is not None:
+            # the callback runs just before the result is marked ready
+            result.wait()
+        if result.ready():
+            del pending[number]
+            return result.get()
+
 class CommandLineApp(CommandLineMixin, Application):
     """A command line application.
 
@@ -447,3 +1558,5 @@ class CommandLineApp(CommandLineMixin, Application):
     def setup(self):
         Application.setup(self)
         CommandLineMixin.setup(self)
+
+_import_time = default_timer() - _import_start
@@ -0,0 +1,164 @@
+"""\
+:mod:`cli.batch` -- running applications over many command lines
+----------------------------------------------------------------
+
+Run one application instance over many command lines, in process, instead
+of starting an interpreter for each of them. The command lines are read
+one per line and split like a shell would (:func:`shlex.split`)::
+
+    $ python -m cli.batch -j 4 mytool.main:app commands.txt
+
+Each run's output is passed on in order (or written to files with
+:option:`--output-dir`), and a summary of the exit statuses and
+throughput is written to standard error.
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import os
+import shlex
+import time
+
+from cli.app import CommandLineApp
+from cli.util import resolve
+
+__all__ = ["BatchSummary", "read_argvs", "batch"]
+
+def read_argvs(lines):
+    """Yield the arguments on each of *lines*, split as by a shell.
+
+    Empty lines and comments (from ``#`` to the end of the line) are
+    skipped.
+
+    .. versionadded:: 1.2
+    """
+    for line in lines:
+        args = shlex.split(line, comments=True)
+        if args:
+            yield args
+
+class BatchSummary(object):
+    """Exit statuses and timing of the runs of a batch.
+
+    Pass each :class:`cli.app.RunResult` to :meth:`add`. :attr:`statuses`
+    maps each exit status to the number of runs that returned it,
+    :attr:`count` is the number of runs and :attr:`busy` the time they took
+    together; the wall clock time starts with the summary.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self):
+        self.statuses = {}
+        self.count = 0
+        self.busy = 0.0
+        self.start = time.time()
+
+    def add(self, result):
+        self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+        self.count += 1
+        self.busy += result.elapsed
+
+    @property
+    def failed(self):
+        """The number of runs that did not return 0."""
+        return self.count - self.statuses.get(0, 0)
+
+    @property
+    def elapsed(self):
+        """The wall clock time since the summary was created."""
+        return time.time() - self.start
+
+    def format(self):
+        """Return a one line report."""
+        elapsed = self.elapsed
+        rate = elapsed and self.count / elapsed or 0.0
+        statuses = ", ".join(["%d: %d" % item
+            for item in sorted(self.statuses.items())])
+        return "%d runs, %d failed in %.3fs (%.1f runs/s, %.3fs busy); " \
+            "exit statuses {%s}\n" % (self.count, self.failed, elapsed, rate,
+            self.busy, statuses)
+
+@CommandLineApp
+def batch(app):
+    """Run an application once for each command line in the input files."""
+    target = resolve(app.params.app)
+    if isinstance(target, type):
+        target = target()
+    capture = app.params.capture or app.params.output_dir is not None
+
+    def argvs():
+        for name in app.params.files:
+            if name == "-":
+                for args in read_argvs(app.stdin):
+                    yield args
+            else:
+                f = open(name)
+                try:
+                    for args in read_argvs(f):
+                        yield args
+                finally:
+                    f.close()
+
+    if capture and app.params.output_dir is not None:
+        if not os.path.isdir(app.params.output_dir):
+            os.makedirs(app.params.output_dir)
+
+    summary = BatchSummary()
+    results = target.run_many(argvs(), processes=app.params.processes,
+        chunksize=app.params.chunksize, capture=capture)
+    for index, result in enumerate(results):
+        summary.add(result)
+        if not capture:
+            continue
+        if app.params.output_dir is None:
+            app.stdout.write(result.stdout)
+            app.stderr.write(result.stderr)
+            continue
+        prefix = os.path.join(app.params.output_dir, "%06d" % index)
+        for suffix, text in ((".out", result.stdout), (".err", result.stderr)):
+            f = open(prefix + suffix, "w")
+            try:
+                f.write(text)
+            finally:
+                f.close()
+        f = open(prefix + ".status", "w")
+        try:
+            f.write("%d\n" % result.status)
+        finally:
+            f.close()
+
+    app.stdout.flush()
+    app.stderr.write(summary.format())
+    return summary.failed and 1 or 0
+
+batch.add_param("app", help="application to run, as MODULE:ATTRIBUTE")
+batch.add_param("files", nargs="*", default=["-"],
+    help="files with one command line per line (default: standard input)")
+batch.add_param("-j", "--processes", type=int, default=None,
+    help="spread the runs over this many worker processes")
+batch.add_param("--chunksize", type=int, default=16,
+    help="runs sent to a worker at a time")
+batch.add_param("--no-capture", dest="capture", default=True,
+    action="store_false",
+    help="let the runs write to the output directly, in any order")
+batch.add_param("-o", "--output-dir", default=None,
+    help="write each run's output, errors and status to files in this "
+    "directory instead")
+
+if __name__ == "__main__":
+    batch.run()
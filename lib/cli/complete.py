@@ -27,7 +27,8 @@ import logging
 #logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s', stream=sys.stderr)
 log = logging.getLogger(__name__)
 
-from cli.app import Application, Abort
+from cli.app import Application, Abort, timed
+from cli._ext import argparse
 from cli.log import LoggingMixin
 
 __all__ = ['CompletionMixin', 'CommandCompleter']
@@ -35,9 +36,21 @@ __all__ = ['CompletionMixin', 'CommandCompleter']
 
 class CommandCompleter(object):
     """Readline and bash command completion.
+
+    If *parser* is given, the words before the one being completed are run
+    through :meth:`argparse.ArgumentParser.parse_partial`, so that
+    positionals, subcommands and options taking several arguments are
+    completed the way the parser would read them. Otherwise the previous
+    word is looked up in *actions*. Actions whose destination is in
+    *exclude* are never proposed.
+
+    .. versionchanged:: 1.2
+        Added *parser*.
     """
-    def __init__(self, actions, exclude=None):
+    def __init__(self, actions, exclude=None, parser=None):
         self.actions = actions
+        self.exclude = frozenset(exclude or ())
+        self.parser = parser
         self.current_candidates = []
 
     def _find_action_by_option_string(self, option_string):
@@ -49,6 +62,8 @@ class CommandCompleter(object):
     def complete(self, first, current, previous, words, index):
         log.debug('complete: first=%s, current=%s, previous=%s, words=%s, index=%s',
             first, current, previous, words, index)
+        if self.parser is not None:
+            return self.complete_partial(current, words)
         candidates = []
         try:
             if current:
@@ -79,10 +94,64 @@ class CommandCompleter(object):
 
             log.debug('candidates=%s', candidates)
         except (KeyError, IndexError) as err:
-            self.log.debug('completion error: %s', err)
+            log.debug('completion error: %s', err)
             candidates = []
         return candidates
 
+    def complete_partial(self, current, words):
+        """Complete *current* from the state :attr:`parser` is in after
+        the words before it (*words* starts with the command name).
+        """
+        if current:
+            words = words[1:-1]
+        else:
+            words = words[1:]
+        state = self.parser.parse_partial(words)
+        log.debug('complete_partial: %s', state)
+        if state.error is not None:
+            return []
+
+        # the choices of the action that takes the next word; an option
+        # that still needs arguments only takes those
+        action = state.action
+        possible = []
+        if action is not None:
+            if action.choices is not None:
+                possible.extend(sorted(action.choices))
+            if action.option_strings and self._needs_argument(action,
+                    state.consumed[action]):
+                if not possible and current:
+                    possible.append(current)
+                return [w for w in possible if w.startswith(current)]
+
+        # options not given yet, or in a mutually exclusive group with
+        # one that was
+        parser = state.parser
+        taken = set()
+        for group in parser._mutually_exclusive_groups:
+            for group_action in group._group_actions:
+                if group_action in state.consumed:
+                    taken.update(group._group_actions)
+                    break
+        for option_action in parser._get_optional_actions():
+            if (option_action.dest not in self.exclude and
+                    option_action not in state.consumed and
+                    option_action not in taken):
+                possible.extend(option_action.option_strings)
+        return [w for w in possible if w.startswith(current)]
+
+    @staticmethod
+    def _needs_argument(action, count):
+        # whether an option that consumed count words needs more
+        nargs = action.nargs
+        if nargs is None:
+            return count < 1
+        elif nargs == argparse.ONE_OR_MORE:
+            return count < 1
+        elif isinstance(nargs, int):
+            return count < nargs
+        return False
+
     # TODO: also implement bash/zsh/shell completion
     #   @see http://www.gnu.org/software/bash/manual/bashref.html#Programmable-Completion
     #   @see /home/sar/vcs/plugit for inspiration
@@ -137,6 +206,7 @@ class CompletionMixin(object):
             'help': 'print a string to stdout which can be eval\'ed to enable command completion for the current shell'})
     )
 
+    @timed("CompletionMixin.setup")
     def setup(self):
         """Configure the :class:`CompletionMixin`.
 
@@ -171,8 +241,10 @@ class CompletionMixin(object):
             index = os.environ['COMP_POINT']
             words = line.split()
             # exclude bash completion related actions from completion
-            actions = dict([(name,action) for name,action in self.actions.items() if name not in ('bash_complete', 'bash_eval')])
-            completer = CommandCompleter(actions)
+            exclude = ('bash_complete', 'bash_eval')
+            actions = dict([(name,action) for name,action in self.actions.items() if name not in exclude])
+            completer = CommandCompleter(actions, exclude=exclude,
+                parser=self.argparser)
             candidates = completer.complete(first, current, previous, words, index)
             log.debug('CompletionMixin candidates: %s', candidates)
             print '\n'.join(candidates)
@@ -29,7 +29,7 @@ __todo__ = """\
 import os
 import sys
 
-from cli.app import CommandLineApp, CommandLineMixin, Application
+from cli.app import CommandLineApp, CommandLineMixin, Application, timed
 from cli.log import LoggingMixin
 
 __all__ = ["DaemonizingApp", "DaemonizingMixin"]
@@ -60,6 +60,7 @@ class DaemonizingMixin(object):
         self.chdir = chdir
         self.null = null
 
+    @timed("DaemonizingMixin.setup")
     def setup(self):
         """Configure the :class:`DaemonizingMixin`.
 
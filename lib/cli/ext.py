@@ -9,17 +9,24 @@
 """
 import os
 
+from cli.util import lazy
+
 # Add included module names to __all__.
 __all__ = ["argparse", "scripttest"]
 project = os.path.basename(os.path.dirname(__file__))
 ext = project + "._ext"
 
-name, module = None, None
-for name in __all__:
-    try:
-        module = __import__(name)
-    except ImportError:
-        module = __import__('.'.join((ext, name)), {}, {}, [ext])
-    locals()[name] = module
+def loader(name):
+    """Return a function importing *name*, preferring an installed copy."""
+    def load():
+        try:
+            return __import__(name)
+        except ImportError:
+            return __import__('.'.join((ext, name)), {}, {}, [ext])
+    return load
+
+# Nothing is imported until first use, so production code never pays for
+# scripttest (and subprocess) or argparse unless it needs them.
+lazy(__name__, dict([(name, loader(name)) for name in __all__]))
 
-del(ext, module, name, project)
+del(project)
@@ -27,7 +27,7 @@ import argparse
 import logging
 log = logging.getLogger(__name__)
 
-from cli.app import CommandLineApp, CommandLineMixin, Application, Abort
+from cli.app import CommandLineApp, CommandLineMixin, Application, Abort, timed
 from cli.log import LoggingMixin
 from cli.complete import CommandCompleter
 
@@ -61,7 +61,8 @@ class InteractiveAppCompleter(CommandCompleter):
             # delegate to commands own completer
             command = self.commands[first]
             if not hasattr(command, 'completer'):
-                command.completer = CommandCompleter(command.actions)
+                command.completer = CommandCompleter(command.actions,
+                    parser=command.argparser)
             current_candidates = command.completer.complete(first, current, previous, words, index)
         return current_candidates
 
@@ -77,6 +78,7 @@ class InteractiveMixin(object):
         self.readline_completekey = readline_completekey
         self.commands = {}
 
+    @timed("InteractiveMixin.setup")
     def setup(self):
         """Configure the :class:`InteractiveMixin`.
 
@@ -92,6 +94,7 @@ class InteractiveMixin(object):
                 metavar=', '.join(self.commands.keys()),
                 help='for command specific help run \'<command> -h\'')
 
+    @timed("InteractiveMixin.pre_run")
     def pre_run(self):
         self.log.debug('pre_run')
         if self.readline_history:
@@ -27,7 +27,7 @@ import sys
 
 from logging import Formatter, StreamHandler
 
-from cli.app import CommandLineApp, CommandLineMixin, Application
+from cli.app import CommandLineApp, CommandLineMixin, Application, timed
 
 __all__ = ["LoggingApp", "LoggingMixin", "CommandLineLogger"]
 
@@ -121,6 +121,10 @@ class LoggingMixin(object):
     logger. This means that, for example, code that knows nothing about
     the :class:`LoggingMixin` can inherit its verbosity level, formatters
     and handlers.
+
+    When :meth:`cli.app.Application.run_many` captures the output of a
+    run and *stream* is the application's :attr:`stdout` or
+    :attr:`stderr`, log messages are captured with it.
     """
 
     def __init__(self, stream=sys.stdout, logfile=None,
@@ -132,6 +136,7 @@ class LoggingMixin(object):
         self.date_format = date_format
         self.root = root
 
+    @timed("LoggingMixin.setup")
     def setup(self):
         """Configure the :class:`LoggingMixin`.
 
@@ -162,6 +167,7 @@ class LoggingMixin(object):
             logging.Logger.root = self.log
             logging.Logger.manager = logging.Manager(self.log)
 
+    @timed("LoggingMixin.pre_run")
     def pre_run(self):
         """Set the verbosity level and configure the logger.
 
@@ -192,6 +198,32 @@ class LoggingMixin(object):
         if not self.log.handlers:
             self.log.addHandler(NullHandler())
 
+    def _run_one(self, args, capture):
+        # While run_many() captures stdout and stderr, log to whichever of
+        # them stream is; pre_run() makes the handler during the run.
+        stream = self.stream
+        if capture and stream is not None:
+            for name in ("stdout", "stderr"):
+                if stream is getattr(self, name):
+                    self.stream = _AppStream(self, name)
+        try:
+            return super(LoggingMixin, self)._run_one(args, capture)
+        finally:
+            self.stream = stream
+
+class _AppStream(object):
+    # Write to the application's current stdout or stderr.
+
+    def __init__(self, app, name):
+        self.app = app
+        self.name = name
+
+    def write(self, s):
+        getattr(self.app, self.name).write(s)
+
+    def flush(self):
+        getattr(self.app, self.name).flush()
+
 class LoggingApp(LoggingMixin, CommandLineMixin, Application):
     """A logging application.
 
@@ -0,0 +1,341 @@
+"""\
+:mod:`cli.streams` -- fast application input and output
+-------------------------------------------------------
+
+:func:`read_records` reads a stream in large chunks and splits them into
+records, so that a filter doesn't pay for a Python level read per line;
+:meth:`cli.app.Application.records` reads :attr:`stdin` with it and
+:meth:`cli.app.Application.emit` writes records back out::
+
+    @Application
+    def upper(app):
+        for batch in app.records(batch=1000):
+            app.emit([record.upper() for record in batch])
+
+A :class:`BufferedOutput` collects an application's writes into large
+blocks and hands each block to the operating system in one go, instead of
+going through the file object (and its encoding) line by line. An
+:class:`cli.app.Application` created with ``buffered=True`` wraps its
+:attr:`stdout` in one::
+
+    @CommandLineApp(buffered=True)
+    def numbers(app):
+        for i in xrange(10 ** 7):
+            app.stdout.write("%d\\n" % i)
+
+If the reader goes away (``numbers | head``), the next flush raises
+:class:`BrokenPipe`, which ends the application quietly with status
+:data:`EPIPE_STATUS`.
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+import errno
+import itertools
+import mmap
+import os
+import signal
+import stat
+
+from cli.app import Abort
+
+__all__ = ["BrokenPipe", "BufferedOutput", "DEFAULT_BUFFER_SIZE",
+    "DEFAULT_CHUNK_SIZE", "EPIPE_STATUS", "read_records"]
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+"""The default size of a :class:`BufferedOutput` buffer, in bytes."""
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+"""The default size of the chunks :func:`read_records` reads, in bytes."""
+
+EPIPE_STATUS = 128 + signal.SIGPIPE
+"""The exit status after :class:`BrokenPipe`, as if killed by ``SIGPIPE``."""
+
+class BrokenPipe(Abort):
+    """Raised when the reader of a :class:`BufferedOutput` went away.
+
+    As an :class:`cli.app.Abort`, it ends the application with
+    :data:`EPIPE_STATUS` and no traceback.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, status=EPIPE_STATUS):
+        Abort.__init__(self, status)
+
+class BufferedOutput(object):
+    """A write buffer in front of *stream*.
+
+    :meth:`write` only adds the string to a list and its length to a
+    running total; once that reaches *size* characters (or bytes, for
+    :class:`str`), the strings are joined into a block and written out,
+    so a single write of *size* or more is written at once. If *stream*
+    has a file descriptor, the block is encoded with *encoding* (by
+    default, the stream's or UTF-8) and written to a duplicate of it
+    opened with a *size* byte buffer. With *binary*, the strings are
+    expected to be bytes already and :meth:`write` *is* that file
+    object's, without even a Python function call in between. Other
+    streams (like :class:`cli.util.StringIO`) get the blocks unencoded.
+    :meth:`writelines` joins its lines before writing them.
+
+    When the other end of a pipe is closed, the :exc:`IOError` is turned
+    into :class:`BrokenPipe` (see :meth:`handle_error`) and the file
+    descriptors are pointed at :data:`os.devnull`, so that nothing
+    complains at exit; every later write raises :class:`BrokenPipe`.
+
+    Other attributes are those of *stream*.
+
+    .. versionadded:: 1.2
+    """
+    softspace = 0
+
+    def __init__(self, stream, size=DEFAULT_BUFFER_SIZE, binary=False,
+            encoding=None, errors="strict"):
+        self.stream = stream
+        self.size = size
+        self.binary = binary
+        self.encoding = encoding or getattr(stream, "encoding", None) or \
+            "utf-8"
+        self.errors = errors
+        self.broken = False
+        self.file = None
+        self._chunks = []
+        self._length = 0
+        self._open()
+
+    def _open(self):
+        try:
+            self.fd = self.stream.fileno()
+        except (AttributeError, EnvironmentError, ValueError):
+            self.fd = None
+        if self.fd is not None:
+            self.stream.flush()
+            # Python 2 file objects write str faster in text mode, which
+            # is the same as binary mode on POSIX.
+            mode = os.name == "posix" and "w" or "wb"
+            self.file = os.fdopen(os.dup(self.fd), mode, self.size)
+            self._write = self.file.write
+            if self.binary:
+                self.write = self._write
+
+    def reopen(self):
+        """Write to what the stream's file descriptor refers to now.
+
+        The output goes to a duplicate of the descriptor made when the
+        :class:`BufferedOutput` was created, so replacing the descriptor
+        (say, with :func:`os.dup2` in a forked child) doesn't redirect
+        it; call this afterwards. Anything still buffered is discarded.
+
+        .. versionadded:: 1.2
+        """
+        del self._chunks[:]
+        self._length = 0
+        if self.file is not None:
+            # drop the old duplicate without flushing it
+            os.close(self.file.fileno())
+            try:
+                self.file.close()
+            except EnvironmentError:
+                pass
+            self.file = None
+        self.__dict__.pop("write", None)
+        self.broken = False
+        self._open()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def write(self, s):
+        """Buffer *s*, writing out the buffer when it is full."""
+        self._chunks.append(s)
+        self._length += len(s)
+        if self._length >= self.size:
+            self.flush()
+
+    def writelines(self, lines):
+        """Buffer all of *lines*, joined into a single string."""
+        if self.binary:
+            self.write("".join(lines))
+            return
+        lines = list(lines)
+        try:
+            data = "".join(lines)
+        except UnicodeError:
+            data = "".join([self._encode(s) for s in lines])
+        self._chunks.append(data)
+        self._length += len(data)
+        if self._length >= self.size:
+            self.flush()
+
+    def _join(self):
+        # Join the buffered strings; bytes that aren't ASCII can't be
+        # joined with unicode, so then everything is encoded first.
+        chunks = self._chunks
+        try:
+            data = "".join(chunks)
+        except UnicodeError:
+            data = "".join([self._encode(s) for s in chunks])
+        del chunks[:]
+        self._length = 0
+        return data
+
+    def _encode(self, s):
+        if isinstance(s, unicode):
+            return s.encode(self.encoding, self.errors)
+        return s
+
+    def flush(self):
+        """Write out the buffer."""
+        if self.broken:
+            raise BrokenPipe()
+        try:
+            if self.file is not None:
+                if self._chunks:
+                    self._write(self._encode(self._join()))
+                self.file.flush()
+            elif self._chunks:
+                self.stream.write(self._join())
+                self.stream.flush()
+        except EnvironmentError, e:
+            self.handle_error(e)
+            raise
+
+    def handle_error(self, error):
+        """Raise :class:`BrokenPipe` if *error* means the reader went away.
+
+        :meth:`flush` calls this for the errors it sees, and
+        :meth:`cli.app.Application.post_run` for an error that ended
+        :attr:`main`: to stay fast, :meth:`write` in *binary* mode lets
+        the file object's :exc:`IOError` through. Other errors are
+        ignored.
+        """
+        if getattr(error, "errno", None) != errno.EPIPE or self.fd is None:
+            return
+        if not self.broken:
+            self.broken = True
+            self.write = self._write_broken
+            null = os.open(os.devnull, os.O_WRONLY)
+            try:
+                os.dup2(null, self.fd)
+                os.dup2(null, self.file.fileno())
+            finally:
+                os.close(null)
+        raise BrokenPipe()
+
+    def _write_broken(self, s):
+        raise BrokenPipe()
+
+    def close(self):
+        """Write out the buffer and close *stream*."""
+        try:
+            self.flush()
+        finally:
+            if self.file is not None:
+                self.file.close()
+            self.stream.close()
+
+def read_records(stream, sep="\n", chunk_size=None, batch=None):
+    """Yield the records in *stream*, separated by *sep*.
+
+    The records don't include *sep*; a last record without one is
+    yielded too. *stream* is read in chunks of *chunk_size* bytes (by
+    default :data:`DEFAULT_CHUNK_SIZE`): regular files are read through
+    :mod:`mmap`, other file descriptors with :func:`os.read` (which
+    returns what a pipe has, instead of waiting for a full chunk) and
+    other streams with their :meth:`read` method. Because the file
+    descriptor is read directly, *stream* shouldn't have been read from
+    before.
+
+    If *batch* is a number, lists of *batch* records are yielded instead
+    (the last one may be shorter). Either way, the next chunk is only
+    read once the records of the previous one have been consumed, so a
+    slow consumer holds at most a chunk and a batch in memory.
+
+    .. versionadded:: 1.2
+    """
+    if not sep:
+        raise ValueError("empty record separator")
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    records = _split(_read_chunks(stream, chunk_size), sep)
+    if batch is None:
+        return itertools.chain.from_iterable(records)
+    return _batches(records, batch)
+
+def _batches(records, batch):
+    # Regroup the lists of records into lists of batch records.
+    pending = []
+    for chunk in records:
+        pending.extend(chunk)
+        if len(pending) >= batch:
+            full = len(pending) - len(pending) % batch
+            for i in xrange(0, full, batch):
+                yield pending[i:i + batch]
+            pending = pending[full:]
+    if pending:
+        yield pending
+
+def _split(chunks, sep):
+    # Yield the list of complete records in each chunk.
+    rest = ""
+    for chunk in chunks:
+        records = (rest + chunk).split(sep)
+        rest = records.pop()
+        if records:
+            yield records
+    if rest:
+        yield [rest]
+
+def _read_chunks(stream, size):
+    try:
+        fd = stream.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        fd = None
+    if fd is None:
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    info = os.fstat(fd)
+    if stat.S_ISREG(info.st_mode):
+        end = info.st_size
+        pos = os.lseek(fd, 0, os.SEEK_CUR)
+        if pos >= end:
+            return
+        view = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        try:
+            while pos < end:
+                chunk = view[pos:pos + size]
+                pos += len(chunk)
+                yield chunk
+        finally:
+            view.close()
+            os.lseek(fd, pos, os.SEEK_SET)
+        return
+
+    while True:
+        try:
+            chunk = os.read(fd, size)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,155 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+import time
+
+from tempfile import TemporaryFile
+
+from cli.aio import AsyncApplication, AsyncCommandLineApp, EventLoop, Return
+from cli.app import Abort, timed
+from cli.util import StringIO
+
+from cli import tests
+
+def upper(app):
+    while True:
+        line = yield app.async_stdin.readline()
+        if not line:
+            break
+        app.async_stdout.write(line.upper())
+    yield app.async_stdout.drain()
+    raise Return(len(app.params.words))
+
+class TestEventLoop(tests.BaseTest):
+
+    def test_concurrent(self):
+        loop = EventLoop()
+        def nap(i):
+            yield loop.sleep(0.05)
+            raise Return(i)
+        start = time.time()
+        results = loop.run_until_complete(loop.gather(
+            [nap(i) for i in range(500)]))
+        self.assertEqual(results, range(500))
+        self.assertTrue(time.time() - start < 1)
+
+    def test_errors(self):
+        loop = EventLoop()
+        def fail():
+            yield None
+            raise ValueError("inner")
+        def outer():
+            try:
+                yield fail()
+            except ValueError, e:
+                raise Return(str(e))
+        self.assertEqual(loop.run_until_complete(outer()), "inner")
+        self.assertRaises(ValueError, loop.run_until_complete, fail())
+
+    def test_pipes(self):
+        loop = EventLoop()
+        rfd, wfd = os.pipe()
+        def writer():
+            for i in range(3):
+                yield loop.writable(wfd)
+                os.write(wfd, "line %d\n" % i)
+                yield loop.sleep(0.01)
+            os.close(wfd)
+        def reader():
+            from cli.aio import AsyncReader
+            stream = AsyncReader(loop, os.fdopen(rfd))
+            lines = []
+            while True:
+                line = yield stream.readline()
+                if not line:
+                    raise Return(lines)
+                lines.append(line)
+        _, lines = loop.run_until_complete([writer(), reader()])
+        self.assertEqual(lines, ["line 0\n", "line 1\n", "line 2\n"])
+
+class TestAsyncApplication(tests.BaseTest):
+
+    def make_app(self, main, stdin=u"", **kwargs):
+        kwargs.setdefault("stdout", StringIO())
+        app = AsyncCommandLineApp(main, argv=["upper"], exit_after_main=False,
+            stdin=StringIO(stdin), stderr=StringIO(), **kwargs)
+        app.add_param("words", nargs="*")
+        return app
+
+    def test_run(self):
+        app = self.make_app(upper, u"a\nb")
+        self.assertEqual(app.run(["upper", "x", "y"]), 2)
+        self.assertEqual(app.stdout.getvalue(), "A\nB")
+
+    def test_reraise(self):
+        def fail(app):
+            yield app.loop.sleep(0)
+            raise ValueError("boom")
+        self.assertRaises(ValueError, self.make_app(fail).run)
+        self.assertEqual(self.make_app(fail, reraise=()).run(), 1)
+        self.assertRaises(Abort, self.make_app(fail).run, ["upper", "-x"])
+
+    def test_drain_after_error(self):
+        def fail(app):
+            app.async_stdout.write(u"partial\n")
+            yield app.loop.sleep(0)
+            raise ValueError("boom")
+        app = self.make_app(fail)
+        self.assertRaises(ValueError, app.run)
+        self.assertEqual(app.stdout.getvalue(), "partial\n")
+        f = TemporaryFile()
+        app = self.make_app(fail, reraise=(), stdout=f)
+        self.assertEqual(app.run(), 1)
+        f.seek(0)
+        self.assertEqual(f.read(), "partial\n")
+
+    def test_timings(self):
+        app = self.make_app(upper, u"a\n", timings=True)
+        app.run(["upper"])
+        app.run(["upper"])
+        names = [name for name, depth, seconds in app.timings.entries]
+        self.assertEqual(names.count("main"), 1)
+        self.assertEqual(names[-2:], ["main", "Application.post_run"])
+
+    def test_timed_coroutine(self):
+        class App(AsyncApplication):
+            @timed("slow pre_run")
+            def pre_run(self):
+                yield self.loop.sleep(0.05)
+                raise Return("ready")
+        app = App(lambda app: None, exit_after_main=False)
+        app.run()
+        entries = [entry for entry in app.timings.entries
+            if entry[0] == "slow pre_run"]
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0][2] >= 0.05)
+
+    def test_hooks(self):
+        calls = []
+        class App(AsyncApplication):
+            def pre_run(self):
+                yield self.loop.sleep(0)
+                calls.append("pre_run")
+            def main(self):
+                calls.append("main")
+            def post_run(self, returned):
+                yield None
+                calls.append("post_run")
+                raise Return(returned)
+        self.assertEqual(App(exit_after_main=False).run(), None)
+        self.assertEqual(calls, ["pre_run", "main", "post_run"])
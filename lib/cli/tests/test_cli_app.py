@@ -15,7 +15,16 @@ ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
 OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 """
 
-from cli.app import Abort, Application, CommandLineApp
+import os
+import sys
+import time
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli._ext import argparse
+from cli.app import Abort, Application, CommandLineApp, HelpCache, \
+    ParseCache, ParserCache
 from cli.util import StringIO
 
 from cli import tests
@@ -105,3 +114,431 @@ class TestCommandLineApp(tests.AppTest):
     def test_version(self):
         self.app.version = "0.1"
         self.app.run()
+
+class TestParserCache(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix="parser-cache-")
+        self.path = os.path.join(self.tmpdir, "parser")
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def makeapp(self, *params):
+        app = FakeCommandLineApp(argv=["test", "-f", "bar"],
+            exit_after_main=False, parser_cache=self.path,
+            stdout=StringIO(), stderr=StringIO())
+        for args in params:
+            app.add_param(*args, **{"default": None})
+        return app
+
+    def test_snapshot_reused(self):
+        app = self.makeapp(("-f", "--foo"))
+        self.assertEqual(app._parser_snapshot, None)
+        app.run()
+        self.assertEqual(app.params.foo, "bar")
+        self.assertTrue(os.path.exists(self.path))
+
+        app = self.makeapp(("-f", "--foo"))
+        self.assertNotEqual(app._parser_snapshot, None)
+        self.assertTrue(app.actions["foo"] is app._parser_snapshot.actions[0])
+        app.run()
+        self.assertEqual(app.params.foo, "bar")
+        self.assertTrue(app.argparser.stdout is app.stdout)
+
+    def test_changed_param_invalidates(self):
+        self.makeapp(("-f", "--foo")).run()
+
+        app = self.makeapp(("-f", "--foo"), ("-b", "--bar"))
+        app.argv = ["test", "-b", "baz"]
+        app.run()
+        self.assertEqual(app.params.bar, "baz")
+
+        app = self.makeapp(("-f", "--fob"))
+        self.assertEqual(app._parser_snapshot, None)
+        app.run()
+        self.assertEqual(app.params.fob, "bar")
+        self.assertFalse(hasattr(app.params, "foo"))
+
+    def test_fewer_params_invalidates(self):
+        self.makeapp(("-f", "--foo"), ("-b", "--bar")).run()
+
+        app = self.makeapp(("-f", "--foo"))
+        app.run()
+        self.assertFalse(hasattr(app.params, "bar"))
+
+    def test_untrusted_snapshot(self):
+        umask = os.umask(0)
+        try:
+            self.makeapp(("-f", "--foo")).run()
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(self.path).st_mode & 0777, 0644)
+        self.assertNotEqual(self.makeapp(("-f", "--foo"))._parser_snapshot,
+            None)
+        for mode in (0664, 0646):
+            os.chmod(self.path, mode)
+            app = self.makeapp(("-f", "--foo"))
+            self.assertEqual(app._parser_snapshot, None)
+        os.chmod(self.path, 0644)
+        help = HelpCache(self.path + ".help", "key")
+        help.set("usage", "text")
+        self.assertEqual(HelpCache(help.path, "key").get("usage"), "text")
+        os.chmod(help.path, 0666)
+        self.assertEqual(HelpCache(help.path, "key").get("usage"), None)
+
+    def run_help(self, *params):
+        # argparse prints help to sys.stdout
+        app = self.makeapp(*params)
+        app.argv = ["test", "-h"]
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            self.assertRaises(Abort, app.run)
+            return app, sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_help_cache(self):
+        app, help = self.run_help(("-f", "--foo"))
+        self.assertTrue("--foo" in help)
+        self.assertTrue(os.path.exists(self.path + ".help"))
+
+        def fail(formatter):
+            self.fail("help was rendered again")
+        FakeCommandLineApp.argparser_factory._format_help_text = fail
+        try:
+            app, cached = self.run_help(("-f", "--foo"))
+        finally:
+            del FakeCommandLineApp.argparser_factory._format_help_text
+        self.assertEqual(cached, help)
+
+        # a different parser has its own help
+        app, help = self.run_help(("-f", "--foo"), ("-b", "--bar"))
+        self.assertTrue("--bar" in help)
+
+    def test_suppressed(self):
+        def makeapp():
+            app = self.makeapp(("-f", "--foo"))
+            app.add_param("--hidden", default=None, help=argparse.SUPPRESS)
+            app.add_param("--unset", default=argparse.SUPPRESS)
+            return app
+        makeapp().run()
+
+        app = makeapp()
+        self.assertNotEqual(app._parser_snapshot, None)
+        app.run()
+        self.assertFalse(hasattr(app.params, "unset"))
+        self.assertFalse("--hidden" in app.argparser.format_help())
+        self.assertFalse("--hidden" in app.argparser.format_usage())
+
+    def test_parsed_parser(self):
+        app = self.makeapp(("-f", "--foo"))
+        app.argparser.parse_cache = ParseCache(10)
+        app.run()
+        app.argparser.parse_args(["-f", "baz"])
+
+        snapshot = ParserCache(self.path + ".parsed", "key")
+        self.assertTrue(snapshot.save(app.argparser, [], []))
+        self.assertTrue(snapshot.load())
+        parser = snapshot.parser
+        self.assertEqual(len(parser._parse_plan), 0)
+        self.assertEqual(parser.parse_args(["-f", "qux"]).foo, "qux")
+
+class TestParams(tests.BaseTest):
+
+    def test_update_params(self):
+        app = FakeCommandLineApp(argv=["test", "-f", "bar"],
+            exit_after_main=False)
+        app.add_param("-f", "--foo")
+        app.params.other = 1
+        app.run()
+        params = app.params
+        self.assertEqual((params.foo, params.other), ("bar", 1))
+        self.assertTrue("foo" in type(params).__slots__)
+
+        app.argv = ["test"]
+        app.run()
+        self.assertTrue(app.params is params)
+        self.assertEqual((params.foo, params.other), (None, 1))
+
+    def test_add_params(self):
+        app = FakeCommandLineApp(argv=["test", "--opt-1", "2", "x"],
+            exit_after_main=False)
+        specs = [(("--opt-%d" % i,), {"type": int, "default": 0})
+            for i in range(3)]
+        specs.append((("rest",), {"nargs": "*"}))
+        actions = app.add_params(specs)
+        self.assertEqual([a.dest for a in actions],
+            ["opt_0", "opt_1", "opt_2", "rest"])
+        self.assertTrue(app.actions["opt_2"] is actions[2])
+        app.run()
+        self.assertEqual((app.params.opt_1, app.params.rest), (2, ["x"]))
+
+    def test_add_params_conflict(self):
+        app = FakeCommandLineApp(argv=["test"], exit_after_main=False)
+        app.add_param("-f", "--foo")
+        for specs in ([(("--bar",), {}), (("--foo",), {})],
+                [(("--bar",), {}), (("-b", "--bar"), {})]):
+            self.assertRaises(Exception, app.add_params, specs)
+            self.assertEqual(sorted(app.actions), ["foo"])
+            self.assertFalse("--bar" in app.argparser._option_string_actions)
+
+class TestParseCache(tests.BaseTest):
+
+    def setUp(self):
+        from cli.app import ArgumentParser
+        self.parser = ArgumentParser(prog="test", parse_cache=2,
+            stdout=StringIO(), stderr=StringIO())
+        self.parser.add_argument("-f", "--foo")
+        self.parser.add_argument("--item", action="append")
+        self.cache = self.parser.parse_cache
+
+    def test_hits(self):
+        ns = self.parser.parse_args(["--item", "a", "-f", "x"])
+        again = self.parser.parse_args(["--item", "a", "-f", "x"])
+        self.assertEqual(again, ns)
+        self.assertFalse(again is ns)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        # results don't share mutable values
+        again.item.append("b")
+        self.assertEqual(self.parser.parse_args(["--item", "a", "-f", "x"]).item,
+            ["a"])
+        self.assertEqual(self.parser.parse_known_args(["-f", "y", "z"]),
+            self.parser.parse_known_args(["-f", "y", "z"]))
+        self.assertEqual(self.cache.hits, 3)
+
+    def test_invalidated(self):
+        self.parser.parse_args(["-f", "x"])
+        self.parser.add_argument("--bar", default="b")
+        self.assertEqual(self.parser.parse_args(["-f", "x"]).bar, "b")
+        self.assertEqual((self.cache.hits, len(self.cache)), (0, 1))
+
+    def test_side_effects_bypass(self):
+        from cli._ext import argparse
+        class Touch(argparse.Action):
+            def __call__(self, parser, namespace, values, option_string=None):
+                setattr(namespace, self.dest, values)
+        self.parser.add_argument("--touch", action=Touch)
+        self.parser.add_argument("--input", type=argparse.FileType())
+        for i in range(2):
+            self.parser.parse_args(["--touch", "t"])
+            self.parser.parse_args(["--input", "-"])
+            self.parser.parse_args(["-f", "x"])
+        self.assertEqual((self.cache.hits, self.cache.misses,
+            self.cache.bypassed), (1, 5, 4))
+
+    def test_argument_files_bypass(self):
+        from cli.app import ArgumentParser
+        parser = ArgumentParser(prog="test", parse_cache=2,
+            fromfile_prefix_chars="@", stdout=StringIO(), stderr=StringIO())
+        parser.add_argument("-f", "--foo")
+        tmpdir = mkdtemp(prefix="parse-cache-")
+        try:
+            path = os.path.join(tmpdir, "args")
+            for value in ("x", "y"):
+                f = open(path, "w")
+                f.write("-f\n%s\n" % value)
+                f.close()
+                self.assertEqual(parser.parse_args(["@" + path]).foo, value)
+        finally:
+            rmtree(tmpdir)
+        self.assertEqual((parser.parse_cache.hits, len(parser.parse_cache),
+            parser.parse_cache.bypassed), (0, 0, 2))
+
+    def test_iterators_bypass(self):
+        self.parser.add_argument("--chars", type=iter)
+        for i in range(2):
+            ns = self.parser.parse_args(["--chars", "abc"])
+            self.assertEqual(list(ns.chars), ["a", "b", "c"])
+        self.assertEqual((self.cache.hits, self.cache.bypassed), (0, 2))
+
+def greet(app):
+    if app.params.name == "boom":
+        raise ValueError("boom")
+    app.stdout.write("hello %s\n" % app.params.name)
+    return app.params.status
+
+class TestRunMany(tests.BaseTest):
+
+    def setUp(self):
+        self.app = CommandLineApp(greet, argv=["greet"],
+            stdout=StringIO(), stderr=StringIO())
+        self.app.add_param("name")
+        self.app.add_param("--status", type=int, default=0)
+        self.argvs = [["a"], ["b", "--status", "3"], [], ["boom"], ["c"]]
+
+    def check(self, results):
+        self.assertEqual([(r.args, r.status, r.stdout) for r in results], [
+            (["a"], 0, "hello a\n"),
+            (["b", "--status", "3"], 3, "hello b\n"),
+            ([], 2, ""),
+            (["boom"], 1, ""),
+            (["c"], 0, "hello c\n")])
+        self.assertTrue("too few arguments" in results[2].stderr)
+        self.assertTrue("ValueError: boom" in results[3].stderr)
+
+    def test_run_many(self):
+        self.check(list(self.app.run_many(self.argvs)))
+        self.assertEqual(self.app.argv, ["greet"])
+        self.assertEqual(self.app.stdout.getvalue(), "")
+
+    def test_processes(self):
+        self.check(list(self.app.run_many(self.argvs, processes=2,
+            chunksize=2)))
+
+    def test_lazy(self):
+        taken = []
+        def argvs():
+            for i in range(1000):
+                taken.append(i)
+                yield [str(i)]
+        results = self.app.run_many(argvs(), processes=2, chunksize=1)
+        self.assertEqual([results.next().stdout for i in range(3)],
+            ["hello 0\n", "hello 1\n", "hello 2\n"])
+        # at most two chunks per worker in flight
+        self.assertTrue(len(taken) <= 3 + 4, len(taken))
+        results.close()
+
+    def test_no_capture(self):
+        results = list(self.app.run_many([["a"], ["b"]], capture=False))
+        self.assertEqual([(r.status, r.stdout) for r in results],
+            [(0, None), (0, None)])
+        self.assertEqual(self.app.stdout.getvalue(), "hello a\nhello b\n")
+
+greeter = CommandLineApp(greet, argv=["greet"])
+greeter.add_param("name")
+greeter.add_param("--status", type=int, default=0)
+
+class TestMap(tests.BaseTest):
+
+    def make_app(self, main, **kwargs):
+        app = CommandLineApp(main, argv=["mapper"], jobs=1,
+            exit_after_main=False, stdout=StringIO(), stderr=StringIO(),
+            **kwargs)
+        return app
+
+    def test_jobs_param(self):
+        app = self.make_app(lambda app: app.params.jobs)
+        self.assertEqual(app.run(["mapper"]), 1)
+        self.assertEqual(app.run(["mapper", "-j", "4"]), 4)
+
+    def square(self, app):
+        def square(x):
+            app.stdout.write("%d " % x)
+            return x * x
+        return square
+
+    def test_ordered(self):
+        for threads in (False, True):
+            def main(app):
+                results = list(app.map(self.square(app), range(50),
+                    threads=threads, chunksize=3))
+                self.assertEqual(results, [x * x for x in range(50)])
+            app = self.make_app(main)
+            self.assertEqual(app.run(["mapper", "-j", "3"]), 0)
+            self.assertEqual(app.stdout.getvalue(),
+                "".join(["%d " % x for x in range(50)]))
+
+    def test_unordered(self):
+        def main(app):
+            results = app.map(self.square(app), iter(range(50)),
+                ordered=False, threads=True)
+            self.assertEqual(sorted(results), [x * x for x in range(50)])
+        self.assertEqual(self.make_app(main).run(["mapper", "-j", "4"]), 0)
+
+    def test_unordered_ready_first(self):
+        def nap(x):
+            time.sleep(x)
+            return x
+        def main(app):
+            results = list(app.map(nap, [0.3] + [0] * 5, ordered=False,
+                threads=True))
+            self.assertEqual(results, [0] * 5 + [0.3])
+        self.assertEqual(self.make_app(main).run(["mapper", "-j", "2"]), 0)
+
+    def test_unpicklable_unordered(self):
+        # a result that can't be sent back fails the chunk in the pool
+        def main(app):
+            list(app.map(lambda x: lambda: x, range(3), ordered=False))
+        app = self.make_app(main, reraise=())
+        self.assertEqual(app.run(["mapper", "-j", "2"]), 1)
+
+    def test_concurrent(self):
+        # each map() keeps its own func, even in threads of one process
+        apps = [self.make_app(lambda app: None) for i in range(2)]
+        for app in apps:
+            app.jobs = 3
+        doubled = apps[0].map(lambda x: 2 * x, range(30), threads=True)
+        negated = apps[1].map(lambda x: -x, range(30), threads=True)
+        self.assertEqual(zip(doubled, negated), [(2 * x, -x) for x in range(30)])
+        self.assertEqual(list(negated), [])
+
+    def test_failure(self):
+        def fail(x):
+            if x == 7:
+                raise ValueError(x)
+            return x
+        seen = []
+        def main(app):
+            for result in app.map(fail, range(100), chunksize=2):
+                seen.append(result)
+        app = self.make_app(main, reraise=())
+        self.assertEqual(app.run(["mapper", "-j", "2"]), 1)
+        self.assertEqual(seen, range(7))
+        self.assertTrue(isinstance(app.stdout, StringIO))
+        app = self.make_app(main)
+        self.assertRaises(ValueError, app.run, ["mapper", "-j", "2"])
+
+class TestTimings(tests.BaseTest):
+
+    def make_app(self, main, **kwargs):
+        return CommandLineApp(main, name="timed", exit_after_main=False,
+            stdout=StringIO(), stderr=StringIO(), timings=True, **kwargs)
+
+    def test_phases(self):
+        app = self.make_app(lambda app: None)
+        app.run(["timed"])
+        names = [(name, depth) for name, depth, seconds in app.timings.entries]
+        self.assertEqual(names, [
+            ("import cli.app", 0), ("construct", 0),
+            ("Application.setup", 1), ("CommandLineMixin.setup", 1),
+            ("CommandLineMixin.build_argparser", 2),
+            ("CommandLineMixin.pre_run", 0),
+            ("parse arguments", 1), ("main", 0), ("Application.post_run", 0)])
+        for name, depth, seconds in app.timings.entries:
+            self.assertTrue(seconds >= 0)
+
+    def test_runs_replace_phases(self):
+        app = self.make_app(lambda app: None)
+        app.run(["timed"])
+        count = len(app.timings.entries)
+        app.run(["timed"])
+        self.assertEqual(len(app.timings.entries), count)
+
+    def test_report(self):
+        app = self.make_app(lambda app: None)
+        app.run(["timed"])
+        self.assertEqual(app.stderr.getvalue(), "")
+        app.run(["timed", "--timings"])
+        self.assertTrue(" ms    parse arguments\n" in app.stderr.getvalue())
+
+    def test_json(self):
+        import json
+        tmpdir = mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "timings.json")
+            app = self.make_app(lambda app: 3)
+            self.assertEqual(app.run(["timed", "--timings-json", path]), 3)
+            phases = json.load(open(path))["phases"]
+            self.assertEqual(phases[-2]["name"], "main")
+            self.assertEqual(phases[-2]["depth"], 0)
+        finally:
+            rmtree(tmpdir)
+
+    def test_error_in_main(self):
+        def main(app):
+            raise ValueError()
+        app = self.make_app(main)
+        self.assertRaises(ValueError, app.run, ["timed", "--timings"])
+        self.assertTrue(" ms  main\n" in app.stderr.getvalue())
@@ -0,0 +1,729 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+import sys
+
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from cli._ext import argparse
+from cli.app import ArgumentParser
+from cli.util import StringIO
+
+from cli import tests
+
+class TestParsePlan(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=StringIO())
+        self.parser.add_argument("-f", "--foo")
+        self.parser.add_argument("first")
+        self.parser.add_argument("rest", nargs="*")
+
+    def test_plan_is_reused(self):
+        ns = self.parser.parse_args(["-f", "x", "a", "b", "c"])
+        self.assertEqual(ns.first, "a")
+        self.assertEqual(ns.rest, ["b", "c"])
+        self.assertEqual(ns.foo, "x")
+        plan = dict(self.parser._parse_plan)
+        self.assertTrue(plan)
+
+        self.parser.parse_args(["a", "b"])
+        for key, regex in plan.items():
+            self.assertTrue(self.parser._parse_plan[key] is regex)
+
+    def test_plan_invalidated(self):
+        self.parser.parse_args(["a"])
+        self.parser.add_argument("--bar", nargs=2)
+        self.assertEqual(self.parser._parse_plan, {})
+        ns = self.parser.parse_args(["a", "--bar", "1", "2"])
+        self.assertEqual(ns.bar, ["1", "2"])
+
+    def test_plan_shared_with_groups(self):
+        group = self.parser.add_argument_group("group")
+        self.parser.parse_args(["a"])
+        group.add_argument("--baz", nargs="+")
+        self.assertEqual(self.parser._parse_plan, {})
+        ns = self.parser.parse_args(["a", "--baz", "1", "2"])
+        self.assertEqual(ns.baz, ["1", "2"])
+
+class TestOptionIndex(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=StringIO(), conflict_handler="resolve")
+        self.parser.add_argument("--foobar")
+        self.parser.add_argument("--foonly")
+        self.parser.add_argument("-x", action="store_true")
+        self.parser.add_argument("-y")
+
+    def test_index_sorted(self):
+        index = self.parser._option_string_index
+        self.assertEqual(index, sorted(self.parser._option_string_actions))
+
+    def test_abbreviations(self):
+        ns = self.parser.parse_args(["--foob", "1", "--foon=2", "-yz"])
+        self.assertEqual((ns.foobar, ns.foonly, ns.y), ("1", "2", "z"))
+
+        tuples = self.parser._get_option_tuples("--foo")
+        self.assertEqual(sorted([t[1] for t in tuples]),
+            ["--foobar", "--foonly"])
+
+    def test_ambiguous(self):
+        self.assertRaises(SystemExit, self.parser.parse_args, ["--foo", "1"])
+
+    def test_conflict_resolve(self):
+        self.parser.add_argument("--foobar", dest="other")
+        self.parser.add_argument("-x", "--extra", action="store_true")
+        index = self.parser._option_string_index
+        self.assertEqual(index, sorted(self.parser._option_string_actions))
+        self.assertEqual(index.count("--foobar"), 1)
+        ns = self.parser.parse_args(["--foob", "1", "--ext"])
+        self.assertEqual((ns.other, ns.extra), ("1", True))
+
+class TestArgFiles(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix="argfiles-")
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def argfile(self, name, *lines):
+        path = os.path.join(self.tmpdir, name)
+        f = open(path, "w")
+        f.write("".join([line + "\n" for line in lines]))
+        f.close()
+        return "@" + path
+
+    def parser(self, **kwargs):
+        parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=StringIO(), fromfile_prefix_chars="@", **kwargs)
+        parser.add_argument("-f", "--foo")
+        parser.add_argument("paths", nargs="*")
+        return parser
+
+    def test_expand(self):
+        inner = self.argfile("inner", "c", "")
+        outer = self.argfile("outer", "-f", "bar", "a\r", inner)
+        empty = self.argfile("empty")
+        ns = self.parser().parse_args([outer, empty, "b"])
+        self.assertEqual(ns.foo, "bar")
+        self.assertEqual(ns.paths, ["a", "c", "", "b"])
+
+    def test_line_endings(self):
+        from StringIO import StringIO as ByteStream
+        content = "-f\rbar\r\na\n\rb\r\r\nc\r"
+        path = os.path.join(self.tmpdir, "endings")
+        f = open(path, "wb")
+        f.write(content)
+        f.close()
+        ns = self.parser().parse_args(["@" + path])
+        self.assertEqual((ns.foo, ns.paths), ("bar", ["a", "", "b", "", "c"]))
+        # mapped files and other streams split lines like splitlines()
+        for stream in (open(path, "rb"), ByteStream(content)):
+            try:
+                self.assertEqual(list(argparse._iter_file_lines(stream)),
+                    content.splitlines())
+            finally:
+                stream.close()
+
+    def test_cycle(self):
+        path = os.path.join(self.tmpdir, "loop")
+        self.argfile("loop", "a", "@" + path)
+        self.assertRaises(SystemExit, self.parser().parse_args, ["@" + path])
+
+    def test_limits(self):
+        inner = self.argfile("inner", "a", "b")
+        outer = self.argfile("outer", inner)
+        self.assertRaises(SystemExit,
+            self.parser(fromfile_max_depth=1).parse_args, [outer])
+        self.assertEqual(
+            self.parser(fromfile_max_depth=2).parse_args([outer]).paths,
+            ["a", "b"])
+        self.assertRaises(SystemExit,
+            self.parser(fromfile_max_args=1).parse_args, [outer])
+
+    def test_streaming(self):
+        paths = self.argfile("paths", *[str(i) for i in range(100)])
+        foo = self.argfile("foo", "bar")
+        parser = self.parser(fromfile_streaming=True)
+        parser.add_argument("--count", nargs="+", type=int)
+        ns = parser.parse_args(["x", paths, "-f", foo, "--count", paths])
+        self.assertEqual(ns.foo, "bar")
+        self.assertFalse(isinstance(ns.paths, list))
+        self.assertEqual(list(ns.paths), ["x"] + [str(i) for i in range(100)])
+        self.assertEqual(sum(ns.count), sum(range(100)))
+
+    def test_streaming_count(self):
+        parser = self.parser(fromfile_streaming=True)
+        self.assertRaises(SystemExit, parser.parse_args,
+            ["-f", self.argfile("foo", "a", "b")])
+
+class TestParseMany(tests.BaseTest):
+
+    def setUp(self):
+        self.stderr = StringIO()
+        self.parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=self.stderr)
+        self.parser.add_argument("-n", type=int, default=0)
+        self.parser.add_argument("rest", nargs="*")
+        self.argvs = [["-n", "1", "a"], ["-n", "x"], [], ["b", "c"]]
+
+    def check(self, results):
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0], argparse.Namespace(n=1, rest=["a"]))
+        self.assertTrue(isinstance(results[1], argparse.ArgumentError))
+        self.assertTrue("invalid int value" in str(results[1]))
+        self.assertEqual(results[2], argparse.Namespace(n=0, rest=[]))
+        self.assertEqual(results[3].rest, ["b", "c"])
+        self.assertEqual(self.stderr.getvalue(), "")
+
+    def test_parse_many(self):
+        results = self.parser.parse_many(iter(self.argvs))
+        self.assertFalse(isinstance(results, list))
+        self.check(list(results))
+
+        # errors are only swallowed inside parse_many()
+        self.assertRaises(SystemExit, self.parser.parse_args, ["-n", "x"])
+
+    def test_exit(self):
+        # argparse prints help to sys.stdout
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            result, = self.parser.parse_many([["-h"]])
+        finally:
+            sys.stdout = stdout
+        self.assertTrue(isinstance(result, SystemExit))
+
+    def test_processes(self):
+        self.check(list(self.parser.parse_many(self.argvs, processes=2,
+            chunksize=1)))
+
+    def test_subcommand_errors(self):
+        parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=self.stderr)
+        subparsers = parser.add_subparsers(dest="command")
+        subparsers.add_parser("a").add_argument("--n", type=int)
+
+        def configure_b(parser):
+            parser.add_argument("--m", type=int)
+        subparsers.add_parser("b", factory=configure_b)
+        # subparsers report errors to sys.stderr
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            results = list(parser.parse_many([["a", "--n", "x"],
+                ["b", "--m", "y"], ["a", "--n", "1"]]))
+            self.assertEqual(sys.stderr.getvalue(), "")
+        finally:
+            sys.stderr = stderr
+        for result in results[:2]:
+            self.assertTrue(isinstance(result, argparse.ArgumentError))
+            self.assertTrue("invalid int value" in str(result))
+        self.assertEqual(results[2].n, 1)
+        self.assertEqual(self.stderr.getvalue(), "")
+        self.assertRaises(SystemExit, parser.parse_args, ["a", "--n", "x"])
+
+class TestSlotsNamespace(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = ArgumentParser(prog="test", stdout=StringIO(),
+            stderr=StringIO())
+        self.parser.add_argument("-f", "--foo", default="x")
+        self.parser.add_argument("--odd", dest="odd-name")
+        self.parser.add_argument("rest", nargs="*")
+
+    def test_slots(self):
+        ns = self.parser.parse_args(["-f", "bar", "--odd", "1", "a"])
+        self.assertTrue(isinstance(ns, argparse.Namespace))
+        self.assertEqual(type(ns).__slots__, ("foo", "help", "rest"))
+        self.assertEqual(argparse._instance_dict(ns), {"odd-name": "1"})
+        self.assertEqual(ns, argparse.Namespace(
+            foo="bar", rest=["a"], **{"odd-name": "1"}))
+        self.assertEqual(vars(ns), {"foo": "bar", "rest": ["a"], "odd-name": "1"})
+        self.assertTrue("foo" in ns)
+        self.assertFalse("bar" in ns)
+        self.assertEqual(repr(ns),
+            "Namespace(foo='bar', odd-name='1', rest=['a'])")
+
+    def test_vars_writes(self):
+        ns = self.parser.parse_args(["a"])
+        vars(ns)["foo"] = "y"
+        vars(ns)["new"] = 1
+        self.assertEqual(vars(ns).setdefault("rest"), ["a"])
+        self.assertEqual(vars(ns).setdefault("other", 2), 2)
+        vars(ns).update(extra=3)
+        self.assertEqual((ns.foo, ns.new, ns.other, ns.extra),
+            ("y", 1, 2, 3))
+        self.assertEqual(vars(ns).pop("rest"), ["a"])
+        del vars(ns)["new"]
+        self.assertEqual(ns, argparse.Namespace(foo="y", other=2, extra=3,
+            **{"odd-name": None}))
+        self.assertRaises(KeyError, vars(ns).pop, "rest")
+
+    def test_method_names(self):
+        # destinations named like namespace methods don't replace them
+        self.parser.add_argument("--update", dest="_update")
+        self.parser.add_argument("--kwargs", dest="_get_kwargs")
+        ns = self.parser.parse_args(["--update", "u", "--kwargs", "k"])
+        self.assertEqual(type(ns).__slots__,
+            ("_update", "foo", "help", "rest"))
+        self.assertEqual((ns._update, ns._get_kwargs), ("u", "k"))
+        params = self.parser.parse_args([])
+        from cli.app import CommandLineApp
+        params = CommandLineApp(argv=["test"]).update_params(params, ns)
+        self.assertEqual(params._update, "u")
+
+    def test_class_tracks_parser(self):
+        cls = type(self.parser.parse_args([]))
+        self.assertTrue(type(self.parser.parse_args([])) is cls)
+        self.parser.set_defaults(extra=1)
+        ns = self.parser.parse_args([])
+        self.assertEqual(type(ns).__slots__, ("extra", "foo", "help", "rest"))
+        self.assertEqual(ns.extra, 1)
+
+    def test_pickle(self):
+        import pickle
+        ns = self.parser.parse_args(["--odd", "1"])
+        copy = pickle.loads(pickle.dumps(ns, 2))
+        self.assertTrue(type(copy) is type(ns))
+        self.assertEqual(copy, ns)
+
+class TestTypeCache(tests.BaseTest):
+
+    def setUp(self):
+        self.calls = []
+        def convert(string):
+            self.calls.append(string)
+            return int(string)
+        self.parser = ArgumentParser(prog="test")
+        self.parser.add_argument("-n", type=convert, type_cache=2)
+        self.parser.add_argument("rest", type=convert, nargs="*")
+
+    def test_hits(self):
+        action = self.parser._option_string_actions["-n"]
+        for i in range(3):
+            self.assertEqual(self.parser.parse_args(["-n", "1"]).n, 1)
+        self.assertEqual(self.calls, ["1"])
+        self.assertEqual((action.type_cache.hits, action.type_cache.misses),
+            (2, 1))
+        self.assertEqual(self.parser._actions[-1].type_cache, None)
+
+    def test_lru(self):
+        cache = self.parser._option_string_actions["-n"].type_cache
+        for value in ["1", "2", "1", "3", "1", "2"]:
+            self.parser.parse_args(["-n", value])
+        self.assertEqual(self.calls, ["1", "2", "3", "2"])
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 2, 4))
+
+    def test_errors_not_cached(self):
+        self.parser._raise_errors = True
+        for i in range(2):
+            self.assertRaises(argparse.ArgumentError,
+                self.parser.parse_args, ["-n", "x"])
+        self.assertEqual(self.calls, ["x", "x"])
+
+    def test_filetype_bypass(self):
+        action = self.parser.add_argument("-f", type=argparse.FileType(),
+            type_cache=10)
+        self.assertEqual(action.type_cache, None)
+
+class TestMutexConflicts(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = ArgumentParser(prog="test")
+        self.parser._raise_errors = True
+        self.group = self.parser.add_mutually_exclusive_group()
+        self.a = self.group.add_argument("-a", action="store_true")
+        self.b = self.group.add_argument("-b", action="store_true")
+        self.other = self.parser.add_mutually_exclusive_group()
+        self.other.add_argument("-c", action="store_true")
+        self.other.add_argument("-d", action="store_true")
+
+    def test_conflicts(self):
+        self.assertEqual(self.parser._mutex_conflicts[self.b], [self.group])
+        self.assertEqual(self.parser.parse_args(["-a", "-a"]).a, True)
+        try:
+            self.parser.parse_args(["-b", "-a"])
+        except argparse.ArgumentError, e:
+            self.assertEqual(str(e), "argument -a: not allowed with argument -b")
+        else:
+            self.fail("no conflict")
+        self.assertRaises(argparse.ArgumentError,
+            self.parser.parse_args, ["-a", "-c", "-d"])
+        self.assertEqual(vars(self.parser.parse_args(["-b", "-c"])),
+            {"a": False, "b": True, "c": True, "d": False})
+
+    def test_remove(self):
+        self.group._remove_action(self.b)
+        self.assertFalse(self.b in self.parser._mutex_conflicts)
+        self.assertEqual(self.parser._mutex_conflicts[self.a], [self.group])
+        self.parser.add_argument("-b", dest="bee")
+        self.assertEqual(self.parser.parse_args(["-a", "-b", "x"]).bee, "x")
+
+class TestLongPositionals(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = ArgumentParser(prog="test")
+        self.parser._raise_errors = True
+        self.parser.add_argument("-v", action="count")
+        self.parser.add_argument("-o")
+        self.parser.add_argument("files", nargs="*")
+
+    def test_greedy(self):
+        argv = ["f%d" % i for i in range(1000)]
+        ns = self.parser.parse_args(argv)
+        self.assertEqual(ns.files, argv)
+        self.assertFalse(ns.files is argv)
+        ns = self.parser.parse_args(["-v"] * 100 + ["-o", "x"] + argv)
+        self.assertEqual((ns.v, ns.o, ns.files), (100, "x", argv))
+
+    def test_double_dash(self):
+        ns = self.parser.parse_args(["-v", "a", "--", "-o", "b"])
+        self.assertEqual((ns.v, ns.o, ns.files), (1, None, ["a", "-o", "b"]))
+        ns = self.parser.parse_args(["--", "-v"])
+        self.assertEqual((ns.v, ns.files), (None, ["-v"]))
+
+    def test_double_dash_other_prefix(self):
+        # '--' ends the options even if '-' isn't a prefix char
+        parser = ArgumentParser(prog="test", prefix_chars="+")
+        parser._raise_errors = True
+        parser.add_argument("+f")
+        parser.add_argument("rest", nargs="*")
+        ns = parser.parse_args(["x", "--", "+f", "y"])
+        self.assertEqual((ns.f, ns.rest), (None, ["x", "+f", "y"]))
+        state = parser.parse_partial(["x", "--", "+f"])
+        self.assertEqual((state.action.dest, state.option_string),
+            ("rest", None))
+
+        parser = ArgumentParser(prog="test", prefix_chars="+")
+        parser.add_argument("+f")
+        parser.add_argument("++g", action="store_true")
+        self.assertEqual(parser.parse_known_args(["+f", "a", "--", "++g"]),
+            (argparse.Namespace(f="a", g=False), ["--", "++g"]))
+
+    def test_one_or_more(self):
+        parser = ArgumentParser(prog="test")
+        parser._raise_errors = True
+        parser.add_argument("-v", action="store_true")
+        parser.add_argument("first")
+        parser.add_argument("rest", nargs="+")
+        ns = parser.parse_args(["a", "-v", "b", "c"])
+        self.assertEqual((ns.first, ns.rest, ns.v), ("a", ["b", "c"], True))
+        self.assertRaises(argparse.ArgumentError,
+            parser.parse_args, ["a", "-v"])
+        self.assertRaises(argparse.ArgumentError,
+            parser.parse_args, ["a", "--"])
+
+class TestAddArguments(tests.BaseTest):
+
+    def test_groups(self):
+        parser = ArgumentParser(prog="test")
+        group = parser.add_mutually_exclusive_group()
+        actions = group.add_arguments([(("-a",), {"action": "store_true"}),
+            (("-b",), {"action": "store_true"})])
+        self.assertEqual(group._group_actions, actions)
+        self.assertEqual(parser._optionals._group_actions[1:], actions)
+        self.assertTrue(actions[0].container is parser._optionals)
+        self.assertEqual(parser._option_string_index, ["--help", "-a", "-b", "-h"])
+        parser._raise_errors = True
+        self.assertRaises(argparse.ArgumentError,
+            parser.parse_args, ["-a", "-b"])
+
+    def test_resolve(self):
+        parser = ArgumentParser(prog="test", conflict_handler="resolve")
+        old = parser.add_argument("-f", "--foo")
+        actions = parser.add_arguments([(("--foo",), {"dest": "x"}),
+            (("pos",), {"nargs": "?"})])
+        self.assertEqual(old.option_strings, ["-f"])
+        self.assertEqual(parser._optionals._group_actions[-1], actions[0])
+        self.assertEqual(parser._positionals._group_actions, actions[1:])
+        ns = parser.parse_args(["--foo", "1", "-f", "2", "p"])
+        self.assertEqual((ns.x, ns.foo, ns.pos), ("1", "2", "p"))
+
+class TestHelpCache(tests.BaseTest):
+
+    def setUp(self):
+        self.columns = os.environ.get("COLUMNS")
+        os.environ["COLUMNS"] = "40"
+        self.parser = ArgumentParser(prog="test")
+        group = self.parser.add_mutually_exclusive_group()
+        group.add_argument("--alpha", action="store_true")
+        group.add_argument("--beta", metavar="B", nargs="?")
+        self.parser.add_argument("files", nargs="*")
+
+    def tearDown(self):
+        if self.columns is None:
+            del os.environ["COLUMNS"]
+        else:
+            os.environ["COLUMNS"] = self.columns
+
+    def test_cached(self):
+        help = self.parser.format_help()
+        self.assertTrue(self.parser.format_help() is help)
+        self.assertTrue(self.parser.format_usage() is self.parser.format_usage())
+
+        self.parser.description = "Describe."
+        self.assertTrue("Describe." in self.parser.format_help())
+        os.environ["COLUMNS"] = "100"
+        self.assertNotEqual(self.parser.format_help(), help)
+        self.parser.add_argument("--gamma")
+        self.assertTrue("--gamma" in self.parser.format_help())
+        self.parser.add_subparsers().add_parser("sub")
+        self.assertTrue("{sub}" in self.parser.format_usage())
+
+    def test_wrapping(self):
+        self.parser.add_argument("--gamma", required=True)
+        self.assertEqual(self.parser.format_usage(),
+            "usage: test [-h]\n"
+            "            [--alpha | --beta [B]]\n"
+            "            --gamma GAMMA\n"
+            "            [files [files ...]]\n")
+
+    def test_wrapping_long_parts(self):
+        # the same lines as before usage parts were built per action
+        os.environ["COLUMNS"] = "82"
+        parser = ArgumentParser(prog="some-rather-long-tool-name")
+        parser.add_argument("-v", action="store_true")
+        parser.add_argument("input_files_to_process", nargs="+")
+        self.assertEqual(parser.format_usage(),
+            "usage: some-rather-long-tool-name [-h] [-v]\n"
+            "                                  input_files_to_process\n"
+            "                                  [input_files_to_process ...]\n")
+
+class TestLazySubparsers(tests.BaseTest):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix="subparsers-")
+        f = open(os.path.join(self.tmpdir, "lazy_subcommand.py"), "w")
+        f.write("def configure(parser):\n"
+            "    parser.add_argument('--depth', type=int)\n")
+        f.close()
+        sys.path.insert(0, self.tmpdir)
+        self.built = []
+        self.parser = ArgumentParser(prog="test")
+        self.subparsers = self.parser.add_subparsers(dest="command")
+        self.subparsers.add_parser("list", factory=self.configure_list,
+            help="list things")
+        self.subparsers.add_parser("walk", factory="lazy_subcommand:configure")
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        sys.modules.pop("lazy_subcommand", None)
+        rmtree(self.tmpdir)
+
+    def configure_list(self, parser):
+        self.built.append(parser.prog)
+        parser.add_argument("-l", action="store_true")
+
+    def test_factory_called_on_use(self):
+        self.assertTrue("{list,walk}" in self.parser.format_help())
+        self.assertEqual(self.built, [])
+        ns = self.parser.parse_args(["list", "-l"])
+        self.assertEqual((ns.command, ns.l), ("list", True))
+        self.parser.parse_args(["list"])
+        self.assertEqual(self.built, ["test list"])
+        self.assertFalse("lazy_subcommand" in sys.modules)
+
+    def test_module_factory(self):
+        ns = self.parser.parse_args(["walk", "--depth", "3"])
+        self.assertEqual((ns.command, ns.depth), ("walk", 3))
+        self.assertTrue("lazy_subcommand" in sys.modules)
+        self.assertEqual(self.built, [])
+
+    def test_factory_errors(self):
+        def broken(parser):
+            {}["missing"]
+        self.subparsers.add_parser("broken", factory=broken)
+        self.assertRaises(KeyError, self.parser.parse_args, ["broken"])
+        self.parser._raise_errors = True
+        self.assertRaises(argparse.ArgumentError, self.parser.parse_args,
+            ["unknown"])
+
+class GenericParser(ArgumentParser):
+
+    def _get_optionals_only(self):
+        return False, None
+
+class TestOptionalsOnly(tests.BaseTest):
+    """Compare the optionals-only fast path with the generic parsing."""
+
+    tokens = ["-a", "-b", "-ab", "-ba", "-c", "-cc", "-n", "-n3", "-nx",
+        "-o", "-ofoo", "--opt", "--opt=v", "--op", "--o", "--maybe",
+        "--many", "--some", "--two", "--app", "--choice", "--num=-1",
+        "--x", "--y", "--unknown", "-z", "-1", "-2.5", "--", "-", "",
+        "val", "1", "2", "red", "green", "a b"]
+
+    def build(self, parser_class, remainder=False, required=False):
+        parser = parser_class(prog="test")
+        parser._raise_errors = True
+        parser.add_argument("-a", action="store_true")
+        parser.add_argument("-b", action="store_false")
+        parser.add_argument("-c", action="count")
+        parser.add_argument("-n", type=int)
+        parser.add_argument("-o", "--opt", default="d")
+        parser.add_argument("--maybe", nargs="?", const="C")
+        parser.add_argument("--many", nargs="*")
+        parser.add_argument("--some", nargs="+", type=int)
+        parser.add_argument("--two", nargs=2)
+        parser.add_argument("--app", action="append")
+        parser.add_argument("--choice", choices=["red", "green"])
+        parser.add_argument("--num", type=float)
+        group = parser.add_mutually_exclusive_group(required=required)
+        group.add_argument("--x", action="store_const", const=1)
+        group.add_argument("--y", action="store_const", const=2)
+        if remainder:
+            parser.add_argument("rest", nargs=argparse.REMAINDER)
+        return parser
+
+    def outcome(self, parser, argv):
+        try:
+            namespace, extras = parser.parse_known_args(argv)
+        except argparse.ArgumentError, e:
+            return "error: %s" % e
+        return sorted(vars(namespace).items()), extras
+
+    def compare(self, **kwargs):
+        import random
+        fast = self.build(ArgumentParser, **kwargs)
+        generic = self.build(GenericParser, **kwargs)
+        self.assertEqual(fast._get_optionals_only()[0], True)
+        rand = random.Random(1234)
+        for i in range(2000):
+            argv = [rand.choice(self.tokens)
+                for j in range(rand.randint(0, 8))]
+            self.assertEqual(self.outcome(fast, argv),
+                self.outcome(generic, argv), argv)
+
+    def test_optionals(self):
+        self.compare()
+
+    def test_remainder(self):
+        self.compare(remainder=True)
+
+    def test_required_group(self):
+        self.compare(required=True)
+
+    def test_detection(self):
+        parser = ArgumentParser(prog="test")
+        self.assertEqual(parser._get_optionals_only(), (True, None))
+        parser.add_argument("pos")
+        self.assertEqual(parser._get_optionals_only(), (False, None))
+        parser = ArgumentParser(prog="test", fromfile_prefix_chars="@")
+        self.assertEqual(parser._get_optionals_only(), (False, None))
+
+class TestCompactActions(tests.BaseTest):
+
+    def test_slots(self):
+        import pickle
+        parser = ArgumentParser(prog="test")
+        action = parser.add_argument("-c", "--count", action="count")
+        self.assertEqual(repr(action), "_CountAction(option_strings=['-c', "
+            "'--count'], dest='count', nargs=0, const=None, default=None, "
+            "type=None, choices=None, help=None, metavar=None)")
+        self.assertEqual(action.__dict__, {})
+        self.assertTrue(action.container is parser._optionals)
+
+        action.completer = "files"
+        copy = pickle.loads(pickle.dumps(action, 2))
+        self.assertEqual((copy.option_strings, copy.completer),
+            (["-c", "--count"], "files"))
+
+    def test_interned(self):
+        actions = []
+        for i in range(2):
+            parser = ArgumentParser(prog="test")
+            name = "".join(["--generated", "-", "name"])
+            actions.append(parser.add_argument(name))
+        first, second = actions
+        self.assertTrue(first.option_strings[0] is second.option_strings[0])
+        self.assertTrue(first.dest is second.dest)
+
+    def test_help_params(self):
+        parser = ArgumentParser(prog="test")
+        parser.add_argument("-j", "--jobs", type=int, default=4,
+            help="workers (default: %(default)s)")
+        parser.add_argument("--mode", choices=["a", "b"],
+            help="one of %(choices)s, a %(type)s, for %(prog)s")
+        action = parser.add_argument("--extra", help="%(note)s")
+        action.note = "set later"
+        help = parser.format_help()
+        self.assertTrue("workers (default: 4)" in help)
+        self.assertTrue("one of a, b, a None, for test" in help)
+        self.assertTrue("set later" in help)
+
+class TestParsePartial(tests.BaseTest):
+
+    def setUp(self):
+        self.parser = parser = ArgumentParser(prog="test")
+        parser.add_argument("-v", action="store_true")
+        parser.add_argument("--pair", nargs=2)
+        parser.add_argument("--level", nargs="?", choices=["low", "high"])
+        subparsers = parser.add_subparsers(dest="command")
+        copy = subparsers.add_parser("copy")
+        copy.add_argument("src")
+        copy.add_argument("dst", nargs="+")
+        subparsers.add_parser("list")
+
+    def pending(self, *words):
+        state = self.parser.parse_partial(words)
+        self.assertEqual(state.error, None)
+        return state.action and state.action.dest, state.option_string
+
+    def test_pending(self):
+        self.assertEqual(self.pending(), ("command", None))
+        self.assertEqual(self.pending("-v"), ("command", None))
+        self.assertEqual(self.pending("--pair"), ("pair", "--pair"))
+        self.assertEqual(self.pending("--pa", "a"), ("pair", "--pair"))
+        self.assertEqual(self.pending("--pair", "a", "b"), ("command", None))
+        self.assertEqual(self.pending("--level"), ("level", "--level"))
+        self.assertEqual(self.pending("copy"), ("src", None))
+        self.assertEqual(self.pending("copy", "a"), ("dst", None))
+        self.assertEqual(self.pending("copy", "a", "b"), ("dst", None))
+        self.assertEqual(self.pending("list"), (None, None))
+
+    def test_state(self):
+        state = self.parser.parse_partial(["-v", "copy", "a", "b", "c"])
+        self.assertEqual(state.path, ["copy"])
+        self.assertTrue(state.parser is self.parser._subparsers._actions[-1]
+            ._get_parser("copy"))
+        consumed = dict([(action.dest, count)
+            for action, count in state.consumed.items()])
+        self.assertEqual(consumed, {"v": 0, "command": 1, "src": 1, "dst": 2})
+        self.assertEqual(state.positionals, [])
+
+        state = self.parser.parse_partial(["copy"])
+        self.assertEqual([action.dest for action in state.positionals],
+            ["src", "dst"])
+        state = self.parser.parse_partial(["list", "extra"])
+        self.assertEqual(state.extras, ["extra"])
+
+    def test_errors(self):
+        err = StringIO()
+        self.parser.stderr = err
+        self.parser.add_argument("--path")
+        for words, message in [
+                (["move"], "unknown parser 'move'"),
+                (["--pair", "a", "-v"], "expected 2 argument(s)"),
+                (["--pa"], "ambiguous option: --pa could match")]:
+            state = self.parser.parse_partial(words)
+            self.assertTrue(message in state.error, state.error)
+        self.assertEqual(err.getvalue(), "")
@@ -0,0 +1,46 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+from cli.app import RunResult
+from cli.batch import BatchSummary, batch, read_argvs
+from cli.util import StringIO
+
+from cli import tests
+
+class TestBatch(tests.BaseTest):
+
+    def test_read_argvs(self):
+        lines = ["a 'b c'\n", "\n", "# comment\n", "d # note\n"]
+        self.assertEqual(list(read_argvs(lines)), [["a", "b c"], ["d"]])
+
+    def test_summary(self):
+        summary = BatchSummary()
+        for status in (0, 2, 0):
+            summary.add(RunResult([], status, None, None, 0.5))
+        self.assertEqual((summary.count, summary.failed, summary.busy,
+            summary.statuses), (3, 1, 1.5, {0: 2, 2: 1}))
+        self.assertTrue(summary.format().startswith("3 runs, 1 failed in "))
+
+    def test_batch(self):
+        stdin = StringIO(u"a\nb --status 4\n")
+        stdout, stderr = StringIO(), StringIO()
+        batch.stdin, batch.stdout, batch.stderr = stdin, stdout, stderr
+        status = batch.run(["batch", "cli.tests.test_cli_app:greeter"],
+            exit_after=False)
+        self.assertEqual(status, 1)
+        self.assertEqual(stdout.getvalue(), "hello a\nhello b\n")
+        self.assertTrue("2 runs, 1 failed" in stderr.getvalue())
@@ -0,0 +1,50 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+from cli.app import ArgumentParser
+from cli.complete import CommandCompleter
+
+from cli import tests
+
+class TestCommandCompleter(tests.BaseTest):
+
+    def setUp(self):
+        parser = ArgumentParser(prog="test", add_help=False)
+        parser.add_argument("--mode", choices=["fast", "slow"])
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--quiet", action="store_true")
+        group.add_argument("--verbose", action="store_true")
+        parser.add_argument("target", choices=["build", "clean"])
+        self.completer = CommandCompleter({}, parser=parser)
+
+    def complete(self, line):
+        words = line.split()
+        if line.endswith(" "):
+            current = ""
+        else:
+            current = words[-1]
+        return self.completer.complete(words[0], current, None, words, None)
+
+    def test_complete(self):
+        self.assertEqual(self.complete("test "),
+            ["build", "clean", "--mode", "--quiet", "--verbose"])
+        self.assertEqual(self.complete("test --mode "), ["fast", "slow"])
+        self.assertEqual(self.complete("test --mode s"), ["slow"])
+        self.assertEqual(self.complete("test --quiet --"), ["--mode"])
+        self.assertEqual(self.complete("test b"), ["build"])
+        self.assertEqual(self.complete("test build "),
+            ["--mode", "--quiet", "--verbose"])
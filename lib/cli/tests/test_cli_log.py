@@ -19,6 +19,7 @@ logging.logMultiprocessing = 0
 
 from cli.ext import argparse
 from cli.log import CommandLineLogger, LoggingApp
+from cli.util import StringIO
 
 from cli import tests
 
@@ -74,6 +75,19 @@ class TestLoggingApp(tests.AppTest):
         _, app = self.runapp(self.app_cls, "test -vvv -qqq")
         self.assertEqual(app.log.level, logging.WARNING)
 
+    def test_run_many(self):
+        def main(app):
+            app.log.warning("careful with %s", app.params.name)
+        stderr = StringIO()
+        app = LoggingApp(main, argv=["test"], stdout=StringIO(),
+            stderr=stderr, stream=stderr)
+        app.add_param("name")
+        results = list(app.run_many([["a"], ["b"]]))
+        self.assertTrue(results[0].stderr.endswith("careful with a\n"))
+        self.assertTrue(results[1].stderr.endswith("careful with b\n"))
+        self.assertEqual(stderr.getvalue(), "")
+        self.assertTrue(app.stream is stderr)
+
     def test_no_stream_or_logfile(self):
         self.app.logfile = None
         self.app.stream = None
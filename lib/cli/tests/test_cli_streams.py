@@ -0,0 +1,162 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+import os
+
+from tempfile import TemporaryFile
+
+from cli.app import Application
+from cli.streams import BrokenPipe, BufferedOutput, EPIPE_STATUS, \
+    read_records
+from cli.util import StringIO
+
+from cli import tests
+
+class TestBufferedOutput(tests.BaseTest):
+
+    def read(self, f):
+        f.seek(0)
+        return f.read()
+
+    def test_stream(self):
+        stream = StringIO()
+        # room for two lines to begin with
+        output = BufferedOutput(stream, size=160)
+        output.write("abc")
+        output.write(u"d\xe9f")
+        self.assertEqual(stream.getvalue(), "")
+        # a write that fills the buffer is written out with it
+        output.write("x" * 1000)
+        self.assertEqual(stream.getvalue(), u"abcd\xe9f" + "x" * 1000)
+        # many short writes are written out every 160 characters
+        for i in range(53):
+            output.write("xyz")
+        self.assertEqual(len(stream.getvalue()), 1006)
+        output.write("m")
+        self.assertEqual(len(stream.getvalue()), 1006 + 53 * 3 + 1)
+        output.writelines(["ghi", "jkl"])
+        output.writelines(["n" * 160])
+        self.assertTrue(stream.getvalue().endswith(u"mghijkl" + "n" * 160))
+
+    def test_file(self):
+        f = TemporaryFile()
+        output = BufferedOutput(f)
+        output.write("abc\n")
+        output.write(u"d\xe9f\n")
+        output.writelines([u"\xe9", "g\n"])
+        self.assertEqual(self.read(f), "")
+        output.flush()
+        self.assertEqual(self.read(f), "abc\nd\xc3\xa9f\n\xc3\xa9g\n")
+
+    def test_binary(self):
+        f = TemporaryFile()
+        output = BufferedOutput(f, binary=True)
+        output.write("\xff\x00")
+        output.writelines(["a", "b"])
+        output.flush()
+        self.assertEqual(self.read(f), "\xff\x00ab")
+
+    def test_broken_pipe(self):
+        r, w = os.pipe()
+        os.close(r)
+        f = os.fdopen(w, "w")
+        try:
+            output = BufferedOutput(f)
+            output.write("abc\n")
+            self.assertRaises(BrokenPipe, output.flush)
+            self.assertTrue(output.broken)
+            self.assertRaises(BrokenPipe, output.write, "def\n")
+        finally:
+            f.close()
+
+class TestReadRecords(tests.BaseTest):
+
+    data = "a\nbb\n\nccc\ndddd"
+    records = ["a", "bb", "", "ccc", "dddd"]
+
+    def test_stream(self):
+        for size in (1, 2, 3, 100):
+            records = read_records(StringIO(unicode(self.data)), chunk_size=size)
+            self.assertEqual(list(records), self.records)
+        self.assertEqual(list(read_records(StringIO(u"a\n"))), ["a"])
+        self.assertEqual(list(read_records(StringIO(u""))), [])
+
+    def test_separator(self):
+        records = read_records(StringIO(u"a::b::::c:"), sep="::", chunk_size=3)
+        self.assertEqual(list(records), ["a", "b", "", "c:"])
+        self.assertRaises(ValueError, read_records, StringIO(), sep="")
+
+    def test_batch(self):
+        batches = read_records(StringIO(unicode(self.data)), chunk_size=4, batch=2)
+        self.assertEqual(list(batches), [["a", "bb"], ["", "ccc"], ["dddd"]])
+
+    def test_regular_file(self):
+        f = TemporaryFile()
+        f.write("skip\n" + self.data)
+        f.flush()
+        os.lseek(f.fileno(), 5, os.SEEK_SET)
+        self.assertEqual(list(read_records(f, chunk_size=3)), self.records)
+        self.assertEqual(os.lseek(f.fileno(), 0, os.SEEK_CUR),
+            5 + len(self.data))
+        self.assertEqual(list(read_records(f)), [])
+
+    def test_pipe(self):
+        r, w = os.pipe()
+        os.write(w, self.data)
+        os.close(w)
+        f = os.fdopen(r)
+        try:
+            self.assertEqual(list(read_records(f, batch=10)), [self.records])
+        finally:
+            f.close()
+
+class TestBufferedApplication(tests.BaseTest):
+
+    def test_flush_after_main(self):
+        def main(app):
+            app.stdout.write("abc\n")
+            self.assertEqual(app.stdout.stream.getvalue(), "")
+        app = Application(main, exit_after_main=False, stdout=StringIO(),
+            buffered=True)
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(app.stdout.stream.getvalue(), "abc\n")
+
+    def test_broken_pipe(self):
+        def main(app):
+            while True:
+                app.stdout.write("y\n" * 1000)
+        for binary in (False, True):
+            # The broken pipe is replaced by os.devnull, so use a new one.
+            r, w = os.pipe()
+            os.close(r)
+            f = os.fdopen(w, "w")
+            try:
+                app = Application(main, exit_after_main=False, stdout=f,
+                    buffered=1000, binary=binary)
+                self.assertEqual(app.run(), EPIPE_STATUS)
+            finally:
+                f.close()
+
+    def test_records_and_emit(self):
+        def main(app):
+            for batch in app.records(batch=2):
+                app.emit([record.upper() for record in batch])
+            app.emit("end")
+            app.emit([])
+        app = Application(main, exit_after_main=False,
+            stdin=StringIO(u"a\nb\nc"), stdout=StringIO())
+        self.assertEqual(app.run(), 0)
+        self.assertEqual(app.stdout.getvalue(), "A\nB\nC\nend\n")
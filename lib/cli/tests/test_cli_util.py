@@ -0,0 +1,80 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import sys
+
+from types import ModuleType
+
+import cli
+from cli.util import LazyModule, StringIO, exit_status, lazy
+
+from cli import tests
+
+class TestLazyModule(tests.BaseTest):
+
+    def setUp(self):
+        self.name = "cli.tests._lazy_example"
+        module = ModuleType(self.name, "example")
+        module.value = 1
+        sys.modules[self.name] = module
+        self.calls = []
+        def loader():
+            self.calls.append(True)
+            return "loaded"
+        self.module = lazy(self.name, {
+            "app": "cli.app",
+            "App": "cli.app:CommandLineApp",
+            "loaded": loader,
+        })
+
+    def tearDown(self):
+        del sys.modules[self.name]
+
+    def test_replaces_module(self):
+        self.assertTrue(isinstance(sys.modules[self.name], LazyModule))
+        self.assertEqual(self.module.value, 1)
+        self.assertEqual(self.module.__doc__, "example")
+
+    def test_attributes(self):
+        import cli.app
+        self.assertTrue(self.module.app is cli.app)
+        self.assertTrue(self.module.App is cli.app.CommandLineApp)
+        self.assertEqual(self.module.loaded, "loaded")
+        self.assertEqual(self.module.loaded, "loaded")
+        self.assertEqual(len(self.calls), 1)
+        self.assertRaises(AttributeError, getattr, self.module, "missing")
+
+    def test_package(self):
+        import cli.app
+        self.assertTrue(cli.default_app_class is cli.app.CommandLineApp)
+        self.assertTrue(cli.util.lazy is lazy)
+
+class TestExitStatus(tests.BaseTest):
+
+    def test_exit_status(self):
+        stream = StringIO()
+        self.assertEqual(exit_status(None, stream), 0)
+        self.assertEqual(exit_status(3, stream), 3)
+        self.assertEqual(exit_status(True, stream), 1)
+        self.assertEqual(stream.getvalue(), "")
+
+    def test_other_values(self):
+        stream = StringIO()
+        self.assertEqual(exit_status(u"2", stream), 1)
+        self.assertEqual(exit_status(2.0, stream), 1)
+        self.assertEqual(exit_status(u"failed", stream), 1)
+        self.assertEqual(stream.getvalue(), u"2\n2.0\nfailed\n")
@@ -0,0 +1,113 @@
+"""CLI tools for Python.
+
+Copyright (c) 2009-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+"""
+
+import os
+import signal
+import time
+
+from shutil import rmtree
+from tempfile import mkdtemp, TemporaryFile
+
+from cli.app import CommandLineApp
+from cli.zygote import ZygoteServer, call
+
+from cli import tests
+
+def echo(app):
+    app.stdout.write("%s %s %s %s\n" % (app.argv[0], app.params.word,
+        os.environ.get("ZYGOTE_TEST"), os.getcwd()))
+    time.sleep(app.params.sleep)
+    return app.params.status
+
+class TestZygoteServer(tests.BaseTest):
+    options = {}
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = os.path.join(self.tmpdir, "socket")
+        app = CommandLineApp(echo, argv=["echo"], exit_after_main=False,
+            **self.options)
+        app.add_param("word")
+        app.add_param("--status", type=int, default=0)
+        app.add_param("--sleep", type=float, default=0)
+        server = ZygoteServer(app, self.path)
+        self.pid = os.fork()
+        if self.pid == 0:
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        server.socket.close()
+
+    def tearDown(self):
+        os.kill(self.pid, signal.SIGTERM)
+        os.waitpid(self.pid, 0)
+        rmtree(self.tmpdir)
+
+    def call(self, *args):
+        out, err = TemporaryFile(), TemporaryFile()
+        status = call(self.path, list(args), env={"ZYGOTE_TEST": "yes"},
+            cwd=self.tmpdir, stdout=out.fileno(), stderr=err.fileno())
+        out.seek(0)
+        err.seek(0)
+        return status, out.read(), err.read()
+
+    def test_call(self):
+        self.assertEqual(self.call("hello"),
+            (0, "echo hello yes %s\n" % self.tmpdir, ""))
+        status, out, err = self.call("bye", "--status", "3")
+        self.assertEqual((status, out), (3, "echo bye yes %s\n" % self.tmpdir))
+
+    def test_errors(self):
+        status, out, err = self.call()
+        self.assertEqual(status, 2)
+        self.assertTrue("too few arguments" in err, err)
+        status, out, err = self.call("-h")
+        self.assertEqual(status, 0)
+        self.assertTrue(out.startswith("usage: echo"), out)
+
+    def test_signals(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 99
+            try:
+                status = self.call("sleepy", "--sleep", "10")[0]
+            finally:
+                os._exit(status)
+        time.sleep(0.5)
+        started = time.time()
+        os.kill(pid, signal.SIGINT)
+        status = os.waitpid(pid, 0)[1]
+        self.assertEqual(os.WEXITSTATUS(status), 128 + signal.SIGINT)
+        self.assertTrue(time.time() - started < 5)
+
+class TestBufferedZygoteServer(TestZygoteServer):
+    options = {"buffered": True}
+
+    def test_pipe(self):
+        r, w = os.pipe()
+        try:
+            status = call(self.path, ["piped"], env={"ZYGOTE_TEST": "yes"},
+                cwd=self.tmpdir, stdout=w)
+        finally:
+            os.close(w)
+        f = os.fdopen(r)
+        try:
+            self.assertEqual((status, f.read()),
+                (0, "echo piped yes %s\n" % self.tmpdir))
+        finally:
+            f.close()
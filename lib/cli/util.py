@@ -18,7 +18,7 @@ OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
 import sys
 
-from cli.profiler import Stats, fmtsec, update_wrapper
+from types import ModuleType
 
 try:
     import io
@@ -33,6 +33,81 @@ class StringIO(BaseStringIO):
     def write(self, s):
         BaseStringIO.write(self, unicode(s))
 
+class LazyModule(ModuleType):
+    """A module whose attributes are imported on first access.
+
+    *module* is the module being replaced; its namespace is copied and a
+    reference to it is kept so that the functions defined there keep
+    their globals. *attributes* maps attribute names to either a string
+    naming a module (``"cli.app"``) or an attribute of a module
+    (``"cli.app:CommandLineApp"``), or to a callable returning the
+    value. Each attribute is resolved once and then stored on the module.
+
+    Use :func:`lazy` to install a :class:`LazyModule`.
+    """
+
+    def __init__(self, module, attributes):
+        ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        self.__dict__["_LazyModule__module"] = module
+        self.__dict__["_LazyModule__attributes"] = attributes
+
+    def __getattr__(self, name):
+        try:
+            spec = self.__attributes[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute %r" % name)
+        if callable(spec):
+            value = spec()
+        else:
+            value = resolve(spec)
+        setattr(self, name, value)
+        return value
+
+def lazy(name, attributes):
+    """Make module *name* load *attributes* on first access.
+
+    The module in :data:`sys.modules` is replaced by a :class:`LazyModule`
+    which is returned. Call :func:`lazy` at the end of the module, once its
+    namespace is complete.
+    """
+    module = LazyModule(sys.modules[name], attributes)
+    sys.modules[name] = module
+    return module
+
+def resolve(spec):
+    """Import and return the object named by *spec*.
+
+    *spec* names a module (``"cli.app"``) or an attribute of a module
+    (``"cli.app:CommandLineApp"``).
+
+    .. versionadded:: 1.2
+    """
+    modname, _, attr = spec.partition(":")
+    __import__(modname)
+    value = sys.modules[modname]
+    if attr:
+        value = getattr(value, attr)
+    return value
+
+def exit_status(code, stream=None):
+    """Return the exit status :func:`sys.exit` would use for *code*.
+
+    ``None`` means success and an integer is the status itself; anything
+    else (even a string like ``"2"``) is written to *stream* (by default
+    :data:`sys.stderr`) and means failure.
+
+    .. versionadded:: 1.2
+    """
+    if code is None:
+        return 0
+    if isinstance(code, (int, long)):
+        return code
+    if stream is None:
+        stream = sys.stderr
+    stream.write("%s\n" % code)
+    return 1
+
 def trim(string):
     """Trim whitespace from strings.
 
@@ -86,3 +161,11 @@ def ismethodof(method, obj):
     mainobj = getattr(method, "im_self",
         getattr(method, "__self__", None))
     return isinstance(mainobj, cls)
+
+# The profiling helpers used to be imported here eagerly; keep them
+# available without paying for pstats at import time.
+lazy(__name__, {
+    "Stats": "cli.profiler:Stats",
+    "fmtsec": "cli.profiler:fmtsec",
+    "update_wrapper": "cli.profiler:update_wrapper",
+})
@@ -0,0 +1,281 @@
+"""\
+:mod:`cli.zygote` -- pre-forked application servers
+---------------------------------------------------
+
+A zygote server loads an application once and then forks a child for
+each request, so that frequent, short invocations don't pay for
+interpreter startup, imports and :meth:`cli.app.Application.setup`::
+
+    # server
+    app = MyApp()
+    ZygoteServer(app, "/run/myapp.sock").serve_forever()
+
+    # client (a shell wrapper can just exec this)
+    $ python -S -m cli.zygote /run/myapp.sock --some --args
+
+The client passes its stdin, stdout and stderr to the server over the
+Unix socket (as ``SCM_RIGHTS`` messages), along with its arguments,
+environment and working directory, and exits with the status of the
+child that ran the application. While it waits, the client forwards
+:data:`signal.SIGINT` and :data:`signal.SIGTERM` to the child, so that
+Ctrl-C stops the application (which exits with status 130 on
+:exc:`KeyboardInterrupt`). Other signals, like a stop from the terminal,
+only reach the client. The client only imports a few standard modules;
+running it with :option:`-S` also skips :mod:`site`.
+"""
+
+__license__ = """Copyright (c) 2008-2010 Will Maier <will@m.aier.us>
+
+Permission to use, copy, modify, and distribute this software for any
+purpose with or without fee is hereby granted, provided that the above
+copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+
+# The client side is imported by every invocation, so this module must
+# stay cheap to import: cli.app is only needed by the server.
+import errno
+import os
+import signal
+import socket
+import struct
+import sys
+
+from _multiprocessing import recvfd, sendfd
+
+from cli.util import exit_status
+
+__all__ = ["ZygoteServer", "call"]
+
+_length = struct.Struct("!I")
+_status = struct.Struct("!i")
+
+class ZygoteServer(object):
+    """Serve *app* on the Unix socket at *path*.
+
+    *app* is an :class:`cli.app.Application` that has been set up. For each
+    request, the server forks a child that takes over the client's
+    stdin, stdout and stderr (re-opening the application's
+    :attr:`~cli.app.Application.buffered_output` on them), environment
+    and working directory and calls :meth:`cli.app.Application.run` with
+    the client's arguments (after the application's own :attr:`argv[0]
+    <cli.app.Application.argv>`). The child sends its process ID to the
+    client, so that signals can be forwarded, then reports the exit
+    status and exits without running :mod:`atexit` handlers.
+
+    Any existing file at *path* is replaced; the socket is only
+    accessible by the user running the server.
+
+    .. versionadded:: 1.2
+    """
+
+    def __init__(self, app, path, backlog=128):
+        self.app = app
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0177)
+        try:
+            self.socket.bind(path)
+        finally:
+            os.umask(umask)
+        self.socket.listen(backlog)
+
+    def serve_forever(self):
+        """Handle requests until interrupted, then :meth:`close`."""
+        try:
+            while True:
+                self.handle_request()
+        finally:
+            self.close()
+
+    def handle_request(self):
+        """Accept a request and fork a child to run it.
+
+        Returns the child's process ID, or ``None`` if the request could
+        not be read.
+        """
+        # Children are reaped by the kernel; they report their own status.
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        conn = _retry(self.socket.accept)[0]
+        fds = []
+        try:
+            try:
+                for i in range(3):
+                    fds.append(recvfd(conn.fileno()))
+                request = _unpack_request(_recv_message(conn))
+            except (EnvironmentError, EOFError, ValueError):
+                return None
+            for stream in (sys.stdout, sys.stderr):
+                stream.flush()
+            pid = os.fork()
+            if pid == 0:
+                self._run_child(conn, fds, *request)
+            return pid
+        finally:
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+
+    def _run_child(self, conn, fds, args, env, cwd):
+        # Never returns: the child runs the application and exits.
+        status = 1
+        try:
+            try:
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                conn.sendall(_status.pack(os.getpid()))
+                self.socket.close()
+                for target, fd in enumerate(fds):
+                    os.dup2(fd, target)
+                output = getattr(self.app, "buffered_output", None)
+                if output is not None:
+                    output.reopen()
+                os.environ.clear()
+                os.environ.update(env)
+                os.chdir(cwd)
+                status = self.run(args)
+            except SystemExit, e:
+                status = exit_status(e.code)
+            except KeyboardInterrupt:
+                status = 128 + signal.SIGINT
+            except:
+                import traceback
+                traceback.print_exc()
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except EnvironmentError:
+                    pass
+            conn.sendall(_status.pack(status))
+        finally:
+            os._exit(status)
+
+    def run(self, args):
+        """Run the application with *args* in a child and return its status."""
+        from cli.app import Abort
+        app = self.app
+        try:
+            returned = app.run([app.argv[0]] + args, exit_after=False)
+        except Abort, e:
+            returned = e.status
+        return exit_status(returned)
+
+    def close(self):
+        """Stop listening and remove the socket."""
+        self.socket.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+def call(path, args, env=None, cwd=None, stdin=0, stdout=1, stderr=2):
+    """Run *args* on the :class:`ZygoteServer` at *path* and return the status.
+
+    *stdin*, *stdout* and *stderr* are the file descriptors the application
+    will use. *env* and *cwd* default to those of the current process.
+    Until the status arrives, :data:`signal.SIGINT` and
+    :data:`signal.SIGTERM` are forwarded to the child running the
+    application (when called from the main thread). Raises
+    :exc:`EOFError` if the child exited without reporting a status (e.g.
+    when it was killed by a signal).
+
+    .. versionadded:: 1.2
+    """
+    if env is None:
+        env = os.environ
+    if cwd is None:
+        cwd = os.getcwd()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        for fd in (stdin, stdout, stderr):
+            sendfd(sock.fileno(), fd)
+        data = _pack_request(args, env, cwd)
+        sock.sendall(_length.pack(len(data)) + data)
+        pid = _status.unpack(_recv_exactly(sock, _status.size))[0]
+        handlers = _forward_signals(pid)
+        try:
+            return _status.unpack(_recv_exactly(sock, _status.size))[0]
+        finally:
+            for signum, handler in handlers:
+                if handler is not None:
+                    signal.signal(signum, handler)
+    finally:
+        sock.close()
+
+def _forward_signals(pid):
+    # Send SIGINT and SIGTERM on to pid; return the handlers replaced.
+    def forward(signum, frame):
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+    handlers = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            handlers.append((signum, signal.signal(signum, forward)))
+        except ValueError:
+            # not the main thread
+            break
+    return handlers
+
+def _pack_request(args, env, cwd):
+    # Arguments, environment and paths can't contain NUL bytes.
+    fields = [cwd, str(len(args))] + list(args)
+    fields.extend(["%s=%s" % item for item in env.items()])
+    return "\0".join(fields)
+
+def _unpack_request(data):
+    fields = data.split("\0")
+    cwd, count = fields[0], int(fields[1])
+    args = fields[2:2 + count]
+    env = dict([item.split("=", 1) for item in fields[2 + count:]])
+    return args, env, cwd
+
+def _recv_message(sock):
+    length = _length.unpack(_recv_exactly(sock, _length.size))[0]
+    return _recv_exactly(sock, length)
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = _retry(sock.recv, size)
+        if not chunk:
+            raise EOFError("connection closed by the other end")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return "".join(chunks)
+
+def _retry(func, *args):
+    # Call func, restarting it when interrupted by a signal.
+    while True:
+        try:
+            return func(*args)
+        except EnvironmentError, e:
+            if e.errno != errno.EINTR:
+                raise
+
+def main(argv=None):
+    """Forward the command line to a server: ``python -m cli.zygote PATH ARGS``."""
+    if argv is None:
+        argv = sys.argv
+    if len(argv) < 2:
+        sys.stderr.write("usage: %s PATH [ARG ...]\n" % argv[0])
+        return 2
+    try:
+        return call(argv[1], argv[2:])
+    except (EnvironmentError, EOFError), e:
+        sys.stderr.write("%s: %s\n" % (argv[1], e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())